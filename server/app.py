@@ -1,32 +1,111 @@
 #!/usr/bin/env python3
 
 # Standard library imports
+import os
 
 # Remote library imports
-from flask import request, session, jsonify, make_response
-from flask_restful import Resource
-from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, jwt_required, current_user
+from flask import current_app, request, session, jsonify, make_response
+from flask_cors import CORS
+from flask_restful import Api, Resource
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt, get_jwt_identity, jwt_required
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Local imports
-from config import app, db, api
+import config
+from config import db
 from models import Customer, Item, Order, OrderItem
-
-# JWT configuration
-app.config["JWT_SECRET_KEY"] = "b'Y\xf1Xz\x01\xad|eQ\x80t \xca\x1a\x10K'"
-app.config['JWT_TOKEN_LOCATION'] = ['headers']
-jwt = JWTManager(app)
+from serializers import customer_plan, item_plan, order_plan, order_item_plan
+from pagination import collection_response
+from query_budget import query_budget
+from cache import catalog_cache, order_history_cache
+from hashing import HashingBusy
+from identity import customer_snapshots, current_customer, token_claims, admin_required
+from checkout import CheckoutError, adjust_wallet, parse_cart, place_order
+from search import search_args, search_items, search_key
+import reports
+from bulk import BulkError, bulk_write
+from metrics import metrics
+from profiling import profiler
+from conditional import PreconditionError, check_if_match, commit_versioned, conditional, row_response
+from compression import compressor
+from ratelimit import limiter
+from coalesce import coalescer
+from inventory import InventoryError, release, reserve, restock, stock_level, sweeper
+import history
+from images import ImageError, image_store, upload_bytes
+from audit import audit_args, audit_log, diff
+
+# Bound to an app in create_app(); resources are registered on api below
+api = Api()
+jwt = JWTManager()
+
+
+def create_app(overrides=None):
+    """The API server: config.create_app() plus JWT, CORS, the resources and the response middleware."""
+    app = config.create_app(overrides)
+    # Indented under debug only (Flask's rule when compact is None); compact separators in production.
+    # RESTFUL_JSON does the same for Resources returning dicts, which flask_restful indents under debug.
+    app.json.compact = None
+    app.config.setdefault('RESTFUL_JSON', {'separators': (',', ':')})
+    # Shared backend for response caches, e.g. redis://localhost:6379/0; in-process when unset
+    app.config.setdefault('CACHE_URL', os.environ.get('CACHE_URL'))
+    # Fraction of requests to profile, see profiling.py; admins can always ask with ?__profile=1
+    app.config.setdefault('PROFILE_SAMPLE_RATE', float(os.environ.get('PROFILE_SAMPLE_RATE', 0)))
+    # Token buckets for login, signup and writes, see ratelimit.py; redis://... shares them across workers
+    app.config.setdefault('RATELIMIT_ENABLED', os.environ.get('RATELIMIT_ENABLED', '1') != '0')
+    app.config.setdefault('RATELIMIT_URL', os.environ.get('RATELIMIT_URL'))
+    # Identical concurrent catalog GETs share one run of the view, see coalesce.py
+    app.config.setdefault('COALESCE_ENABLED', os.environ.get('COALESCE_ENABLED', '1') != '0')
+    # How long a cart reservation holds stock, and how often each worker releases lapsed ones (0: never)
+    app.config.setdefault('RESERVATION_TTL', int(os.environ.get('RESERVATION_TTL', 600)))
+    app.config.setdefault('RESERVATION_SWEEP_INTERVAL', float(os.environ.get('RESERVATION_SWEEP_INTERVAL', 30)))
+    # Threads rendering image variants per worker, default one per core; 0 renders them during the upload
+    app.config.setdefault('IMAGE_WORKERS', os.environ.get('IMAGE_WORKERS'))
+    # Seconds audit events wait in memory before each worker writes them out, see audit.py; 0 writes them inline
+    app.config.setdefault('AUDIT_FLUSH_INTERVAL', float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1)))
+    # Number of reverse proxies in front of the app, whose X-Forwarded-For entries are trusted for the client IP
+    if int(os.environ.get('TRUSTED_PROXIES', 0)):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.environ['TRUSTED_PROXIES']))
+
+    # JWT configuration
+    app.config.setdefault("JWT_SECRET_KEY", "b'Y\xf1Xz\x01\xad|eQ\x80t \xca\x1a\x10K'")
+    app.config['JWT_TOKEN_LOCATION'] = ['headers']
+    jwt.init_app(app)
+    # Instantiate CORS, letting clients read the keyset pagination cursor
+    CORS(app, expose_headers=['X-Next-Cursor'])
+
+    catalog_cache.init_app(app)
+    order_history_cache.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    # After metrics, so http_response_size_bytes records the compressed size
+    compressor.init_app(app)
+    limiter.init_app(app)
+    coalescer.init_app(app)
+    sweeper.init_app(app)
+    image_store.init_app(app)
+    audit_log.init_app(app)
+    api.init_app(app)
+    return app
 
 @jwt.user_identity_loader
 def user_identity_lookup(user):
-    return user.id
+    return str(user.id)
+
+# No user_lookup_loader: it would query the customer on every @jwt_required() request.
+# Authorize from get_jwt() claims, and call current_customer() when the row is needed.
+@jwt.additional_claims_loader
+def add_claims_to_access_token(user):
+    return token_claims(user)
 
-@jwt.user_lookup_loader
-def user_lookup_callback(_jwt_header, jwt_data):
-    identity = jwt_data["sub"]
-    return Customer.query.filter_by(id=identity).one_or_none()
+# Default for writes without a tighter limit of their own
+write_limit = limiter.limit(ip='120/minute')
+# Catalog reads: every item write bumps the catalog generation, so no request joins a flight older than a write
+coalesce_catalog = coalescer.coalesce(generation=catalog_cache.generation)
 
 # Views go here!
 class Signup(Resource):
+    @limiter.limit(ip='10/minute')
     def post(self):
         data = request.get_json()
 
@@ -44,6 +123,8 @@ class Signup(Resource):
 
             return make_response({"user": new_customer.to_dict(), 'access_token': access_token, 'admin': new_customer.admin}, 201)
 
+        except HashingBusy:
+            raise
         except Exception as e:
             print(f"Exception: {e}")  # Log the exception
             return make_response({'error': 'Invalid inputs'}, 400)
@@ -51,15 +132,21 @@ class Signup(Resource):
 class CheckSession(Resource):
     @jwt_required()
     def get(self):
-        return {**current_user.to_dict(), 'admin': current_user.admin}, 200
+        customer = current_customer()
+        if customer is None:
+            return {'error': 'Customer not found'}, 404
+        return customer, 200
 
 class Login(Resource):
+    @limiter.limit(ip='30/minute', username='10/minute')
     def post(self):
         data = request.get_json()
 
         check_customer = Customer.query.filter(Customer.username == data['username']).first()
 
         if check_customer and check_customer.authenticate(data['password']):
+            # Persists a rehashed password; a no-op when nothing changed
+            db.session.commit()
             access_token = create_access_token(identity=check_customer)
             return make_response({"user": check_customer.to_dict(), 'access_token': access_token, 'admin': check_customer.admin}, 200)
 
@@ -76,10 +163,15 @@ class Home(Resource):
         return '<h1> Phase 4 Project Server </h1>'
 
 class Items(Resource):
+    @coalesce_catalog
+    @conditional(*item_plan.tables)
+    @query_budget(1)
     def get(self):
-        items = [item.to_dict(rules=('-order_items',)) for item in Item.query.all()]
-        return make_response(items, 200)
+        if request.args:
+            return collection_response(item_plan)
+        return catalog_cache.response('items', item_plan.all)
 
+    @write_limit
     def post(self):
         data = request.get_json()
 
@@ -93,50 +185,137 @@ class Items(Resource):
 
         db.session.add(new_item)
         db.session.commit()
+        catalog_cache.invalidate()
 
-        return make_response(new_item.to_dict(), 201)
+        # Through item_plan like GET and PATCH, so the body has image_variants and an ETag for If-Match
+        return row_response(item_plan, new_item.id, 201)
+
+class ItemSearch(Resource):
+    @coalesce_catalog
+    @conditional(*item_plan.tables)
+    @query_budget(2)
+    def get(self):
+        try:
+            args = search_args()
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+        return catalog_cache.response(search_key(**args), lambda: search_items(**args))
 
 class ItemsByCategory(Resource):
+    @coalesce_catalog
+    @conditional(*item_plan.tables)
+    @query_budget(1)
     def get(self, category):
-        category_items = [item.to_dict() for item in Item.query.filter(Item.category == category)]
-        return (category_items, 200)
+        return catalog_cache.response(f'items:category:{category}', lambda: item_plan.all(Item.category == category))
 
 class ItemsByID(Resource):
+    # Not from catalog_cache: the ETag must come from the same read as the body, see row_response
+    @coalesce_catalog
+    @query_budget(1)
     def get(self, id):
-        item = Item.query.get(id)
-        if item is None:
+        response = row_response(item_plan, id)
+        if response is None:
             return make_response({'error': 'Item not found'}, 404)
-        return make_response(item.to_dict(rules=('-order_items',)), 200)
+        return response
 
+    @write_limit
     def patch(self, id):
         item_to_update = Item.query.filter(Item.id == id).first()
 
         if item_to_update is None:
             return make_response({'error': 'Item not found'}, 404)
 
-        for key in request.json:
-            setattr(item_to_update, key, request.json[key])
-
-        db.session.add(item_to_update)
-        db.session.commit()
-
-        return make_response(item_to_update.to_dict(), 202)
-
+        price = diff(item_to_update, request.json, ('price',))
+        try:
+            check_if_match(item_plan, item_to_update)
+            for key in request.json:
+                # The ORM owns version (version_id_col), inventory.py in_stock, images.py image_hash
+                if key not in ('version', 'in_stock', 'image_hash'):
+                    setattr(item_to_update, key, request.json[key])
+            db.session.add(item_to_update)
+            commit_versioned()
+        except PreconditionError as e:
+            return make_response({'error': e.message}, e.status)
+        catalog_cache.invalidate()
+        if price:
+            audit_log.record('item', id, 'updated', price)
+
+        return row_response(item_plan, id, 202)
+
+    @write_limit
     def delete(self, id):
         item_to_delete = Item.query.filter(Item.id == id).first()
         if item_to_delete:
             db.session.delete(item_to_delete)
-            db.session.commit()
+            try:
+                commit_versioned()
+            except PreconditionError as e:
+                return make_response({'error': e.message}, e.status)
+            catalog_cache.invalidate()
 
             return make_response({'message': 'Item deleted'}, 200)
         else:
             return {'error': 'Item not found'}, 404
 
+class ItemStockLevel(Resource):
+    @query_budget(1)
+    def get(self, id):
+        return make_response({'item_id': id, 'stock': stock_level(id)}, 200)
+
+    @write_limit
+    @admin_required
+    @query_budget(4)
+    def post(self, id):
+        # {"amount": 50} to restock, negative to write off; one atomic increment, never below zero
+        amount = (request.get_json(silent=True) or {}).get('amount')
+        if not isinstance(amount, int) or isinstance(amount, bool):
+            return make_response({'error': 'amount must be an integer'}, 400)
+
+        try:
+            quantity = restock(id, amount)
+        except InventoryError as e:
+            return make_response({'error': e.message}, e.status)
+        return make_response({'item_id': id, 'stock': quantity}, 200)
+
+class ItemImage(Resource):
+    @limiter.limit(ip='30/minute')
+    @admin_required
+    @query_budget(3)
+    def put(self, id):
+        # The image as the request body, or a multipart "image" field; variants render in the background
+        item = db.session.get(Item, id)
+        if item is None:
+            return make_response({'error': 'Item not found'}, 404)
+
+        try:
+            digest = image_store.ingest(upload_bytes(image_store.max_bytes))
+            item.image_hash = digest
+            commit_versioned()
+        except (ImageError, PreconditionError) as e:
+            db.session.rollback()
+            return make_response({'error': e.message}, e.status)
+        catalog_cache.invalidate()
+        image_store.schedule(digest)
+
+        return row_response(item_plan, id)
+
+class ImageVariant(Resource):
+    @query_budget(0)
+    def get(self, digest, variant):
+        # Immutable: a URL's bytes never change, a new upload gets a new digest
+        response = image_store.send(digest, variant)
+        if response is None:
+            return make_response({'error': 'Image not found'}, 404)
+        return response
+
 class Orders(Resource):
+    @conditional(*order_plan.tables)
+    @query_budget(1)
     def get(self):
-        orders = [order.to_dict() for order in Order.query.all()]
-        return make_response(orders, 200)
+        return collection_response(order_plan)
 
+    @write_limit
+    @query_budget(3)
     def post(self):
         data = request.get_json()
 
@@ -146,24 +325,84 @@ class Orders(Resource):
         )
         db.session.add(new_order)
         db.session.commit()
+        history.invalidate(new_order.customer_id)
+        audit_log.record('order', new_order.id, 'created',
+                         {'customer_id': new_order.customer_id, 'total': new_order.total})
+
+        return make_response(order_plan.one(Order.id == new_order.id), 201)
+
+class Checkout(Resource):
+    @limiter.limit(user='30/minute', ip='120/minute')
+    @jwt_required()
+    @query_budget(9)
+    def post(self):
+        customer_id = int(get_jwt_identity())
 
-        return make_response(new_order.to_dict(), 201)
+        try:
+            cart = parse_cart(request.get_json(silent=True))
+            order_id = place_order(customer_id, cart)
+        except (CheckoutError, InventoryError) as e:
+            return make_response({'error': e.message}, e.status)
+
+        customer_snapshots.invalidate(customer_id)
+        history.invalidate(customer_id)
+        order = order_plan.one(Order.id == order_id)
+        order['order_items'] = [
+            dict(row._mapping) for row in db.session.execute(
+                db.select(OrderItem.id, OrderItem.item_id, OrderItem.quantity)
+                .where(OrderItem.order_id == order_id)
+                .order_by(OrderItem.item_id, OrderItem.id)
+            )
+        ]
+        return make_response(order, 201)
+
+class Reservations(Resource):
+    @limiter.limit(user='30/minute', ip='120/minute')
+    @jwt_required()
+    @query_budget(4)
+    def post(self):
+        # Same body as /checkout; the units are held for RESERVATION_TTL seconds, then checkout claims them
+        try:
+            cart = parse_cart(request.get_json(silent=True))
+            reservations = reserve(int(get_jwt_identity()), cart, current_app.config['RESERVATION_TTL'])
+        except (CheckoutError, InventoryError) as e:
+            return make_response({'error': e.message}, e.status)
+        return make_response({'reservations': reservations}, 201)
+
+class ReservationByID(Resource):
+    @write_limit
+    @jwt_required()
+    @query_budget(3)
+    def delete(self, id):
+        if not release(int(get_jwt_identity()), id):
+            return make_response({'error': 'Reservation not found'}, 404)
+        return make_response({'message': 'Reservation released'}, 200)
 
 class OrdersByID(Resource):
+    @write_limit
     def delete(self, id):
         order_to_delete = Order.query.filter(Order.id == id).first()
         if order_to_delete:
             db.session.delete(order_to_delete)
-            db.session.commit()
+            try:
+                commit_versioned()
+            except PreconditionError as e:
+                return make_response({'error': e.message}, e.status)
+            history.invalidate(order_to_delete.customer_id)
+            audit_log.record('order', id, 'deleted',
+                             {'customer_id': order_to_delete.customer_id, 'total': order_to_delete.total})
             return make_response({'message': 'Order deleted'}, 200)
         else:
             return {'error': 'Order not found'}, 404
 
 class OrderItems(Resource):
+    @conditional(*order_item_plan.tables)
+    @query_budget(1)
     def get(self):
-        order_items = [order_item.to_dict() for order_item in OrderItem.query.all()]
-        return make_response(order_items, 200)
+        return collection_response(order_item_plan)
 
+    @write_limit
+    @query_budget(4)
     def post(self):
         data = request.get_json()
 
@@ -175,92 +414,247 @@ class OrderItems(Resource):
 
         db.session.add(new_order_item)
         db.session.commit()
+        history.invalidate(*history.order_owners(new_order_item.order_id))
+        audit_log.record('orderitem', new_order_item.id, 'created',
+                         {key: data[key] for key in ('order_id', 'item_id', 'quantity')})
 
-        return make_response(new_order_item.to_dict(), 201)
+        return make_response(order_item_plan.one(OrderItem.id == new_order_item.id), 201)
 
 class OrderItemByID(Resource):
+    @query_budget(1)
     def get(self, id):
-        order_item = OrderItem.query.filter(OrderItem.id == id).first()
+        response = row_response(order_item_plan, id)
 
-        if order_item is None:
+        if response is None:
             return make_response({'error': 'OrderItem not found'}, 404)
 
-        return make_response(order_item.to_dict(), 200)
+        return response
 
+    @write_limit
+    @query_budget(5)
     def patch(self, id):
         order_item = OrderItem.query.filter(OrderItem.id == id).first()
 
         if order_item is None:
             return make_response({'error': 'OrderItem not found'}, 404)
 
-        for key in request.json:
-            setattr(order_item, key, request.json[key])
-
-        db.session.add(order_item)
-        db.session.commit()
-
-        return make_response(order_item.to_dict(), 200)
-
+        # Moving a line to another order changes two customers' histories
+        order_ids = {order_item.order_id}
+        changes = diff(order_item, request.json, ('quantity', 'item_id', 'order_id'))
+        try:
+            check_if_match(order_item_plan, order_item)
+            for key in request.json:
+                # The ORM owns version (version_id_col)
+                if key != 'version':
+                    setattr(order_item, key, request.json[key])
+            db.session.add(order_item)
+            order_ids.add(order_item.order_id)
+            commit_versioned()
+        except PreconditionError as e:
+            return make_response({'error': e.message}, e.status)
+
+        history.invalidate(*history.order_owners(*order_ids))
+        if changes:
+            audit_log.record('orderitem', id, 'updated', changes)
+        return row_response(order_item_plan, id)
+
+    @write_limit
     def delete(self, id):
         order_item = OrderItem.query.filter(OrderItem.id == id).first()
 
         if order_item is None:
             return make_response({'error': 'OrderItem not found'}, 404)
 
+        order_id = order_item.order_id
+        deleted = {'order_id': order_id, 'item_id': order_item.item_id, 'quantity': order_item.quantity}
         db.session.delete(order_item)
-        db.session.commit()
+        try:
+            commit_versioned()
+        except PreconditionError as e:
+            return make_response({'error': e.message}, e.status)
 
+        history.invalidate(*history.order_owners(order_id))
+        audit_log.record('orderitem', id, 'deleted', deleted)
         return make_response({'message': 'OrderItem deleted successfully'}, 200)
 
 class Customers(Resource):
+    @conditional(*customer_plan.tables)
+    @query_budget(1)
     def get(self):
-        customers = Customer.query.all()
-        customers_list = [customer.to_dict() for customer in customers]
-        return make_response(customers_list, 200)
+        return collection_response(customer_plan)
 
 class CustomerByID(Resource):
+    @query_budget(1)
     def get(self, id):
-        customer = Customer.query.get(id)
-        if customer:
-            return make_response(customer.to_dict(), 200)
+        response = row_response(customer_plan, id)
+        if response:
+            return response
         return make_response({'message': 'Customer not found'}, 404)
 
+    @write_limit
     def patch(self, id):
         customer_to_update = Customer.query.get(id)
         if customer_to_update:
             data = request.get_json()
 
             if 'wallet' in data:
-                setattr(customer_to_update, 'wallet', data['wallet'])
-                db.session.add(customer_to_update)
-                db.session.commit()
-                return make_response(customer_to_update.to_dict(), 202)
+                # Replaces the balance; to add to or take from it, POST /customers/<id>/wallet
+                wallet = diff(customer_to_update, data, ('wallet',))
+                try:
+                    check_if_match(customer_plan, customer_to_update)
+                    setattr(customer_to_update, 'wallet', data['wallet'])
+                    db.session.add(customer_to_update)
+                    commit_versioned()
+                except PreconditionError as e:
+                    return make_response({'error': e.message}, e.status)
+                customer_snapshots.invalidate(id)
+                if wallet:
+                    audit_log.record('customer', id, 'updated', wallet)
+                return row_response(customer_plan, id, 202)
             return make_response({'message': 'Invalid data'}, 400)
 
         return make_response({'message': 'Customer not found'}, 404)
 
+    @write_limit
     def delete(self, id):
         customer_to_delete = Customer.query.get(id)
         if customer_to_delete:
             db.session.delete(customer_to_delete)
-            db.session.commit()
+            try:
+                commit_versioned()
+            except PreconditionError as e:
+                return make_response({'error': e.message}, e.status)
+            customer_snapshots.invalidate(id)
+            history.invalidate(id)
             return make_response({'message': 'Customer deleted'}, 200)
         return make_response({'message': 'Customer not found'}, 404)
 
+class CustomerWallet(Resource):
+    @write_limit
+    @admin_required
+    @query_budget(2)
+    def post(self, id):
+        # {"amount": 25} or {"amount": -25}. No If-Match: increments commute, so concurrent
+        # adjustments and checkouts never overwrite each other, and none may overdraw
+        amount = (request.get_json(silent=True) or {}).get('amount')
+        if not isinstance(amount, (int, float)) or isinstance(amount, bool):
+            return make_response({'error': 'amount must be a number'}, 400)
+
+        try:
+            wallet = adjust_wallet(id, amount)
+            db.session.commit()
+        except CheckoutError as e:
+            db.session.rollback()
+            return make_response({'error': e.message}, e.status)
+
+        customer_snapshots.invalidate(id)
+        audit_log.record('customer', id, 'wallet_adjusted', {'amount': amount, 'wallet': float(wallet)})
+        return make_response({'id': id, 'wallet': float(wallet)}, 200)
+
+class CustomerOrders(Resource):
+    @jwt_required()
+    @query_budget(3)
+    def get(self, id):
+        # Newest first with their lines and items; ?limit= and ?before=<next_cursor> page through
+        if int(get_jwt_identity()) != id and not get_jwt().get('admin'):
+            return make_response({'error': 'Not allowed to view these orders'}, 403)
+        return history.history_response(id)
+
+class MyOrders(Resource):
+    @jwt_required()
+    @query_budget(3)
+    def get(self):
+        return history.history_response(int(get_jwt_identity()))
+
+# Admin dashboards read the rollup tables maintained in models.py
+class RevenueReport(Resource):
+    @admin_required
+    @query_budget(1)
+    def get(self):
+        try:
+            start, end = reports.date_range()
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+        return make_response(reports.revenue_by_day(start, end), 200)
+
+class TopItemsReport(Resource):
+    @admin_required
+    @query_budget(1)
+    def get(self):
+        try:
+            limit = reports.report_limit()
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+        return make_response(reports.top_items(limit), 200)
+
+class CategoryMixReport(Resource):
+    @admin_required
+    @query_budget(1)
+    def get(self):
+        return make_response(reports.category_mix(), 200)
+
+class CustomerValueReport(Resource):
+    @admin_required
+    @query_budget(1)
+    def get(self):
+        try:
+            limit = reports.report_limit()
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+        return make_response(reports.customer_lifetime_value(limit), 200)
+
+class AuditEvents(Resource):
+    @admin_required
+    @query_budget(1)
+    def get(self):
+        # Oldest first; ?entity=order&id=7&from=2024-01-01&to=2024-02-01, then ?after=<next_cursor>
+        try:
+            args = audit_args()
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+        return make_response(audit_log.events(**args), 200)
+
+class Bulk(Resource):
+    @limiter.limit(user='30/minute')
+    @admin_required
+    def post(self, resource, op):
+        try:
+            return make_response(bulk_write(resource, op), 200)
+        except BulkError as e:
+            return make_response({'error': e.message}, e.status)
+
 api.add_resource(Home, '/')
 api.add_resource(Signup, '/signup', endpoint='signup')
 api.add_resource(CheckSession, '/check_session', endpoint='check_session')
 api.add_resource(Login, '/login', endpoint='login')
 api.add_resource(Logout, '/logout', endpoint='logout')
 api.add_resource(Items, '/items')
+# Werkzeug matches the static /items/search before the /items/<category> converter
+api.add_resource(ItemSearch, '/items/search')
 api.add_resource(ItemsByCategory, '/items/<category>')
 api.add_resource(ItemsByID, '/items/<int:id>')
+api.add_resource(ItemStockLevel, '/items/<int:id>/stock')
+api.add_resource(ItemImage, '/items/<int:id>/image')
+api.add_resource(ImageVariant, '/images/<digest>/<variant>')
 api.add_resource(Orders, '/orders')
 api.add_resource(OrdersByID, '/orders/<int:id>')
+api.add_resource(Checkout, '/checkout')
+api.add_resource(Reservations, '/reservations')
+api.add_resource(ReservationByID, '/reservations/<int:id>')
 api.add_resource(OrderItems, '/orderitems')
 api.add_resource(OrderItemByID, '/orderitems/<int:id>')
 api.add_resource(Customers, '/customers')
 api.add_resource(CustomerByID, '/customers/<int:id>')
+api.add_resource(CustomerWallet, '/customers/<int:id>/wallet')
+api.add_resource(CustomerOrders, '/customers/<int:id>/orders')
+api.add_resource(MyOrders, '/me/orders')
+api.add_resource(RevenueReport, '/reports/revenue')
+api.add_resource(TopItemsReport, '/reports/top-items')
+api.add_resource(CategoryMixReport, '/reports/categories')
+api.add_resource(CustomerValueReport, '/reports/customers')
+api.add_resource(AuditEvents, '/audit')
+api.add_resource(Bulk, '/bulk/<resource>/<op>')
 
 if __name__ == '__main__':
-    app.run(port=5555, debug=True)
+    # Werkzeug's development server; deploy with gunicorn (see wsgi.py)
+    create_app().run(port=5555, debug=True)
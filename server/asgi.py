@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""ASGI entry point, for hosting behind an ASGI server.
+
+    uvicorn asgi:application --workers 4
+
+Flask-RESTful resources are synchronous, so asgiref runs each request on
+a thread; concurrency is the same as gunicorn's gthread workers. Needs
+``pip install asgiref uvicorn``.
+"""
+
+# Standard library imports
+
+# Remote library imports
+from asgiref.wsgi import WsgiToAsgi
+
+# Local imports
+from wsgi import app
+
+application = WsgiToAsgi(app)
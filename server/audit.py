@@ -0,0 +1,451 @@
+# Standard library imports
+import atexit
+import glob
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+# Remote library imports
+import click
+from flask import has_request_context, request
+from flask.cli import AppGroup
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.exc import OperationalError
+
+# Local imports
+from config import db
+from metrics import metrics
+from models import AuditEvent
+
+SINKS = ('table', 'segments')
+FSYNC_POLICIES = ('always', 'interval', 'never')
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+FIELDS = ('occurred_at', 'entity_type', 'entity_id', 'action', 'actor_id', 'remote_addr', 'changes')
+
+
+def utcnow():
+    # Naive UTC, like the DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def current_actor():
+    """The customer id in the request's bearer token, or None without a valid one.
+
+    Most write routes do not require a token, so it is verified here
+    rather than read from what @jwt_required left behind.
+    """
+    if not has_request_context():
+        return None
+    # Imported here: manage.py's `flask audit` should not load the JWT stack
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+    from flask_jwt_extended.exceptions import JWTExtendedException
+    from jwt.exceptions import PyJWTError
+
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return None
+    identity = get_jwt_identity()
+    return None if identity is None else int(identity)
+
+
+def diff(obj, data, keys):
+    """``{key: [old, new]}`` for the entries of ``data`` among ``keys`` that differ from ``obj``'s attributes.
+
+    Call before assigning ``data`` to ``obj``. ``keys`` is the audited
+    fields, never the request body's: clients can send any column.
+    """
+    return {key: [getattr(obj, key), data[key]] for key in keys
+            if key in data and getattr(obj, key) != data[key]}
+
+
+class TableSink:
+    """Appends batches to the audit_events table, one multi-row INSERT per batch."""
+
+    name = 'table'
+    # Errors worth retrying the batch for; anything else means the batch itself is bad
+    transient = (OperationalError,)
+
+    def write(self, events):
+        # Its own connection and transaction, never the request's session, and outside the request's query budget
+        with db.engine.begin() as connection:
+            connection.execution_options(query_budget=False)
+            connection.execute(insert(AuditEvent), events)
+
+    def replay(self, entity_type=None, entity_id=None, since=None, until=None, after=None):
+        stmt = select(*(getattr(AuditEvent, field) for field in FIELDS), AuditEvent.id)
+        if entity_type is not None:
+            stmt = stmt.where(AuditEvent.entity_type == entity_type)
+        if entity_id is not None:
+            stmt = stmt.where(AuditEvent.entity_id == entity_id)
+        if since is not None:
+            stmt = stmt.where(AuditEvent.occurred_at >= since)
+        if until is not None:
+            stmt = stmt.where(AuditEvent.occurred_at < until)
+        if after is not None:
+            occurred_at, event_id = after
+            stmt = stmt.where(or_(AuditEvent.occurred_at > occurred_at,
+                                  and_(AuditEvent.occurred_at == occurred_at, AuditEvent.id > event_id)))
+        stmt = stmt.order_by(AuditEvent.occurred_at, AuditEvent.id).execution_options(yield_per=1000)
+        for row in db.session.execute(stmt):
+            yield {**dict(zip(FIELDS, row)), 'id': row.id}
+
+
+class SegmentSink:
+    """Appends batches as JSON lines to segment files, each written by one process only.
+
+    A file is named after the process and the time it was opened, and a new
+    one is started past ``segment_bytes``, so no two workers ever append
+    to the same file and a file's lines are in time order. How often
+    appended lines reach the disk is ``fsync``: after every batch
+    (``always``), at most every ``fsync_interval`` seconds (``interval``),
+    or when the OS gets to it (``never``).
+    """
+
+    name = 'segments'
+    transient = (OSError,)
+
+    def __init__(self, directory, segment_bytes, fsync, fsync_interval):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._pid = None
+        self._synced_at = 0.0
+
+    def _segment(self):
+        if self._file is not None and self._pid == os.getpid() and self._file.tell() < self.segment_bytes:
+            return self._file
+        if self._file is not None and self._pid == os.getpid():
+            self._sync(force=True)
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        name = f'events-{utcnow():%Y%m%dT%H%M%S%f}-{os.getpid()}.jsonl'
+        self._file = open(os.path.join(self.directory, name), 'a', encoding='utf-8')
+        self._pid = os.getpid()
+        return self._file
+
+    def _sync(self, force=False):
+        if self.fsync == 'never' and not force:
+            return
+        if self.fsync == 'interval' and not force and time.monotonic() - self._synced_at < self.fsync_interval:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced_at = time.monotonic()
+
+    def write(self, events):
+        segment = self._segment()
+        segment.write(''.join(json.dumps({**event, 'occurred_at': event['occurred_at'].isoformat()},
+                                         separators=(',', ':')) + '\n' for event in events))
+        segment.flush()
+        self._sync()
+
+    def close(self):
+        if self._file is not None and self._pid == os.getpid():
+            self._sync(force=True)
+            self._file.close()
+        self._file = None
+
+    def _read(self, path):
+        with open(path, encoding='utf-8') as segment:
+            for line in segment:
+                # A line cut short by a crash mid-write ends the segment
+                if not line.endswith('\n'):
+                    return
+                event = json.loads(line)
+                event['occurred_at'] = datetime.fromisoformat(event['occurred_at'])
+                yield event
+
+    def replay(self, entity_type=None, entity_id=None, since=None, until=None, after=None):
+        paths = sorted(glob.glob(os.path.join(self.directory, 'events-*.jsonl')))
+        for event in heapq.merge(*(self._read(path) for path in paths), key=lambda event: event['occurred_at']):
+            if ((entity_type is None or event['entity_type'] == entity_type)
+                    and (entity_id is None or event['entity_id'] == entity_id)
+                    and (since is None or event['occurred_at'] >= since)
+                    and (until is None or event['occurred_at'] < until)
+                    and (after is None or event['occurred_at'] > after[0])):
+                yield event
+
+
+class AuditLog:
+    """Write-behind log of who changed what.
+
+    ``record()`` only appends the event to an in-memory buffer; the
+    request pays no query and no commit for it. A thread in each worker
+    writes the buffer out every ``AUDIT_FLUSH_INTERVAL`` seconds, or as
+    soon as ``AUDIT_BATCH_SIZE`` events are waiting, to the append-only
+    audit_events table or to segment files. A failed write keeps the batch
+    for the next attempt; an event the sink can never take is logged and
+    dropped. Past ``AUDIT_MAX_PENDING`` events the recording request
+    flushes itself, so a stalled writer slows requests rather than growing
+    the buffer. Events still buffered are written at exit, but a
+    crash loses at most the last interval's worth. Events and batches are
+    counted in ``audit_events_total`` and ``audit_batches_total`` on /metrics.
+
+    Config:
+        AUDIT_ENABLED         default True
+        AUDIT_SINK            'table' (default) or 'segments'
+        AUDIT_DIR             segment directory, default ``<instance>/audit``
+        AUDIT_BATCH_SIZE      events that trigger a flush, default 500
+        AUDIT_FLUSH_INTERVAL  seconds between flushes, default 1; 0 writes each event inside its request
+        AUDIT_MAX_PENDING     buffered events before a request flushes inline, default 10000
+        AUDIT_FSYNC           segments only: 'always', 'interval' (default) or 'never'
+        AUDIT_FSYNC_INTERVAL  seconds between fsyncs under 'interval', default 1
+        AUDIT_SEGMENT_BYTES   size at which a new segment file is started, default 64 MB
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.batch_size = 500
+        self.interval = 1.0
+        self.max_pending = 10000
+        self.sink = TableSink()
+        self._app = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self.outcomes = metrics.counter('audit_events_total',
+                                        'Audit events recorded, written out, dropped as unwritable, or failed to write')
+        self.batches = metrics.counter('audit_batches_total',
+                                       'Batches of audit events written, one transaction or append each')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('AUDIT_ENABLED', True))
+        self.batch_size = int(app.config.get('AUDIT_BATCH_SIZE', 500))
+        self.interval = float(app.config.get('AUDIT_FLUSH_INTERVAL', 1.0))
+        self.max_pending = int(app.config.get('AUDIT_MAX_PENDING', 10000))
+        sink = app.config.get('AUDIT_SINK') or 'table'
+        fsync = app.config.get('AUDIT_FSYNC') or 'interval'
+        if sink not in SINKS or fsync not in FSYNC_POLICIES:
+            raise ValueError(f'AUDIT_SINK must be one of {", ".join(SINKS)}, '
+                             f'AUDIT_FSYNC one of {", ".join(FSYNC_POLICIES)}')
+        if sink == 'segments':
+            self.sink = SegmentSink(app.config.get('AUDIT_DIR') or os.path.join(app.instance_path, 'audit'),
+                                    int(app.config.get('AUDIT_SEGMENT_BYTES', 64 * 1024 * 1024)),
+                                    fsync, float(app.config.get('AUDIT_FSYNC_INTERVAL', 1.0)))
+        else:
+            self.sink = TableSink()
+        self._app = app
+
+    def record(self, entity_type, entity_id, action, changes=None):
+        """Buffer one event: ``action`` ('created', 'updated', ...) on the row ``entity_id`` of ``entity_type``."""
+        if not self.enabled:
+            return
+        event = {
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'action': action,
+            'actor_id': current_actor(),
+            'remote_addr': request.remote_addr if has_request_context() else None,
+            # Round-tripped now, so a value the sinks cannot encode fails here as a string, not at every flush
+            'changes': None if changes is None else json.loads(json.dumps(changes, default=str)),
+        }
+        with self._lock:
+            # Stamped under the lock, so the buffer, and every segment, is in time order
+            event['occurred_at'] = utcnow()
+            self._pending.append(event)
+            pending = len(self._pending)
+        self.outcomes.inc(outcome='recorded')
+
+        if self.interval <= 0 or pending >= self.max_pending:
+            try:
+                self.flush()
+            except Exception:
+                # The change itself is committed; the event stays buffered for the next flush
+                self._app.logger.exception('Writing audit events failed')
+            return
+        self._ensure_started()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write out everything buffered in this process now; returns the number of events written.
+
+        A batch the sink fails on for a transient reason (a locked or
+        unreachable database, a full disk) goes back in front of the buffer
+        and the error is raised. A batch it rejects outright is written one
+        event at a time, and the events it still rejects are logged and
+        dropped, so one bad event cannot stall the log.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            done = written = dropped = 0
+            salvage_until = 0
+            try:
+                while done < len(batch):
+                    size = 1 if done < salvage_until else self.batch_size
+                    chunk = batch[done:done + size]
+                    try:
+                        self.sink.write(chunk)
+                    except self.sink.transient:
+                        raise
+                    except Exception:
+                        if len(chunk) > 1:
+                            salvage_until = done + len(chunk)
+                            continue
+                        dropped += 1
+                        self._app.logger.exception('Dropping an audit event the %s sink rejects: %s',
+                                                   self.sink.name, json.dumps(chunk[0], default=str))
+                    else:
+                        written += len(chunk)
+                        self.batches.inc(sink=self.sink.name)
+                    done += len(chunk)
+            except Exception:
+                # Back in front of anything recorded since, so order holds; written chunks are not retried
+                with self._lock:
+                    self._pending[:0] = batch[done:]
+                self.outcomes.inc(len(batch) - done, outcome='failed')
+                raise
+            finally:
+                if written:
+                    self.outcomes.inc(written, outcome='written')
+                if dropped:
+                    self.outcomes.inc(dropped, outcome='dropped')
+            return written
+
+    def _ensure_started(self):
+        # Like the reservation sweeper: one flusher per worker process, started on first use
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='audit-flusher', daemon=True).start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    self._app.logger.exception('Writing audit events failed, retrying next interval')
+                finally:
+                    db.session.remove()
+
+    def close(self):
+        """Write out what is still buffered; called at exit."""
+        if self._app is None:
+            return
+        with self._app.app_context():
+            try:
+                self.flush()
+            finally:
+                db.session.remove()
+        if isinstance(self.sink, SegmentSink):
+            self.sink.close()
+
+    def replay(self, entity_type=None, entity_id=None, since=None, until=None, after=None):
+        """Every written event matching the filters, oldest first, as dicts.
+
+        ``since`` is inclusive and ``until`` exclusive. ``after`` is
+        ``(occurred_at, id)`` of an event already seen, for paging.
+        """
+        return self.sink.replay(entity_type, entity_id, since, until, after)
+
+    def events(self, entity_type=None, entity_id=None, since=None, until=None, after=None, limit=DEFAULT_LIMIT):
+        """One page of ``replay()`` as ``{'events', 'next_cursor'}``, next_cursor None on the last page.
+
+        Flushes this process's buffer first, so a caller sees the changes
+        its worker has just made.
+        """
+        self.flush()
+        page = list(islice(self.replay(entity_type, entity_id, since, until, after), limit))
+        return {
+            'events': [serialize(event) for event in page],
+            'next_cursor': encode_cursor(page[-1]) if len(page) == limit else None,
+        }
+
+
+def encode_cursor(event):
+    # Segment events have no id; their cursor pages on time alone
+    return f'{event["occurred_at"].isoformat()},{event.get("id", 0)}'
+
+
+def decode_cursor(cursor):
+    occurred_at, _, event_id = cursor.rpartition(',')
+    try:
+        return datetime.fromisoformat(occurred_at), int(event_id)
+    except ValueError:
+        raise ValueError('after must be a next_cursor from a previous page')
+
+
+def parse_time(value, name='time'):
+    """An ISO date or time, taken as UTC when it has no offset, as a naive UTC datetime."""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO time like 2024-01-31T12:00:00')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def audit_args():
+    """The ``events()`` arguments from the query string: entity, id, from, to, limit and after.
+
+    Raises ValueError with a client-facing message on bad input.
+    """
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+    entity_id = request.args.get('id')
+    if entity_id is not None and not entity_id.isdigit():
+        raise ValueError('id must be an integer')
+    after = request.args.get('after')
+    return {
+        'entity_type': request.args.get('entity'),
+        'entity_id': None if entity_id is None else int(entity_id),
+        'since': parse_time(request.args.get('from'), 'from'),
+        'until': parse_time(request.args.get('to'), 'to'),
+        'after': after and decode_cursor(after),
+        'limit': limit,
+    }
+
+
+def serialize(event):
+    return {**event, 'occurred_at': event['occurred_at'].replace(tzinfo=timezone.utc).isoformat()}
+
+
+audit_cli = AppGroup('audit', help='The write-behind audit log.')
+
+
+@audit_cli.command('replay')
+@click.option('--entity', help='Entity type, e.g. order, orderitem, customer or item.')
+@click.option('--id', 'entity_id', type=int, help='Entity id.')
+@click.option('--from', 'since', help='ISO time, inclusive (UTC).')
+@click.option('--to', 'until', help='ISO time, exclusive (UTC).')
+def replay_command(entity, entity_id, since, until):
+    """Print events oldest first as NDJSON, e.g. to rebuild state or load them elsewhere."""
+    try:
+        since, until = parse_time(since, '--from'), parse_time(until, '--to')
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    for event in audit_log.replay(entity, entity_id, since, until):
+        click.echo(json.dumps(serialize(event), separators=(',', ':')))
+
+
+def init_app(app):
+    audit_log.init_app(app)
+    app.cli.add_command(audit_cli)
+
+
+audit_log = AuditLog()
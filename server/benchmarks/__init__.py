@@ -0,0 +1,152 @@
+# Standard library imports
+import functools
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from random import Random
+
+# Remote library imports
+
+# Anything in this package that imports app.py gets a throwaway in-memory database
+os.environ.setdefault('DATABASE_URI', 'sqlite://')
+
+# Local imports
+from config import create_app, db
+from database import database_config
+from models import Customer, Item, Order, OrderItem
+
+# Synthetic customers never log in, so a fixed (invalid) hash keeps bcrypt out of setup
+SYNTHETIC_PASSWORD_HASH = '$2b$12$' + 'x' * 53
+CATEGORIES = ('firearm', 'accessory', 'ammunition')
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_app(uri='sqlite://', profile='performance'):
+    """App without the HTTP stack, bound to its own database, so benchmarks never touch instance/app.db."""
+    return create_app(database_config({'DATABASE_URI': uri, 'DB_PROFILE': profile}))
+
+
+def populate(rows, seed=0, password_hash=SYNTHETIC_PASSWORD_HASH):
+    """Create the schema and insert ``rows`` records into every table."""
+    rng = Random(seed)
+    start = datetime(2024, 1, 1)
+
+    db.create_all()
+    db.session.execute(db.insert(Customer), [
+        {'id': i, 'name': f'Customer {i}', 'username': f'customer{i}', 'wallet': float(rng.randint(0, 5000)),
+         'admin': i % 50 == 0, '_password_hash': password_hash}
+        for i in range(1, rows + 1)
+    ])
+    db.session.execute(db.insert(Item), [
+        {'id': i, 'title': f'Item {i}', 'img_url': f'https://example.com/{i}.jpg', 'description': f'Synthetic item {i}',
+         'category': CATEGORIES[i % len(CATEGORIES)], 'price': rng.randint(1, 1000)}
+        for i in range(1, rows + 1)
+    ])
+    db.session.execute(db.insert(Order), [
+        {'id': i, 'customer_id': rng.randint(1, rows), 'total': float(rng.randint(1, 5000)),
+         'created_at': start + timedelta(minutes=i)}
+        for i in range(1, rows + 1)
+    ])
+    db.session.execute(db.insert(OrderItem), [
+        {'id': i, 'quantity': rng.randint(1, 5), 'order_id': rng.randint(1, rows), 'item_id': rng.randint(1, rows),
+         'created_at': start + timedelta(minutes=i)}
+        for i in range(1, rows + 1)
+    ])
+    db.session.commit()
+
+
+def timed(func, repeat=3):
+    """Best wall-clock time of ``repeat`` calls, and the last result."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - began)
+    return best, result
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return float('nan')
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+@contextmanager
+def serve(database_uri, port=5556, command=None, **env):
+    """Run app.py in a separate process against ``database_uri`` and yield its base URL.
+
+    ``env`` entries are passed to the server as environment variables, which
+    is how benchmarks switch config such as PASSWORD_HASH_EXECUTOR. Rate
+    limiting is off unless ``RATELIMIT_ENABLED=1`` is passed, since every
+    benchmark client shares one IP.
+    """
+    command = command or [sys.executable, '-c', f'from app import create_app; create_app().run(port={port}, threaded=True)']
+    environ = {**os.environ, 'DATABASE_URI': database_uri, 'RATELIMIT_ENABLED': '0', **{k: str(v) for k, v in env.items()}}
+    process = subprocess.Popen(command, cwd=SERVER_DIR, env=environ, start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                http(base_url, 'GET', '/')
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError('benchmark server did not start')
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        # The server's own children (worker pools) live in its session too
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def http_response(base_url, method, path, body=None, headers=None):
+    """Send one request; returns ``(status, seconds, parsed JSON or None, response headers)``."""
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    req = urllib.request.Request(base_url + path, data=data, method=method, headers=headers or {})
+    if data is not None:
+        req.add_header('Content-Type', 'application/json')
+
+    began = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            status, payload, response_headers = response.status, response.read(), response.headers
+    except urllib.error.HTTPError as e:
+        status, payload, response_headers = e.code, e.read(), e.headers
+    elapsed = time.perf_counter() - began
+
+    try:
+        parsed = json.loads(payload) if payload else None
+    except ValueError:
+        parsed = None
+    return status, elapsed, parsed, response_headers
+
+
+def http(base_url, method, path, body=None, headers=None):
+    """Send one request; returns ``(status, seconds, parsed JSON or None)``."""
+    return http_response(base_url, method, path, body, headers)[:3]
+
+
+@functools.cache
+def token_app():
+    from app import create_app
+    return create_app()
+
+
+def access_token(customer_id, username=None, admin=False, version=1):
+    """Mint a JWT for a synthetic customer without going through bcrypt at /login."""
+    from flask_jwt_extended import create_access_token
+
+    customer = Customer(id=customer_id, username=username or f'customer{customer_id}', admin=admin, version=version)
+    with token_app().app_context():
+        return create_access_token(identity=customer)
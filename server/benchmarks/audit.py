@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Audit log: what recording who changed what costs the request path.
+
+--clients clients adjust wallets and edit order lines for --seconds, with
+audit events written behind the requests by each worker's flusher thread
+(``behind``) or in their own transaction inside each request
+(``inline``, AUDIT_FLUSH_INTERVAL=0), as a synchronous audit row per
+handler would. Reports write latency and throughput, how many batches the
+events took, and checks every write has its event.
+
+Run from the server directory:
+
+    python -m benchmarks.audit --clients 8 --seconds 5
+"""
+
+# Standard library imports
+import argparse
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.request
+from itertools import count
+from random import Random
+
+# Remote library imports
+
+# Local imports
+from benchmarks import make_app, populate, serve, http, access_token, percentile
+
+OUTCOME = re.compile(r'audit_events_total\{outcome="(\w+)"\} (\d+)')
+BATCHES = re.compile(r'audit_batches_total\{sink="\w+"\} (\d+)')
+
+
+def writer(base_url, headers, rows, seed, until, stats):
+    rng = Random(seed)
+    # A quantity no other write sets, so every PATCH is a change and records an event
+    quantities = count(seed * 1_000_000 + 1)
+    while time.monotonic() < until:
+        if rng.random() < 0.5:
+            status, elapsed, _ = http(base_url, 'POST', f'/customers/{rng.randint(1, rows)}/wallet',
+                                      {'amount': rng.choice((-1, 1))}, headers)
+        else:
+            status, elapsed, _ = http(base_url, 'PATCH', f'/orderitems/{rng.randint(1, rows)}',
+                                      {'quantity': next(quantities)}, {'If-Match': '*'})
+        stats.append((status, elapsed))
+
+
+def count_events(base_url, headers):
+    """Every event on record, paging through GET /audit, which flushes its worker's buffer first."""
+    total, cursor = 0, None
+    while True:
+        _, _, page = http(base_url, 'GET', '/audit?limit=1000' + (f'&after={cursor}' if cursor else ''), None, headers)
+        total += len(page['events'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return total
+
+
+def run(mode, rows, clients, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        with make_app(database_uri).app_context():
+            populate(rows)
+        headers = {'Authorization': f'Bearer {access_token(rows, admin=True)}'}
+
+        stats = []
+        interval = {'AUDIT_FLUSH_INTERVAL': 0} if mode == 'inline' else {}
+        with serve(database_uri, **interval) as base_url:
+            until = time.monotonic() + seconds
+            threads = [threading.Thread(target=writer, args=(base_url, headers, rows, seed, until, stats))
+                       for seed in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            events = count_events(base_url, headers)
+            with urllib.request.urlopen(base_url + '/metrics', timeout=60) as response:
+                text = response.read().decode()
+            outcomes = {outcome: int(total) for outcome, total in OUTCOME.findall(text)}
+            batches = sum(int(total) for total in BATCHES.findall(text))
+
+    # Wallet debits that would overdraw get 402 and change nothing, so record nothing
+    writes = sum(1 for status, _ in stats if status < 300)
+    latencies = [elapsed for _, elapsed in stats]
+    print(f'\n{mode}: {clients} clients for {seconds:.0f}s, {rows} rows')
+    print(f'  {len(stats)} writes ({len(stats) / seconds:.1f} req/s), '
+          f'p50 {percentile(latencies, 50) * 1000:.1f}ms, p95 {percentile(latencies, 95) * 1000:.1f}ms')
+    print(f'  {events} events for {writes} successful writes, '
+          f'{outcomes.get("written", 0)} written in {batches} batches')
+    return events != writes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['behind', 'inline'], choices=['behind', 'inline'])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    failed = [mode for mode in args.modes if run(mode, args.rows, args.clients, args.seconds)]
+    if failed:
+        raise SystemExit(f'writes without an audit event in: {", ".join(failed)}')
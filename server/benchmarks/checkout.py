@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Concurrent checkouts against one wallet: /checkout versus the per-row legacy flow.
+
+Every client buys from the same customer's wallet until it runs out, then
+the wallet is compared with the orders actually written. The legacy flow
+(client-computed total, POST /orders, one POST /orderitems per line and a
+blind read-modify-write PATCH of the wallet) loses updates; /checkout must not.
+
+Run from the server directory:
+
+    python -m benchmarks.checkout --clients 16 --lines 3
+"""
+
+# Standard library imports
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+# Remote library imports
+from sqlalchemy import func, select, update
+
+# Local imports
+from benchmarks import make_app, populate, serve, http, access_token
+from config import db
+from models import Customer, Item, Order
+
+CUSTOMER_ID = 1
+
+
+def checkout_client(base_url, cart, headers, stats):
+    while True:
+        status, _, _ = http(base_url, 'POST', '/checkout', {'items': cart}, headers)
+        stats.append(status)
+        if status != 201:
+            return
+
+
+def legacy_client(base_url, cart, prices, stats):
+    total = float(sum(prices[line['item_id']] * line['quantity'] for line in cart))
+    while True:
+        _, _, customer = http(base_url, 'GET', f'/customers/{CUSTOMER_ID}')
+        if customer['wallet'] < total:
+            return
+        _, _, order = http(base_url, 'POST', '/orders', {'customer_id': CUSTOMER_ID, 'total': total})
+        for line in cart:
+            http(base_url, 'POST', '/orderitems', {**line, 'order_id': order['id']})
+        # If-Match: * is the old blind overwrite of whatever balance is there now
+        status, _, _ = http(base_url, 'PATCH', f'/customers/{CUSTOMER_ID}', {'wallet': customer['wallet'] - total},
+                            {'If-Match': '*'})
+        stats.append(status)
+
+
+def customer_orders():
+    return db.session.execute(
+        select(func.coalesce(func.sum(Order.total), 0), func.count(Order.id))
+        .where(Order.customer_id == CUSTOMER_ID)
+    ).one()
+
+
+def run(mode, clients, lines, wallet):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        bench_app = make_app(database_uri)
+        with bench_app.app_context():
+            populate(max(lines, 100))
+            db.session.execute(update(Customer).where(Customer.id == CUSTOMER_ID).values(wallet=wallet))
+            db.session.commit()
+            prices = dict(db.session.execute(select(Item.id, Item.price)).all())
+            spent_before, orders_before = customer_orders()
+
+        cart = [{'item_id': item_id, 'quantity': 1} for item_id in range(1, lines + 1)]
+        headers = {'Authorization': f'Bearer {access_token(CUSTOMER_ID)}'}
+
+        stats = []
+        with serve(database_uri) as base_url:
+            if mode == 'checkout':
+                target, args = checkout_client, (base_url, cart, headers, stats)
+            else:
+                target, args = legacy_client, (base_url, cart, prices, stats)
+            threads = [threading.Thread(target=target, args=args) for _ in range(clients)]
+            began = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+
+        with bench_app.app_context():
+            balance = db.session.get(Customer, CUSTOMER_ID).wallet
+            spent, orders = customer_orders()
+            spent, orders = spent - spent_before, orders - orders_before
+
+    lost = (wallet - spent) - balance
+    print(f'\n{mode}: {clients} clients, {lines} lines per cart')
+    print(f'  {orders} orders in {elapsed:.2f}s ({orders / elapsed:.1f} orders/s)')
+    print(f'  wallet {balance:.2f}, expected {wallet - spent:.2f}, unaccounted {lost:.2f}')
+    if mode == 'checkout' and (abs(lost) > 1e-6 or balance < 0):
+        raise SystemExit('checkout lost or overdrew wallet updates')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['checkout', 'legacy'], choices=['checkout', 'legacy'])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--lines', type=int, default=3)
+    parser.add_argument('--wallet', type=float, default=500_000)
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        run(mode, args.clients, args.lines, args.wallet)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Many writers on one row: If-Match PATCHes and atomic wallet increments lose no updates.
+
+``patch``: every client adds 1 to the same item's price --ops times, each
+time reading it (GET, ETag) and writing it back with If-Match, retrying on
+412. The final price must be the start plus every accepted PATCH.
+
+``blind``: the same with ``If-Match: *``, i.e. the old unconditional
+PATCH, to show the updates that optimistic locking saves.
+
+``wallet``: half the clients credit one wallet through
+POST /customers/<id>/wallet while the other half spend it at /checkout.
+The final balance must be the start plus credits minus orders.
+
+Run from the server directory:
+
+    python -m benchmarks.contention --clients 32 --ops 25
+"""
+
+# Standard library imports
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+# Remote library imports
+from sqlalchemy import func, select, update
+
+# Local imports
+from benchmarks import make_app, populate, serve, http, http_response, access_token
+from config import db
+from models import Customer, Item, Order
+
+ITEM_ID = 1
+CUSTOMER_ID = 1
+ADMIN_ID = 2
+
+
+def increment_price(base_url, ops, if_match, stats):
+    done = 0
+    while done < ops:
+        _, _, item, headers = http_response(base_url, 'GET', f'/items/{ITEM_ID}')
+        status, _, _ = http(base_url, 'PATCH', f'/items/{ITEM_ID}', {'price': item['price'] + 1},
+                            {'If-Match': headers['ETag'] if if_match else '*'})
+        stats.append(status)
+        if status == 202:
+            done += 1
+        elif status != 412:
+            raise RuntimeError(f'PATCH /items/{ITEM_ID} returned {status}')
+
+
+def credit_wallet(base_url, ops, headers, stats):
+    for _ in range(ops):
+        status, _, _ = http(base_url, 'POST', f'/customers/{CUSTOMER_ID}/wallet', {'amount': 1}, headers)
+        stats.append(status)
+
+
+def spend_wallet(base_url, ops, headers, stats):
+    for _ in range(ops):
+        status, _, _ = http(base_url, 'POST', '/checkout', {'items': [{'item_id': ITEM_ID, 'quantity': 1}]}, headers)
+        stats.append(status)
+
+
+def customer_orders():
+    return db.session.execute(
+        select(func.coalesce(func.sum(Order.total), 0), func.count(Order.id))
+        .where(Order.customer_id == CUSTOMER_ID)
+    ).one()
+
+
+def run_threads(targets):
+    threads = [threading.Thread(target=target, args=args) for target, args in targets]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - began
+
+
+def run(mode, clients, ops, wallet):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        bench_app = make_app(database_uri)
+        with bench_app.app_context():
+            populate(100)
+            db.session.execute(update(Customer).where(Customer.id == CUSTOMER_ID).values(wallet=wallet))
+            db.session.commit()
+            price = db.session.get(Item, ITEM_ID).price
+            spent_before, orders_before = customer_orders()
+
+        stats = []
+        with serve(database_uri) as base_url:
+            if mode == 'wallet':
+                admin = {'Authorization': f'Bearer {access_token(ADMIN_ID, admin=True)}'}
+                customer = {'Authorization': f'Bearer {access_token(CUSTOMER_ID)}'}
+                targets = [(credit_wallet, (base_url, ops, admin, stats)) if client % 2 else
+                           (spend_wallet, (base_url, ops, customer, stats)) for client in range(clients)]
+            else:
+                targets = [(increment_price, (base_url, ops, mode == 'patch', stats))] * clients
+            elapsed = run_threads(targets)
+
+        with bench_app.app_context():
+            final_price = db.session.get(Item, ITEM_ID).price
+            balance = db.session.get(Customer, CUSTOMER_ID).wallet
+            spent, orders = customer_orders()
+            spent, orders = spent - spent_before, orders - orders_before
+
+    print(f'\n{mode}: {clients} clients x {ops} ops, {len(stats)} requests in {elapsed:.2f}s '
+          f'({len(stats) / elapsed:.1f} req/s)')
+    if mode == 'wallet':
+        credits = sum(1 for status in stats if status == 200)
+        expected = wallet + credits - spent
+        lost = expected - balance
+        print(f'  {credits} credits, {orders} orders, wallet {balance:.2f}, expected {expected:.2f}, '
+              f'unaccounted {lost:.2f}')
+    else:
+        accepted = stats.count(202)
+        lost = price + accepted - final_price
+        print(f'  {accepted} PATCHes accepted, {stats.count(412)} retried after 412, '
+              f'price {final_price}, expected {price + accepted}, lost {lost}')
+    return lost
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['patch', 'blind', 'wallet'], choices=['patch', 'blind', 'wallet'])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--ops', type=int, default=25, help='writes per client; PATCHes retried after 412 do not count')
+    parser.add_argument('--wallet', type=float, default=1_000_000)
+    args = parser.parse_args()
+
+    failed = [mode for mode in args.modes if abs(run(mode, args.clients, args.ops, args.wallet)) > 1e-6 and mode != 'blind']
+    if failed:
+        raise SystemExit(f'lost updates in: {", ".join(failed)}')
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Flash sale on one item: many buyers, limited stock, and not one unit oversold.
+
+Each client is its own customer and buys one unit at a time until the
+item is sold out. ``checkout`` buys straight away. ``reserve`` first
+reserves the unit, then checks out, and walks away from a share of its
+reservations (--abandon), which the server's sweep must put back on sale.
+Afterwards every unit must be sold, reserved or still in stock, exactly
+once.
+
+Run from the server directory:
+
+    python -m benchmarks.hot_sku --clients 64 --stock 500
+"""
+
+# Standard library imports
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+# Remote library imports
+from sqlalchemy import func, insert, select, update
+
+# Local imports
+from benchmarks import make_app, populate, serve, http, access_token
+from config import db
+from models import Customer, ItemStock, OrderItem, Reservation
+
+ITEM_ID = 1
+CART = {'items': [{'item_id': ITEM_ID, 'quantity': 1}]}
+RESERVATION_TTL = 1
+SWEEP_INTERVAL = 0.5
+
+
+def buyer(base_url, headers, reserve, abandon, stats):
+    # Sold out only counts once abandoned reservations have had time to come back
+    give_up = RESERVATION_TTL + 3 * SWEEP_INTERVAL if reserve else 0
+    sold_out_since = None
+    while True:
+        if reserve:
+            status, elapsed, _ = http(base_url, 'POST', '/reservations', CART, headers)
+            if status == 201 and random.random() < abandon:
+                stats.append(('abandoned', elapsed))
+                continue
+            if status == 201:
+                status, more, _ = http(base_url, 'POST', '/checkout', CART, headers)
+                elapsed += more
+        else:
+            status, elapsed, _ = http(base_url, 'POST', '/checkout', CART, headers)
+
+        if status == 201:
+            stats.append(('sold', elapsed))
+            sold_out_since = None
+        elif status == 409:
+            stats.append(('sold out', elapsed))
+            sold_out_since = sold_out_since or time.monotonic()
+            if time.monotonic() - sold_out_since >= give_up:
+                return
+            time.sleep(0.1)
+        else:
+            raise RuntimeError(f'buying returned HTTP {status}')
+
+
+def units_sold():
+    return db.session.execute(
+        select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.item_id == ITEM_ID)
+    ).scalar()
+
+
+def run(mode, clients, stock, abandon):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        bench_app = make_app(database_uri)
+        with bench_app.app_context():
+            populate(max(clients, 100))
+            db.session.execute(update(Customer).values(wallet=1e12))
+            db.session.execute(insert(ItemStock).values(item_id=ITEM_ID, quantity=stock))
+            db.session.commit()
+            sold_before = units_sold()
+
+        headers = [{'Authorization': f'Bearer {access_token(customer_id)}'} for customer_id in range(1, clients + 1)]
+        stats = []
+        # Every buyer writes to the same SQLite file; with this many threads in one process the
+        # default 5 s busy_timeout can run out for an unlucky waiter, which would be a 500, not a sale
+        with serve(database_uri, RESERVATION_TTL=RESERVATION_TTL, RESERVATION_SWEEP_INTERVAL=SWEEP_INTERVAL,
+                   SQLITE_BUSY_TIMEOUT=30000) as base_url:
+            threads = [threading.Thread(target=buyer, args=(base_url, headers[client], mode == 'reserve', abandon, stats))
+                       for client in range(clients)]
+            began = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+
+        with bench_app.app_context():
+            sold = units_sold() - sold_before
+            left = db.session.get(ItemStock, ITEM_ID).quantity
+            reserved = db.session.execute(
+                select(func.coalesce(func.sum(Reservation.quantity), 0)).where(Reservation.item_id == ITEM_ID)
+            ).scalar()
+
+    latencies = sorted(seconds for outcome, seconds in stats if outcome == 'sold')
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0
+    outcomes = {outcome: sum(1 for name, _ in stats if name == outcome) for outcome in ('sold', 'sold out', 'abandoned')}
+    print(f'\n{mode}: {clients} clients, {stock} units')
+    print(f'  {sold} sold in {elapsed:.2f}s ({sold / elapsed:.1f} units/s, p95 {p95:.1f}ms per purchase)')
+    print(f'  {outcomes["sold out"]} sold-out answers, {outcomes["abandoned"]} reservations abandoned')
+    print(f'  left in stock {left}, still reserved {reserved}, oversold {max(0, sold - stock)}')
+    return sold > stock or sold + left + reserved != stock
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['checkout', 'reserve'], choices=['checkout', 'reserve'])
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--stock', type=int, default=500)
+    parser.add_argument('--abandon', type=float, default=0.2, help='share of reservations never checked out')
+    args = parser.parse_args()
+
+    failed = [mode for mode in args.modes if run(mode, args.clients, args.stock, args.abandon)]
+    if failed:
+        raise SystemExit(f'stock not accounted for in: {", ".join(failed)}')
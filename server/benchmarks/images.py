@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Item images: upload latency, time to render every variant, bytes per catalog page and serving rate.
+
+Uploads --images distinct photo-sized JPEGs to as many items, with
+variants rendered by the background pool (``pool``) or inside the upload
+request (``inline``, IMAGE_WORKERS=0). It then compares what one catalog
+page of those images weighs as originals and as the variants /items now
+links to, and has --clients clients fetch variants for a few seconds, half
+of them revalidating with If-None-Match as a browser would.
+
+Run from the server directory:
+
+    python -m benchmarks.images --images 24 --clients 8
+"""
+
+# Standard library imports
+import argparse
+import io
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Remote library imports
+from PIL import Image
+
+# Local imports
+from benchmarks import make_app, populate, serve, http, access_token, percentile
+
+
+def photo(seed, size):
+    """A JPEG that compresses like a photograph: smooth shapes under sensor-like noise."""
+    base = Image.radial_gradient('L').resize(size).rotate(seed * 37 % 360)
+    noise = Image.effect_noise(size, 12 + seed % 8)
+    image = Image.merge('RGB', (base, Image.blend(base, noise, 0.3), Image.blend(base, noise, 0.15)))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def raw(base_url, method, path, data=None, headers=None):
+    """Send one request with a raw body; returns ``(status, seconds, body bytes)``."""
+    req = urllib.request.Request(base_url + path, data=data, method=method, headers=headers or {})
+    began = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, e.read()
+    return status, time.perf_counter() - began, payload
+
+
+def variant_files(store):
+    return sum(len(files) for _, _, files in os.walk(os.path.join(store, 'variants')))
+
+
+def fetch_variants(base_url, urls, revalidate, until, stats):
+    etags = {}
+    index = 0
+    while time.monotonic() < until:
+        url = urls[index % len(urls)]
+        index += 1
+        headers = {'If-None-Match': etags[url]} if revalidate and url in etags else {}
+        req = urllib.request.Request(base_url + url, headers=headers)
+        began = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                status, size = response.status, len(response.read())
+                etags[url] = response.headers['ETag']
+        except urllib.error.HTTPError as e:
+            status, size = e.code, 0
+        stats.append((status, time.perf_counter() - began, size))
+
+
+def run(mode, images, size, clients, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        store = os.path.join(tmp, 'images')
+        with make_app(database_uri).app_context():
+            populate(max(images, 100))
+        photos = [photo(seed, size) for seed in range(images)]
+        headers = {'Authorization': f'Bearer {access_token(50, admin=True)}', 'Content-Type': 'image/jpeg'}
+
+        workers = {'IMAGE_WORKERS': 0} if mode == 'inline' else {}
+        with serve(database_uri, IMAGE_STORE=store, **workers) as base_url:
+            began = time.perf_counter()
+            uploads = []
+            for item_id, data in enumerate(photos, start=1):
+                status, elapsed, _ = raw(base_url, 'PUT', f'/items/{item_id}/image', data, headers)
+                if status != 200:
+                    raise RuntimeError(f'PUT /items/{item_id}/image returned {status}')
+                uploads.append(elapsed)
+            _, _, items = http(base_url, 'GET', '/items')
+            expected = images * len(items[0]['image_variants'])
+            while variant_files(store) < expected:
+                time.sleep(0.05)
+            rendered = time.perf_counter() - began
+
+            catalog = [item for item in items if item['image_variants']]
+            page = sum(len(raw(base_url, 'GET', item['img_url'])[2]) for item in catalog)
+            urls = [variant['url'] for item in catalog for variant in item['image_variants']]
+            stats = []
+            until = time.monotonic() + seconds
+            threads = [threading.Thread(target=fetch_variants, args=(base_url, urls, client % 2 == 1, until, stats))
+                       for client in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+    originals = sum(len(data) for data in photos)
+    latencies = [elapsed for status, elapsed, _ in stats if status == 200]
+    print(f'\n{mode}: {images} images of {size[0]}x{size[1]}')
+    print(f'  upload p50 {percentile(uploads, 50) * 1000:.1f}ms, p95 {percentile(uploads, 95) * 1000:.1f}ms, '
+          f'all {expected} variants ready after {rendered:.2f}s')
+    print(f'  catalog page images: originals {originals / 1024:.0f} KB, img_url variants {page / 1024:.0f} KB')
+    print(f'  variant GETs: {len(stats) / seconds:.0f} req/s, {sum(1 for status, _, _ in stats if status == 304)} '
+          f'answered 304, p95 {percentile(latencies, 95) * 1000:.1f}ms for a full body')
+    return any(status not in (200, 304) for status, _, _ in stats)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['pool', 'inline'], choices=['pool', 'inline'])
+    parser.add_argument('--images', type=int, default=24)
+    parser.add_argument('--size', type=int, nargs=2, default=[2400, 1600], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    failed = [mode for mode in args.modes if run(mode, args.images, tuple(args.size), args.clients, args.seconds)]
+    if failed:
+        raise SystemExit(f'variant requests failed in: {", ".join(failed)}')
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""HTTP load test of every route, with latency percentiles saved to JSON and compared to a baseline.
+
+app.py is served in its own process against a generated database. Each
+route is driven by concurrent clients for a fixed time. The results
+(requests/s, p50/p95/p99 and the status codes seen) go to --output. With
+--baseline, any route whose p95 grows or whose throughput drops by more
+than --tolerance is reported, and the run exits non-zero.
+
+Run from the server directory:
+
+    python -m benchmarks.load --rows 10000 --clients 8 --output load.json
+    python -m benchmarks.load --baseline load.json
+    python -m benchmarks.load --compare load.json other.json
+    python -m benchmarks.load --server gunicorn --workers 4 --threads 8
+"""
+
+# Standard library imports
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from random import Random
+
+# Remote library imports
+import bcrypt
+from sqlalchemy import update
+
+# Local imports
+from benchmarks import CATEGORIES, make_app, populate, serve, http, percentile, access_token
+from config import db
+from models import Customer
+
+PASSWORD = 'load-test-password'
+
+
+def scenarios(rows):
+    """Route name -> function(rng, serial) returning (method, path, body, headers).
+
+    Ids are drawn at random so caches see realistic key spread, and writes
+    use fresh names so they never collide.
+    """
+    token = {'Authorization': f'Bearer {access_token(1)}'}
+    cursor = rows // 2
+    return {
+        'GET /items': lambda rng, n: ('GET', '/items', None, None),
+        'GET /items?limit': lambda rng, n: ('GET', f'/items?limit=50&after={rng.randint(0, cursor)}', None, None),
+        'GET /items/<category>': lambda rng, n: ('GET', f'/items/{rng.choice(CATEGORIES)}', None, None),
+        'GET /items/<id>': lambda rng, n: ('GET', f'/items/{rng.randint(1, rows)}', None, None),
+        'GET /orders': lambda rng, n: ('GET', '/orders', None, None),
+        'GET /orders?limit': lambda rng, n: ('GET', f'/orders?limit=50&after={rng.randint(0, cursor)}', None, None),
+        'GET /orderitems': lambda rng, n: ('GET', '/orderitems', None, None),
+        'GET /orderitems/<id>': lambda rng, n: ('GET', f'/orderitems/{rng.randint(1, rows)}', None, None),
+        'GET /customers': lambda rng, n: ('GET', '/customers', None, None),
+        'GET /customers/<id>': lambda rng, n: ('GET', f'/customers/{rng.randint(1, rows)}', None, None),
+        'GET /check_session': lambda rng, n: ('GET', '/check_session', None, token),
+        'POST /login': lambda rng, n: (
+            'POST', '/login', {'username': f'customer{rng.randint(1, rows)}', 'password': PASSWORD}, None),
+        'POST /signup': lambda rng, n: (
+            'POST', '/signup', {'name': f'Load {n}', 'username': f'load{n}', 'wallet': 100, 'password': PASSWORD}, None),
+        'POST /checkout': lambda rng, n: (
+            'POST', '/checkout', {'items': [{'item_id': rng.randint(1, rows), 'quantity': 1}]}, token),
+    }
+
+
+def drive(base_url, build, clients, seconds, seed):
+    """Run ``clients`` threads against one route for ``seconds``; returns latencies and status counts."""
+    samples, statuses = [], Counter()
+    serial = itertools.count()
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client(rng):
+        mine, seen = [], Counter()
+        while time.monotonic() < deadline:
+            method, path, body, headers = build(rng, next(serial))
+            status, elapsed, _ = http(base_url, method, path, body, headers)
+            mine.append(elapsed)
+            seen[status] += 1
+        with lock:
+            samples.extend(mine)
+            statuses.update(seen)
+
+    threads = [threading.Thread(target=client, args=(Random(seed + n),)) for n in range(clients)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, statuses, time.perf_counter() - began
+
+
+def summarize(samples, statuses, elapsed):
+    ms = [s * 1000 for s in samples]
+    return {
+        'requests': len(ms),
+        'rps': round(len(ms) / elapsed, 2),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def server_command(server, port, workers, threads):
+    """Command line for ``serve``: None means the Werkzeug server, as app.py runs it."""
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(workers), '--threads', str(threads), 'wsgi:app']
+    if server == 'uvicorn':
+        return [sys.executable, '-m', 'uvicorn', '--port', str(port), '--workers', str(workers),
+                '--no-access-log', 'asgi:application']
+    return None
+
+
+def run(rows, clients, seconds, routes, rounds, seed, server='werkzeug', workers=2, threads=4, port=5556):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "load.db")}'
+        pw_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+        with make_app(database_uri).app_context():
+            populate(rows, seed=seed, password_hash=pw_hash)
+            # /checkout buys as customer 1 for the whole run
+            db.session.execute(update(Customer).where(Customer.id == 1).values(wallet=1e12))
+            db.session.commit()
+
+        plan = scenarios(rows)
+        selected = [name for name in plan if not routes or any(route in name for route in routes)]
+        results = {}
+        command = server_command(server, port, workers, threads)
+        with serve(database_uri, port, command, GUNICORN_ACCESS_LOG='') as base_url:
+            for name in selected:
+                results[name] = summarize(*drive(base_url, plan[name], clients, seconds, seed))
+                r = results[name]
+                print(f'{name:<22} {r["rps"]:9.1f} req/s  p50 {r["p50_ms"]:8.2f}ms  p95 {r["p95_ms"]:8.2f}ms  '
+                      f'p99 {r["p99_ms"]:8.2f}ms  {r["statuses"]}')
+
+    return {
+        'config': {'rows': rows, 'clients': clients, 'seconds': seconds, 'bcrypt_rounds': rounds, 'seed': seed,
+                   'server': server, 'workers': workers, 'threads': threads},
+        'platform': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'routes': results,
+    }
+
+
+def compare(baseline, current, tolerance):
+    """Lines describing routes that got slower or lost throughput beyond ``tolerance``."""
+    if baseline.get('config') != current.get('config'):
+        print(f'warning: configs differ\n  baseline {baseline.get("config")}\n  current  {current.get("config")}')
+
+    regressions = []
+    for name, now in current['routes'].items():
+        before = baseline['routes'].get(name)
+        if before is None:
+            continue
+        if now['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {before["p95_ms"]:.2f}ms -> {now["p95_ms"]:.2f}ms')
+        if now['rps'] < before['rps'] * (1 - tolerance):
+            regressions.append(f'{name}: {before["rps"]:.1f} -> {now["rps"]:.1f} req/s')
+    return regressions
+
+
+def load(path):
+    with open(path) as results:
+        return json.load(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5, help='time spent on each route')
+    parser.add_argument('--routes', nargs='*', help='only routes whose name contains one of these')
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost of the synthetic users')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--server', default='werkzeug', choices=['werkzeug', 'gunicorn', 'uvicorn'])
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn/uvicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--output', default='load.json')
+    parser.add_argument('--baseline', help='results file to compare this run against')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='compare two results files and exit')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative change, default 20%%')
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = map(load, args.compare)
+    else:
+        current = run(args.rows, args.clients, args.seconds, args.routes, args.rounds, args.seed,
+                      args.server, args.workers, args.threads)
+        with open(args.output, 'w') as output:
+            json.dump(current, output, indent=2)
+        print(f'results written to {args.output}')
+        baseline = load(args.baseline) if args.baseline else None
+
+    if baseline is not None:
+        regressions = compare(baseline, current, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            raise SystemExit(f'{len(regressions)} regression(s) beyond {args.tolerance:.0%}')
+        print('no regressions')
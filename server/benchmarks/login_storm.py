@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Catalog latency with and without a concurrent /login storm.
+
+Run from the server directory:
+
+    python -m benchmarks.login_storm --executors inline process
+    python -m benchmarks.login_storm --executors process --rate-limit
+"""
+
+# Standard library imports
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+# Remote library imports
+import bcrypt
+
+# Local imports
+from benchmarks import make_app, populate, serve, http, percentile
+
+PASSWORD = 'benchmark-password'
+
+
+def measure_catalog(base_url, seconds):
+    samples = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        status, elapsed, _ = http(base_url, 'GET', '/items/1')
+        if status == 200:
+            samples.append(elapsed)
+    return samples
+
+
+def storm(base_url, clients, stop, counts):
+    def client(n):
+        while not stop.is_set():
+            status, _, _ = http(base_url, 'POST', '/login', {'username': f'customer{n}', 'password': PASSWORD})
+            counts[status] = counts.get(status, 0) + 1
+
+    threads = [threading.Thread(target=client, args=(n + 1,), daemon=True) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def describe(label, samples):
+    ms = [s * 1000 for s in samples]
+    return f'{label:<10} p50 {percentile(ms, 50):7.2f}ms  p95 {percentile(ms, 95):7.2f}ms  n={len(ms)}'
+
+
+def run(database_uri, executor, clients, seconds, rate_limit=False):
+    with serve(database_uri, PASSWORD_HASH_EXECUTOR=executor, RATELIMIT_ENABLED=int(rate_limit)) as base_url:
+        quiet = measure_catalog(base_url, seconds)
+
+        stop, counts = threading.Event(), {}
+        threads = storm(base_url, clients, stop, counts)
+        loaded = measure_catalog(base_url, seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    print(f'\nexecutor={executor}, {clients} login clients, rate limiting {"on" if rate_limit else "off"}')
+    print(describe('quiet', quiet))
+    print(describe('storm', loaded))
+    print(f'login responses: {dict(sorted(counts.items()))} ({sum(counts.values()) / seconds:.1f}/s)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--executors', nargs='+', default=['inline', 'process'])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rate-limit', action='store_true', help='keep the /login rate limits on')
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost of the synthetic users')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        pw_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(args.rounds)).decode('utf-8')
+        with make_app(database_uri).app_context():
+            populate(max(args.clients, 100), password_hash=pw_hash)
+
+        for executor in args.executors:
+            run(database_uri, executor, args.clients, args.seconds, args.rate_limit)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Fail if any SQL issued by the resources in app.py scans a table instead of using an index.
+
+Every route is called through the test client against a generated
+in-memory database. Each SELECT/UPDATE/DELETE it issues is re-run under
+EXPLAIN QUERY PLAN. The only scan allowed is the driving table of an
+unfiltered collection read (``/items`` has to read every item).
+
+Run from the server directory:
+
+    python -m benchmarks.query_plans
+"""
+
+# Standard library imports
+import argparse
+import re
+
+# Remote library imports
+import bcrypt
+from sqlalchemy import event
+
+# Local imports
+from benchmarks import populate, access_token
+from app import create_app
+from config import db
+
+PASSWORD = 'query-plans'
+
+# (method, path, json body, token: False, True or 'admin')
+ROUTES = (
+    ('GET', '/', None, False),
+    ('GET', '/items', None, False),
+    ('GET', '/items?limit=10&after=5', None, False),
+    ('GET', '/items/firearm', None, False),
+    ('GET', '/items/3', None, False),
+    ('GET', '/items/search?q=item+1&category=firearm&min_price=10&max_price=500', None, False),
+    ('GET', '/items/search?min_price=10&max_price=20', None, False),
+    ('GET', '/orders', None, False),
+    ('GET', '/orders?limit=10&after=5', None, False),
+    ('GET', '/orderitems', None, False),
+    ('GET', '/orderitems/3', None, False),
+    ('GET', '/customers', None, False),
+    ('GET', '/customers/3', None, False),
+    ('GET', '/check_session', None, True),
+    ('POST', '/login', {'username': 'customer3', 'password': PASSWORD}, False),
+    ('POST', '/signup', {'name': 'Plan Check', 'username': 'plancheck', 'wallet': 10, 'password': PASSWORD}, False),
+    ('POST', '/items', {'title': 'Plan item', 'img_url': '', 'description': '', 'category': 'accessory', 'price': 5}, False),
+    ('PATCH', '/items/3', {'price': 7}, False),
+    ('DELETE', '/items/4', None, False),
+    ('POST', '/orders', {'customer_id': 3, 'total': 10}, False),
+    ('DELETE', '/orders/5', None, False),
+    ('POST', '/orderitems', {'quantity': 1, 'item_id': 3, 'order_id': 3}, False),
+    ('PATCH', '/orderitems/3', {'quantity': 2}, False),
+    ('DELETE', '/orderitems/4', None, False),
+    ('PATCH', '/customers/3', {'wallet': 1_000_000}, False),
+    ('DELETE', '/customers/6', None, False),
+    ('POST', '/customers/3/wallet', {'amount': -5}, 'admin'),
+    ('GET', '/items/3/stock', None, False),
+    ('POST', '/items/3/stock', {'amount': 5}, 'admin'),
+    ('POST', '/reservations', {'items': [{'item_id': 3, 'quantity': 1}]}, True),
+    ('POST', '/checkout', {'items': [{'item_id': 3, 'quantity': 1}, {'item_id': 7, 'quantity': 2}]}, True),
+    ('GET', '/me/orders', None, True),
+    ('GET', '/customers/3/orders?limit=1&before=2030-01-01T00:00:00,1', None, 'admin'),
+    ('POST', '/reservations', {'items': [{'item_id': 3, 'quantity': 1}]}, True),
+    ('DELETE', '/reservations/2', None, True),
+    ('GET', '/reports/revenue?from=2024-01-01&to=2024-01-31', None, 'admin'),
+    ('GET', '/reports/top-items?limit=5', None, 'admin'),
+    ('GET', '/reports/categories', None, 'admin'),
+    ('GET', '/reports/customers?limit=5', None, 'admin'),
+    ('POST', '/bulk/items/patch', [{'id': 8, 'price': 9}, {'id': 9, 'title': 'Bulk renamed'}], 'admin'),
+    ('POST', '/bulk/items/upsert', [{'id': 10, 'title': 'Bulk upsert', 'category': 'firearm', 'price': 3}], 'admin'),
+    ('POST', '/bulk/orderitems/create', [{'quantity': 1, 'order_id': 3, 'item_id': 8}], 'admin'),
+    ('POST', '/bulk/customers/delete', [11, 12], 'admin'),
+    ('GET', '/audit?entity=order&id=5&from=2024-01-01', None, 'admin'),
+    ('GET', '/audit?from=2024-01-01T00:00:00&to=2030-01-01&after=2024-06-01T00:00:00,1', None, 'admin'),
+    ('DELETE', '/logout', None, True),
+)
+
+SCAN = re.compile(r'^SCAN \w+')
+# An FTS5 table answering a MATCH reports a SCAN of the virtual table with an M constraint
+FTS_MATCH = re.compile(r'^SCAN \w+ VIRTUAL TABLE INDEX \d+:M')
+# Relevance order and facet counts have to sort whatever matched; the matching itself must use an index
+SORTS_ALLOWED = ('/items/search',)
+WHERE = re.compile(r'\bWHERE\b', re.IGNORECASE)
+
+
+def capture(statements):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            statements.append((statement, parameters))
+    return before_cursor_execute
+
+
+def problems(connection, statement, parameters, sorts_allowed=False):
+    """Plan lines that read a whole table or sort without an index."""
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    unfiltered = WHERE.search(statement) is None
+    found = []
+    for number, (_, parent, _, detail) in enumerate(plan):
+        if SCAN.match(detail) and not FTS_MATCH.match(detail) and not (unfiltered and number == 0 and parent == 0):
+            found.append(detail)
+        elif detail.startswith('USE TEMP B-TREE') and not sorts_allowed:
+            found.append(detail)
+    return found
+
+
+def check(rows):
+    tokens = {
+        True: {'Authorization': f'Bearer {access_token(3)}'},
+        'admin': {'Authorization': f'Bearer {access_token(50, admin=True)}'},
+    }
+    # After the tokens: the extensions are shared, so the last app built configures them
+    app = create_app({'PASSWORD_HASH_EXECUTOR': 'inline'})
+    client = app.test_client()
+    failures = 0
+
+    with app.app_context():
+        pw_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8')
+        populate(rows, password_hash=pw_hash)
+        engine = db.engine
+
+    for method, path, body, token in ROUTES:
+        statements = []
+        listener = capture(statements)
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            # PATCH needs If-Match; '*' skips the version check but not its queries
+            headers = {**(tokens.get(token) or {}), **({'If-Match': '*'} if method == 'PATCH' else {})}
+            response = client.open(path, method=method, json=body, headers=headers)
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+        if response.status_code >= 500:
+            print(f'FAIL {method} {path}: HTTP {response.status_code}')
+            failures += 1
+            continue
+
+        found = 0
+        with engine.connect() as connection:
+            for statement, parameters in statements:
+                for detail in problems(connection, statement, parameters, path.startswith(SORTS_ALLOWED)):
+                    found += 1
+                    print(f'FAIL {method} {path}: {detail}\n     {" ".join(statement.split())}')
+        if not found:
+            print(f'ok   {method} {path} ({len(statements)} statements)')
+        failures += found
+
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    args = parser.parse_args()
+
+    failures = check(args.rows)
+    if failures:
+        raise SystemExit(f'{failures} query plan problem(s)')
+    print('all queries use indexes')
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Compare ``to_dict()`` with the precompiled serializers in serializers.py.
+
+Run from the server directory:
+
+    python -m benchmarks.serializers --rows 10000 100000
+"""
+
+# Standard library imports
+import argparse
+
+# Remote library imports
+
+# Local imports
+from benchmarks import make_app, populate, timed
+from config import db
+from images import image_store
+from models import Customer, Item, Order, OrderItem
+from serializers import customer_plan, item_plan, order_plan, order_item_plan
+
+# (name, model, to_dict rules, plan, what the plan adds to to_dict's output or None)
+CASES = (
+    ('customers', Customer, (), customer_plan, None),
+    ('items', Item, ('-order_items',), item_plan, lambda data, row: image_store.with_variants(data, row.image_hash)),
+    ('orders', Order, (), order_plan, None),
+    ('orderitems', OrderItem, (), order_item_plan, None),
+)
+
+
+def run(rows, repeat):
+    bench_app = make_app()
+    with bench_app.app_context():
+        populate(rows)
+        print(f'\n{rows} rows per table')
+        print(f'{"endpoint":<12} {"to_dict":>10} {"plan":>10} {"speedup":>8}')
+
+        for name, model, rules, plan, finish in CASES:
+            def legacy():
+                # Fresh session each round so to_dict pays for its lazy loads like a real request
+                db.session.expunge_all()
+                dumped = []
+                for row in model.query.all():
+                    data = row.to_dict(rules=rules)
+                    if finish is not None:
+                        finish(data, row)
+                    dumped.append(data)
+                return dumped
+
+            legacy_time, expected = timed(legacy, repeat)
+            plan_time, actual = timed(plan.all, repeat)
+            if actual != expected:
+                raise SystemExit(f'{name}: precompiled output differs from to_dict()')
+            print(f'{name:<12} {legacy_time:>9.3f}s {plan_time:>9.3f}s {legacy_time / plan_time:>7.1f}x')
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(rows, args.repeat)
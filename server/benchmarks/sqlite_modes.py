@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Multi-threaded read/write throughput of each SQLite profile in database.py.
+
+Readers page through /orderitems-style joined reads while writers place
+orders through the checkout path, all on one file database.
+
+Run from the server directory:
+
+    python -m benchmarks.sqlite_modes --readers 8 --writers 2 --seconds 10
+"""
+
+# Standard library imports
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+# Remote library imports
+from sqlalchemy.exc import OperationalError
+
+# Local imports
+from benchmarks import make_app, populate
+from checkout import CheckoutError, place_order
+from config import db
+from database import SQLITE_PROFILES
+from serializers import order_item_plan
+
+
+def worker(bench_app, kind, rows, deadline, counts, lock):
+    rng = random.Random()
+    done = errors = 0
+    with bench_app.app_context():
+        while time.monotonic() < deadline:
+            try:
+                if kind == 'read':
+                    order_item_plan.all(after=rng.randint(0, rows), limit=50)
+                else:
+                    cart = [(rng.randint(1, rows), 1) for _ in range(3)]
+                    place_order(rng.randint(1, rows), cart)
+                done += 1
+            except CheckoutError:
+                done += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+            finally:
+                db.session.remove()
+    with lock:
+        counts[kind] += done
+        counts[f'{kind} errors'] += errors
+
+
+def run(profile, rows, readers, writers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = make_app(f'sqlite:///{os.path.join(tmp, "bench.db")}', profile)
+        with bench_app.app_context():
+            populate(rows)
+
+        counts = {'read': 0, 'write': 0, 'read errors': 0, 'write errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+        threads = [
+            threading.Thread(target=worker, args=(bench_app, kind, rows, deadline, counts, lock))
+            for kind in ['read'] * readers + ['write'] * writers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with bench_app.app_context():
+            db.engine.dispose()
+
+    print(f'{profile:<12} reads {counts["read"] / seconds:8.1f}/s  writes {counts["write"] / seconds:7.1f}/s  '
+          f'locked errors r={counts["read errors"]} w={counts["write errors"]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', default=list(SQLITE_PROFILES), choices=list(SQLITE_PROFILES))
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.rows} rows per table')
+    for profile in args.profiles:
+        run(profile, args.rows, args.readers, args.writers, args.seconds)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Promotion launch: many clients ask for the same catalog routes at the same instant.
+
+Every round, an admin PATCH changes an item, which empties the catalog
+cache, and then --clients clients released together GET each of --paths.
+With coalescing on, the first request for a route runs the view and the
+others wait for its response. With it off, every one of them queries and
+serializes the catalog itself. Reports latency, and from /metrics how many
+requests ran the view and how many shared another's response.
+
+Run from the server directory:
+
+    python -m benchmarks.stampede --rows 5000 --clients 32 --rounds 10
+"""
+
+# Standard library imports
+import argparse
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.request
+
+# Remote library imports
+
+# Local imports
+from benchmarks import make_app, populate, serve, http, percentile
+
+ITEM_ID = 1
+OUTCOME = re.compile(r'http_coalesced_requests_total\{endpoint="(\w+)",outcome="(\w+)"\} (\d+)')
+QUERIES = re.compile(r'db_queries_per_request_sum\{endpoint="(items\w*)",method="GET"\} ([\d.]+)')
+
+
+def client(base_url, paths, start, rounds, latencies, failures):
+    for _ in range(rounds):
+        start.wait()
+        for path in paths:
+            status, elapsed, _ = http(base_url, 'GET', path)
+            if status != 200:
+                failures.append((path, status))
+            latencies.append(elapsed)
+        start.wait()
+
+
+def scrape(base_url):
+    with urllib.request.urlopen(base_url + '/metrics', timeout=60) as response:
+        text = response.read().decode()
+    outcomes = {}
+    for _, outcome, count in OUTCOME.findall(text):
+        outcomes[outcome] = outcomes.get(outcome, 0) + int(count)
+    return outcomes, sum(float(total) for _, total in QUERIES.findall(text))
+
+
+def run(coalesce, rows, clients, rounds, paths):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        with make_app(database_uri).app_context():
+            populate(rows)
+
+        latencies, failures = [], []
+        # Every client plus this thread, which changes an item between rounds
+        start = threading.Barrier(clients + 1)
+        with serve(database_uri, COALESCE_ENABLED=int(coalesce)) as base_url:
+            threads = [threading.Thread(target=client, args=(base_url, paths, start, rounds, latencies, failures))
+                       for _ in range(clients)]
+            for thread in threads:
+                thread.start()
+            began = time.perf_counter()
+            for price in range(rounds):
+                http(base_url, 'PATCH', f'/items/{ITEM_ID}', {'price': 100 + price}, {'If-Match': '*'})
+                start.wait()
+                start.wait()
+            elapsed = time.perf_counter() - began
+            for thread in threads:
+                thread.join()
+            outcomes, queries = scrape(base_url)
+
+    requests = clients * rounds * len(paths)
+    print(f'\ncoalescing {"on" if coalesce else "off"}: {clients} clients x {rounds} rounds x {len(paths)} routes, '
+          f'{rows} rows')
+    print(f'  {requests} requests in {elapsed:.2f}s ({requests / elapsed:.1f} req/s), '
+          f'p50 {percentile(latencies, 50) * 1000:.1f}ms, p95 {percentile(latencies, 95) * 1000:.1f}ms')
+    print(f'  view ran {outcomes.get("leader", requests)} times, {outcomes.get("shared", 0)} shared, '
+          f'{outcomes.get("timeout", 0)} timed out waiting; {queries:.0f} SQL statements')
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['on', 'off'], choices=['on', 'off'])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--paths', nargs='+', default=['/items', '/items/firearm', f'/items/{ITEM_ID}'])
+    args = parser.parse_args()
+
+    failed = [mode for mode in args.modes if run(mode == 'on', args.rows, args.clients, args.rounds, args.paths)]
+    if failed:
+        raise SystemExit(f'requests failed with coalescing {", ".join(failed)}')
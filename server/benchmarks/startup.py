@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Cold start: import time of each entry point, and the latency of the app's first requests.
+
+Every sample is a fresh interpreter. Import times come from
+``python -X importtime``: the entry module's cumulative time and the
+heaviest top-level packages it pulled in. The first-request run times
+``import app``, ``create_app()`` and two GETs through the test client,
+against a small generated database. Medians of --repeat runs go to
+--output; with --baseline, anything slower by more than --tolerance is
+reported and the run exits non-zero.
+
+Run from the server directory:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 7 --output startup.json
+    python -m benchmarks.startup --baseline startup.json
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+# Remote library imports
+
+# Local imports
+from benchmarks import SERVER_DIR, make_app, populate
+
+# seed.py and manage.py (the CLI) should not pay for the HTTP stack; wsgi.py is what gunicorn loads
+ENTRY_POINTS = ('config', 'seed', 'manage', 'app', 'wsgi')
+
+FIRST_REQUEST = """
+import json, sys, time
+began = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+timings = []
+for _ in range(2):
+    start = time.perf_counter()
+    status = client.get(sys.argv[1]).status_code
+    timings.append(time.perf_counter() - start)
+print(json.dumps({'status': status, 'import_ms': (imported - began) * 1000, 'create_app_ms': (created - imported) * 1000,
+                  'first_request_ms': timings[0] * 1000, 'second_request_ms': timings[1] * 1000}))
+"""
+
+
+def python(args, env):
+    began = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=SERVER_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - began
+    if result.returncode != 0:
+        raise RuntimeError(f'{" ".join(args)} failed:\n{result.stderr[-2000:]}')
+    return result, elapsed
+
+
+def import_times(module, env):
+    """Cumulative import time in ms of ``module`` and of every top-level package it imported."""
+    result, _ = python(['-X', 'importtime', '-c', f'import {module}'], env)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        name = name.strip()
+        if '.' not in name:
+            packages[name] = int(cumulative) / 1000
+    return packages[module], packages
+
+
+def measure(env, repeat, path, top):
+    entry_points = {}
+    for module in ENTRY_POINTS:
+        totals, heaviest = [], defaultdict(list)
+        for _ in range(repeat):
+            total, packages = import_times(module, env)
+            totals.append(total)
+            for name, ms in packages.items():
+                if name != module:
+                    heaviest[name].append(ms)
+        ranked = sorted(((statistics.median(ms), name) for name, ms in heaviest.items()), reverse=True)[:top]
+        entry_points[module] = {
+            'import_ms': round(statistics.median(totals), 1),
+            'heaviest': {name: round(ms, 1) for ms, name in ranked},
+        }
+        print(f'import {module:<8} {entry_points[module]["import_ms"]:8.1f}ms  '
+              + ', '.join(f'{name} {ms:.0f}' for ms, name in ranked[:5]))
+
+    runs = defaultdict(list)
+    for _ in range(repeat):
+        result, elapsed = python(['-c', FIRST_REQUEST, path], env)
+        sample = json.loads(result.stdout)
+        if sample.pop('status') != 200:
+            raise RuntimeError(f'GET {path} did not return 200')
+        sample['process_ms'] = elapsed * 1000
+        for key, value in sample.items():
+            runs[key].append(value)
+    first_request = {key: round(statistics.median(values), 1) for key, values in runs.items()}
+    print(f'GET {path}: ' + '  '.join(f'{key} {value:.1f}' for key, value in first_request.items()))
+    return {'entry_points': entry_points, 'first_request': first_request}
+
+
+def compare(baseline, current, tolerance):
+    """Lines describing timings that grew beyond ``tolerance``."""
+    pairs = [(f'import {module}', before['import_ms'], current['entry_points'].get(module, {}).get('import_ms'))
+             for module, before in baseline['entry_points'].items()]
+    pairs += [(f'first request {key}', before, current['first_request'].get(key))
+              for key, before in baseline['first_request'].items()]
+    return [f'{name}: {before:.1f}ms -> {now:.1f}ms' for name, before, now in pairs
+            if now is not None and now > before * (1 + tolerance)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per measurement; medians are kept')
+    parser.add_argument('--path', default='/items/1', help='route for the first-request timing')
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--top', type=int, default=10, help='heaviest packages kept per entry point')
+    parser.add_argument('--output', default='startup.json')
+    parser.add_argument('--baseline', help='results file to compare this run against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative growth, default 20%%')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "startup.db")}'
+        with make_app(database_uri).app_context():
+            populate(args.rows)
+        env = {**os.environ, 'DATABASE_URI': database_uri, 'PASSWORD_HASH_EXECUTOR': 'inline'}
+        current = measure(env, args.repeat, args.path, args.top)
+
+    with open(args.output, 'w') as output:
+        json.dump(current, output, indent=2)
+    print(f'results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as results:
+            regressions = compare(json.load(results), current, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            raise SystemExit(f'{len(regressions)} regression(s) beyond {args.tolerance:.0%}')
+        print('no regressions')
@@ -0,0 +1,377 @@
+# Standard library imports
+import json
+from collections import Counter, defaultdict
+
+# Remote library imports
+from flask import current_app, request
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+# Local imports
+from audit import audit_log
+from cache import catalog_cache, order_history_cache
+from config import db, hasher
+from identity import customer_snapshots
+from models import Customer, Item, Order, OrderItem
+
+OPERATIONS = ('create', 'upsert', 'patch', 'delete')
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_MAX_ROWS = 10000
+
+
+class BulkError(Exception):
+    """The request as a whole cannot be processed."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class RowError(Exception):
+    """One row is rejected; the others still go through."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class BulkSpec:
+    """What a bulk request may write to one model.
+
+    ``fields`` maps each writable field to the JSON types it accepts,
+    ``checks`` adds (predicate, message) rules on top of the model's own
+    ``@validates`` methods, and ``references`` lists foreign keys whose
+    targets must exist. ``on_update`` gives extra SET values for patch and
+    upsert; Core UPDATEs bypass ``version_id_col``, so every versioned model
+    bumps its version there. ``after_write`` is called with the ids that
+    were written. ``audit`` is ``(entity_type, fields)``: every row written
+    records an audit event, with the new values of those of ``fields`` it
+    set; unlike the single-row routes, bulk does not read the old ones.
+    """
+
+    def __init__(self, model, fields, required, checks=None, references=None, on_update=None, after_write=None,
+                 audit=None):
+        self.model = model
+        self.table = model.__table__
+        self.fields = fields
+        self.required = required
+        self.checks = checks or {}
+        self.references = references or {}
+        self.on_update = on_update or {}
+        self.after_write = after_write
+        self.audit = audit
+        self.validators = {key: method for key, (method, _) in model.__mapper__.validators.items()}
+
+
+def invalidate_catalog(ids):
+    catalog_cache.invalidate()
+
+
+def invalidate_order_history(ids):
+    # Deleted lines no longer say whose order they were; drop every customer's history
+    order_history_cache.invalidate()
+
+
+def invalidate_customers(ids):
+    for customer_id in ids:
+        customer_snapshots.invalidate(customer_id)
+        order_history_cache.invalidate(customer_id)
+
+
+NUMBER = (int, float)
+SPECS = {
+    'items': BulkSpec(
+        Item,
+        fields={'title': str, 'img_url': str, 'description': str, 'category': str, 'price': int},
+        required=('title', 'category', 'price'),
+        checks={'price': (lambda price: price >= 1, 'price must be 1 or more')},
+        on_update={'version': Item.__table__.c.version + 1},
+        after_write=invalidate_catalog,
+        audit=('item', ('price',)),
+    ),
+    'orderitems': BulkSpec(
+        OrderItem,
+        fields={'quantity': int, 'order_id': int, 'item_id': int},
+        required=('quantity', 'order_id', 'item_id'),
+        references={'order_id': Order, 'item_id': Item},
+        on_update={'version': OrderItem.__table__.c.version + 1},
+        after_write=invalidate_order_history,
+        audit=('orderitem', ('order_id', 'item_id', 'quantity')),
+    ),
+    'customers': BulkSpec(
+        Customer,
+        fields={'name': str, 'username': str, 'wallet': NUMBER, 'admin': bool, 'password': str},
+        required=('name', 'username', 'password'),
+        checks={'wallet': (lambda wallet: wallet >= 0, 'wallet cannot be negative')},
+        # Outstanding tokens carry the old admin flag; bumping version makes them re-read the row
+        on_update={'version': Customer.__table__.c.version + 1},
+        after_write=invalidate_customers,
+        audit=('customer', ('wallet',)),
+    ),
+}
+
+
+def read_rows():
+    """The request body as a list: a JSON array, or one JSON value per line for application/x-ndjson."""
+    if request.mimetype == 'application/x-ndjson':
+        rows = []
+        for number, line in enumerate(request.stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(RowError(f'line {number} is not valid JSON'))
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            raise BulkError('Body must be a JSON array, or NDJSON sent as application/x-ndjson')
+
+    max_rows = current_app.config.get('BULK_MAX_ROWS', DEFAULT_MAX_ROWS)
+    if len(rows) > max_rows:
+        raise BulkError(f'At most {max_rows} rows per request', 413)
+    return rows
+
+
+def valid_id(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def validate(spec, op, row):
+    """Checked column values for one row, or RowError."""
+    if isinstance(row, RowError):
+        raise row
+    if op == 'delete':
+        row_id = row.get('id') if isinstance(row, dict) else row
+        if not valid_id(row_id):
+            raise RowError('delete takes ids, or objects with an id')
+        return {'id': row_id}
+    if not isinstance(row, dict):
+        raise RowError('Each row must be a JSON object')
+
+    unknown = row.keys() - spec.fields.keys() - {'id'}
+    if unknown:
+        raise RowError(f'Unknown fields: {", ".join(sorted(unknown))}')
+    if op == 'create' and 'id' in row:
+        raise RowError('create assigns ids; use upsert to write a given id')
+    if op != 'create' and not valid_id(row.get('id')):
+        raise RowError('id is required and must be a positive integer')
+    if op != 'patch':
+        missing = [field for field in spec.required if field not in row]
+        if missing:
+            raise RowError(f'Missing fields: {", ".join(missing)}')
+    elif len(row) == 1:
+        raise RowError('Nothing to update')
+
+    for key, value in row.items():
+        if key == 'id':
+            continue
+        types = spec.fields[key]
+        if value is None:
+            if key in spec.required:
+                raise RowError(f'{key} cannot be null')
+            continue
+        if not isinstance(value, types) or (isinstance(value, bool) and types is not bool):
+            raise RowError(f'{key} has the wrong type')
+        if key in spec.checks:
+            predicate, message = spec.checks[key]
+            if not predicate(value):
+                raise RowError(message)
+        if key in spec.validators:
+            try:
+                spec.validators[key](None, key, value)
+            except (ValueError, TypeError) as e:
+                raise RowError(str(e))
+    return dict(row)
+
+
+def reject_duplicate_ids(rows):
+    """Drop every row whose id another row also names; returns (rows, {index: RowError}).
+
+    Which of them should win is anyone's guess, and PostgreSQL refuses an
+    upsert that touches one row twice (CardinalityViolation, not an
+    IntegrityError, so no per-row retry would catch it).
+    """
+    counts = Counter(values['id'] for _, values in rows if 'id' in values)
+    errors = {index: RowError(f'id {values["id"]} appears more than once in this request')
+              for index, values in rows if counts[values.get('id')] > 1}
+    return [(index, values) for index, values in rows if index not in errors], errors
+
+
+def check_references(spec, chunk):
+    """Drop rows whose foreign keys point nowhere; returns (rows, {index: RowError})."""
+    errors = {}
+    for column, target in spec.references.items():
+        wanted = {values[column] for _, values in chunk if values.get(column) is not None}
+        if not wanted:
+            continue
+        found = set(db.session.execute(select(target.id).where(target.id.in_(wanted))).scalars())
+        for index, values in chunk:
+            if values.get(column) is not None and values[column] not in found:
+                errors[index] = RowError(f'{column} {values[column]} does not exist')
+    return [(index, values) for index, values in chunk if index not in errors], errors
+
+
+def hash_passwords(chunk):
+    pending = [values for _, values in chunk if values.get('password') is not None]
+    for values, pw_hash in zip(pending, hasher.hash_many([values['password'] for values in pending])):
+        values['_password_hash'] = pw_hash
+    for _, values in chunk:
+        values.pop('password', None)
+
+
+def by_keys(chunk):
+    """Group rows by the set of columns they write, since one executemany needs uniform parameters."""
+    groups = defaultdict(list)
+    for index, values in chunk:
+        groups[tuple(sorted(values))].append((index, values))
+    return groups.items()
+
+
+def existing_ids(spec, chunk):
+    ids = [values['id'] for _, values in chunk]
+    return set(db.session.execute(select(spec.table.c.id).where(spec.table.c.id.in_(ids))).scalars())
+
+
+def dialect_insert(table):
+    # Imported here: the postgresql dialect costs tens of milliseconds at startup and only upsert needs it
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table)
+    if dialect == 'sqlite':
+        return sqlite.insert(table)
+    raise BulkError(f'upsert is not supported on {dialect}', 501)
+
+
+def write(spec, op, chunk):
+    """Apply ``op`` to a chunk inside the current transaction; returns {index: result}."""
+    table = spec.table
+    results = {}
+
+    if op == 'create':
+        for keys, group in by_keys(chunk):
+            stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+            ids = db.session.execute(stmt, [values for _, values in group]).scalars().all()
+            for (index, _), row_id in zip(group, ids):
+                results[index] = {'index': index, 'status': 201, 'id': row_id}
+        return results
+
+    found = existing_ids(spec, chunk)
+    if op in ('patch', 'delete'):
+        for index, values in chunk:
+            if values['id'] not in found:
+                results[index] = {'index': index, 'status': 404, 'error': 'Not found'}
+        chunk = [(index, values) for index, values in chunk if values['id'] in found]
+
+    if op == 'delete' and chunk:
+        db.session.execute(delete(table).where(table.c.id.in_([values['id'] for _, values in chunk])))
+    elif op == 'patch':
+        for keys, group in by_keys(chunk):
+            columns = [key for key in keys if key != 'id']
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam('row_id'))
+                .values({**{column: bindparam(f'new_{column}') for column in columns}, **spec.on_update})
+            )
+            db.session.execute(stmt, [
+                {'row_id': values['id'], **{f'new_{column}': values[column] for column in columns}}
+                for _, values in group
+            ])
+    elif op == 'upsert':
+        for keys, group in by_keys(chunk):
+            stmt = dialect_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={**{key: stmt.excluded[key] for key in keys if key != 'id'}, **spec.on_update},
+            )
+            db.session.execute(stmt, [values for _, values in group])
+
+    for index, values in chunk:
+        status = 201 if op == 'upsert' and values['id'] not in found else 200
+        results[index] = {'index': index, 'status': status, 'id': values['id']}
+    return results
+
+
+def record_audit(spec, op, values, result):
+    entity_type, fields = spec.audit
+    changes = {key: values[key] for key in fields if key in values}
+    if op == 'delete':
+        audit_log.record(entity_type, result['id'], 'deleted')
+    elif changes:
+        audit_log.record(entity_type, result['id'], 'created' if result['status'] == 201 else 'updated', changes)
+
+
+def write_chunk(spec, op, chunk):
+    """Commit a chunk in one transaction. If a constraint fails, redo it row by row so only the bad rows fail."""
+    try:
+        results = write(spec, op, chunk)
+        db.session.commit()
+        return results
+    except IntegrityError:
+        db.session.rollback()
+
+    results = {}
+    for index, values in chunk:
+        try:
+            results.update(write(spec, op, [(index, values)]))
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            results[index] = {'index': index, 'status': 409, 'error': str(e.orig)}
+    return results
+
+
+def bulk_write(resource, op):
+    """Run one bulk request and return its summary with a result per input row, in input order.
+
+    Rows are validated up front, then written ``BULK_CHUNK_SIZE`` at a time,
+    one transaction per chunk. Raises BulkError for problems with the
+    request as a whole.
+    """
+    spec = SPECS.get(resource)
+    if spec is None or op not in OPERATIONS:
+        raise BulkError(f'Unknown bulk endpoint /bulk/{resource}/{op}', 404)
+
+    rows = read_rows()
+    results = [None] * len(rows)
+    valid = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, validate(spec, op, row)))
+        except RowError as e:
+            results[index] = {'index': index, 'status': e.status, 'error': e.message}
+    valid, errors = reject_duplicate_ids(valid)
+    for index, e in errors.items():
+        results[index] = {'index': index, 'status': e.status, 'error': e.message}
+
+    chunk_size = current_app.config.get('BULK_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    written = []
+    for start in range(0, len(valid), chunk_size):
+        chunk, errors = check_references(spec, valid[start:start + chunk_size])
+        for index, e in errors.items():
+            results[index] = {'index': index, 'status': e.status, 'error': e.message}
+        if op != 'delete' and 'password' in spec.fields:
+            hash_passwords(chunk)
+        values = dict(chunk)
+        for index, result in write_chunk(spec, op, chunk).items():
+            results[index] = result
+            if result['status'] < 300:
+                written.append(result['id'])
+                if spec.audit is not None:
+                    record_audit(spec, op, values[index], result)
+
+    if written and spec.after_write is not None:
+        spec.after_write(written)
+
+    succeeded = sum(1 for result in results if result['status'] < 300)
+    return {
+        'resource': resource,
+        'op': op,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results,
+    }
@@ -0,0 +1,144 @@
+# Standard library imports
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Remote library imports
+from flask import current_app, g, request
+
+try:
+    import redis
+except ImportError:  # optional, only needed for a shared cache backend
+    redis = None
+
+# Local imports
+from conditional import watermark
+
+
+class LocalBackend:
+    """In-process stand-in implementing the subset of the Redis API we use."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value):
+        self._data[key] = value
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(key, 0)) + 1
+            self._data[key] = value
+            return value
+
+
+def backend_from_url(url):
+    if not url:
+        return LocalBackend()
+    if redis is None:
+        raise RuntimeError('CACHE_URL is set but the redis package is not installed')
+    return redis.Redis.from_url(url)
+
+
+class ResponseCache:
+    """Read-through cache of serialized JSON bodies with ETags.
+
+    Entries live in this process, but are tagged with a generation number
+    kept in the backend. ``invalidate()`` bumps the generation, so with a
+    shared (Redis) backend a write in one worker invalidates every worker's
+    copy on its next read. Entries built with a ``scope`` (e.g. a customer
+    id) also carry that scope's own generation, so ``invalidate(scope)``
+    drops just them.
+
+    Without ``CACHE_URL`` the generations live in each worker, and a write
+    handled by one worker leaves the others' copies current. Entries are
+    then also keyed on the watermarks of ``tables``, the tables the bodies
+    are built from, which triggers bump on every write from any process.
+    That costs a query per read, unless ``@conditional`` has read them for
+    the request already, in which case they are used with a shared backend
+    too.
+    """
+
+    def __init__(self, namespace, tables=(), max_entries=4096):
+        self.namespace = namespace
+        self.tables = tuple(sorted(tables))
+        self.max_entries = max_entries
+        self.backend = LocalBackend()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.backend = backend_from_url(app.config.get('CACHE_URL'))
+
+    @property
+    def generation_key(self):
+        return f'{self.namespace}:generation'
+
+    def scope_key(self, scope):
+        return f'{self.namespace}:{scope}:generation'
+
+    def generation(self, scope=None):
+        generation = int(self.backend.get(self.generation_key) or 0)
+        if scope is None:
+            return generation
+        return generation, int(self.backend.get(self.scope_key(scope)) or 0)
+
+    def freshness(self, scope=None):
+        """What an entry must have been built under to still be served: generations, plus watermarks if needed."""
+        generation = self.generation(scope)
+        if not self.tables:
+            return generation
+        if isinstance(self.backend, LocalBackend) or self.tables in g.get('watermarks', {}):
+            return generation, watermark(self.tables)
+        return generation, None
+
+    def invalidate(self, scope=None):
+        self.backend.incr(self.generation_key if scope is None else self.scope_key(scope))
+
+    def get_or_build(self, key, build, scope=None):
+        """Return ``(body, etag)`` for ``key``, calling ``build()`` on a miss.
+
+        ``build`` returns the data to serialize, or None when there is
+        nothing to cache (for example a 404).
+        """
+        generation = self.freshness(scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                return entry[1], entry[2]
+
+        data = build()
+        if data is None:
+            return None, None
+
+        body = current_app.json.response(data).get_data()
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        with self._lock:
+            self._entries[key] = (generation, body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body, etag
+
+    def response(self, key, build, status=200, scope=None):
+        """Cached JSON response that answers ``If-None-Match`` with a 304.
+
+        Returns None when ``build()`` found nothing.
+        """
+        body, etag = self.get_or_build(key, build, scope)
+        if body is None:
+            return None
+
+        response = current_app.response_class(body, status=status, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+
+catalog_cache = ResponseCache('catalog', tables=('items',))
+# Per customer (scope), see history.py
+order_history_cache = ResponseCache('order-history', tables=('items', 'orderitems', 'orders'))
@@ -0,0 +1,116 @@
+# Standard library imports
+
+# Remote library imports
+from sqlalchemy import insert, select, update
+
+# Local imports
+from config import db
+from cache import catalog_cache
+from audit import audit_log
+from inventory import fulfil, totals
+from models import Customer, Item, Order, OrderItem
+
+
+class CheckoutError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def valid_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_cart(data):
+    """Validate ``{'items': [{'item_id': int, 'quantity': int}, ...]}`` into (item_id, quantity) pairs."""
+    if not isinstance(data, dict):
+        raise CheckoutError('Body must be a JSON object like {"items": [...]}')
+    lines = data.get('items')
+    if not isinstance(lines, list) or not lines:
+        raise CheckoutError('Cart must contain at least one item')
+
+    cart = []
+    for line in lines:
+        try:
+            item_id, quantity = line['item_id'], line['quantity']
+        except (TypeError, KeyError):
+            raise CheckoutError('Each cart line needs item_id and quantity')
+        # bool is an int, so true/false would otherwise pass as item 1/0 or quantity 1
+        if not valid_int(item_id) or not valid_int(quantity) or item_id < 1 or quantity < 1:
+            raise CheckoutError('item_id must be an id and quantity a positive integer')
+        cart.append((item_id, quantity))
+    return cart
+
+
+def adjust_wallet(customer_id, amount):
+    """Add ``amount`` (negative to debit) to a wallet in one conditional UPDATE; returns the new balance.
+
+    The database does the arithmetic, so concurrent adjustments and
+    checkouts all land, and the balance can never go below zero. The
+    version is bumped as well, so a PATCH holding an older ETag gets 412
+    instead of overwriting the new balance. The caller commits.
+    """
+    wallet = db.session.execute(
+        update(Customer)
+        .where(Customer.id == customer_id, Customer.wallet + amount >= 0)
+        .values(wallet=Customer.wallet + amount, version=Customer.version + 1)
+        .returning(Customer.wallet)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if wallet is None:
+        if db.session.get(Customer, customer_id) is None:
+            raise CheckoutError('Customer not found', 404)
+        raise CheckoutError('Insufficient funds', 402)
+    return wallet
+
+
+def place_order(customer_id, cart):
+    """Create an order for ``cart`` and charge the customer's wallet atomically.
+
+    Prices come from the items table in one query, never from the client.
+    Stock comes from the customer's reservations first and is otherwise
+    taken with a conditional UPDATE (InventoryError when it runs out), and
+    the wallet is debited the same way, so two concurrent checkouts can
+    never both spend the same unit or balance. All of it, the order and its
+    order items are written in the same transaction.
+
+    Returns the new order id.
+    """
+    item_ids = {item_id for item_id, _ in cart}
+    prices = dict(db.session.execute(select(Item.id, Item.price).where(Item.id.in_(item_ids))).all())
+
+    missing = item_ids - prices.keys()
+    if missing:
+        raise CheckoutError(f'Unknown item ids: {sorted(missing)}')
+    unpriced = sorted(item_id for item_id, price in prices.items() if price is None)
+    if unpriced:
+        raise CheckoutError(f'Items without a price cannot be bought: {unpriced}', 409)
+    total = float(sum(prices[item_id] * quantity for item_id, quantity in cart))
+
+    try:
+        flipped = fulfil(customer_id, totals(cart))
+        wallet = adjust_wallet(customer_id, -total)
+
+        order = Order(customer_id=customer_id, total=total)
+        db.session.add(order)
+        db.session.flush()
+        order_id = order.id
+
+        db.session.execute(insert(OrderItem), [
+            {'order_id': order_id, 'item_id': item_id, 'quantity': quantity}
+            for item_id, quantity in cart
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # An item sold out: catalog responses carry in_stock
+    if flipped:
+        catalog_cache.invalidate()
+    audit_log.record('order', order_id, 'created',
+                     {'customer_id': customer_id, 'total': total, 'items': [list(line) for line in cart]})
+    audit_log.record('customer', customer_id, 'wallet_adjusted',
+                     {'amount': -total, 'wallet': float(wallet), 'order_id': order_id})
+    return order_id
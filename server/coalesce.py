@@ -0,0 +1,130 @@
+# Standard library imports
+import threading
+from functools import wraps
+
+# Remote library imports
+from flask import Response, current_app, request
+
+# Local imports
+from metrics import metrics
+
+SCOPES = ('public', 'caller')
+
+
+class Flight:
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = threading.Event()
+        # (status, headers, body) of the leader's response, or None when it cannot be shared
+        self.result = None
+
+
+class Coalescer:
+    """Single-flight GETs: identical concurrent requests share one run of the view.
+
+    The first request for a key (the leader) runs the view; requests for
+    the same key that arrive while it runs wait for it, up to ``wait``
+    seconds, and answer with a copy of its status, headers and body. They
+    issue no queries and serialize nothing. Each copy still goes through
+    its own after_request handlers (compression, CORS, metrics). Nothing is
+    kept once the leader is done, so this is not a cache: a request
+    arriving later starts a new flight.
+
+    The key is the endpoint, method, path, query arguments and conditional
+    headers, plus per resource:
+
+    ``scope``       'public' when the response is the same for everyone, or
+                    'caller' to only coalesce requests with the same
+                    Authorization header
+    ``generation``  callable whose value changes after a write the view
+                    must show, e.g. ``catalog_cache.generation``, so a
+                    request made after a write never joins a flight that
+                    started before it
+
+    Responses that cannot be copied (streamed, or not a Response) are not
+    shared; waiting requests then run the view themselves. Outcomes are
+    counted in ``http_coalesced_requests_total`` on /metrics.
+
+    Config:
+        COALESCE_ENABLED    default True
+        COALESCE_WAIT       seconds a request waits on a leader before running the view itself, default 2
+        COALESCE_RESOURCES  per endpoint overrides, e.g. {'itemsbyid': {'wait': 0.5}, 'items': {'enabled': False}}
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.wait = 2.0
+        self.resources = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.outcomes = metrics.counter('http_coalesced_requests_total',
+                                        'GETs that ran the view (leader) or shared a concurrent identical one')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('COALESCE_ENABLED', True))
+        self.wait = float(app.config.get('COALESCE_WAIT', 2.0))
+        self.resources = dict(app.config.get('COALESCE_RESOURCES') or {})
+
+    def coalesce(self, scope='public', wait=None, generation=None):
+        if scope not in SCOPES:
+            raise ValueError(f'scope must be one of {", ".join(SCOPES)}')
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                settings = self.resources.get(request.endpoint, {})
+                if not (self.enabled and settings.get('enabled', True)) or request.method not in ('GET', 'HEAD'):
+                    return func(*args, **kwargs)
+
+                key = self.key(scope, generation)
+                with self._lock:
+                    flight = self._flights.get(key)
+                    leader = flight is None
+                    if leader:
+                        flight = self._flights[key] = Flight()
+                if leader:
+                    return self._lead(key, flight, func, args, kwargs)
+
+                if not flight.done.wait(settings.get('wait', self.wait if wait is None else wait)):
+                    self.outcomes.inc(endpoint=request.endpoint, outcome='timeout')
+                elif flight.result is None:
+                    self.outcomes.inc(endpoint=request.endpoint, outcome='unshared')
+                else:
+                    self.outcomes.inc(endpoint=request.endpoint, outcome='shared')
+                    status, headers, body = flight.result
+                    return current_app.response_class(body, status=status, headers=headers)
+                return func(*args, **kwargs)
+
+            return wrapper
+        return decorator
+
+    def key(self, scope, generation):
+        return (
+            request.endpoint,
+            request.method,
+            request.path,
+            tuple(sorted(request.args.items(multi=True))),
+            request.headers.get('If-None-Match'),
+            request.headers.get('If-Modified-Since'),
+            request.headers.get('Authorization') if scope == 'caller' else None,
+            generation() if generation is not None else None,
+        )
+
+    def _lead(self, key, flight, func, args, kwargs):
+        try:
+            response = func(*args, **kwargs)
+            if isinstance(response, Response) and not response.is_streamed and not response.direct_passthrough:
+                flight.result = (response.status_code, list(response.headers), response.get_data())
+            return response
+        finally:
+            # Out of the table before waking anyone, so later requests start a flight of their own
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+            self.outcomes.inc(endpoint=request.endpoint, outcome='leader')
+
+
+coalescer = Coalescer()
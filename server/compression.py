@@ -0,0 +1,142 @@
+# Standard library imports
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+# Remote library imports
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional, responses are only gzipped without it
+    brotli = None
+
+# Local imports
+
+COMPRESSIBLE = ('application/json', 'application/x-ndjson', 'text/html', 'text/plain', 'text/csv')
+
+
+class GzipStream:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data):
+        # Sync flush so each streamed chunk reaches the client as soon as it is produced
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class Compressor:
+    """Content-Encoding negotiation for responses, brotli when installed, else gzip.
+
+    Bodies of ``COMPRESS_MIN_SIZE`` bytes or more are compressed, streamed
+    bodies always, chunk by chunk. Responses with an ETag are compressed once
+    per representation and kept in a small LRU, so cached catalog responses
+    do not pay for compression on every hit.
+
+    Config:
+        COMPRESS_MIN_SIZE       smallest body worth compressing, default 1024 bytes
+        COMPRESS_GZIP_LEVEL     default 6
+        COMPRESS_BROTLI_QUALITY default 5, brotli's 11 is far too slow per request
+        COMPRESS_CACHE_ENTRIES  compressed bodies kept, default 256
+    """
+
+    def __init__(self, app=None):
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        self.cache_entries = 256
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = int(app.config.get('COMPRESS_MIN_SIZE', 1024))
+        self.gzip_level = int(app.config.get('COMPRESS_GZIP_LEVEL', 6))
+        self.brotli_quality = int(app.config.get('COMPRESS_BROTLI_QUALITY', 5))
+        self.cache_entries = int(app.config.get('COMPRESS_CACHE_ENTRIES', 256))
+        app.after_request(self._compress)
+
+    @property
+    def encodings(self):
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, self.gzip_level, mtime=0)
+
+    def stream(self, encoding):
+        return BrotliStream(self.brotli_quality) if encoding == 'br' else GzipStream(self.gzip_level)
+
+    def _compressed(self, response, encoding):
+        data = response.get_data()
+        etag, _ = response.get_etag()
+        if etag is None:
+            return self.compress(data, encoding)
+
+        key = (request.full_path, etag, len(data), encoding)
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                return body
+        body = self.compress(data, encoding)
+        with self._lock:
+            self._cache[key] = body
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return body
+
+    def _compress(self, response):
+        if (response.mimetype not in COMPRESSIBLE or response.direct_passthrough
+                or not 200 <= response.status_code < 300 or response.status_code in (204, 206)
+                or 'Content-Encoding' in response.headers):
+            return response
+        if not response.is_streamed and response.calculate_content_length() < self.min_size:
+            return response
+
+        # Whatever this client gets, a shared cache must not hand it to one that accepts otherwise
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream_body(response.iter_encoded(), self.stream(encoding))
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(self._compressed(response, encoding))
+        response.headers['Content-Encoding'] = encoding
+
+        # Compressed bytes differ from the identity ones; a weak tag still matches either
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    @staticmethod
+    def _stream_body(chunks, stream):
+        for data in chunks:
+            compressed = stream.chunk(data)
+            if compressed:
+                yield compressed
+        yield stream.finish()
+
+
+compressor = Compressor()
@@ -0,0 +1,153 @@
+# Standard library imports
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+# Remote library imports
+from flask import current_app, g, make_response, request, Response
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
+
+# Local imports
+from config import db
+from models import TableWatermark
+
+
+def watermarks(tables):
+    """``(etag, last_modified)`` for a response built from ``tables``, in one query.
+
+    A table that was never written has no row yet and counts as version 0.
+    """
+    rows = db.session.execute(
+        select(TableWatermark.table_name, TableWatermark.version, TableWatermark.updated_at)
+        .where(TableWatermark.table_name.in_(tables))
+    ).all()
+    versions = {name: version for name, version, _ in rows}
+    tag = ','.join(f'{table}:{versions.get(table, 0)}' for table in tables)
+    etag = hashlib.blake2b(tag.encode(), digest_size=8).hexdigest()
+
+    changed = [updated_at for _, _, updated_at in rows if updated_at is not None]
+    if not changed:
+        return etag, None
+    last_modified = max(changed).replace(microsecond=0, tzinfo=timezone.utc)
+    # HTTP dates are whole seconds, so a write later in this same second would not
+    # move Last-Modified; only vouch for it once that second is over
+    if last_modified >= datetime.now(timezone.utc).replace(microsecond=0):
+        return etag, None
+    return etag, last_modified
+
+
+def watermark(tables):
+    """The ETag of ``tables``' watermarks, reusing the read ``@conditional`` made for this request if any."""
+    tables = tuple(sorted(tables))
+    known = g.setdefault('watermarks', {})
+    if tables not in known:
+        known[tables] = watermarks(tables)[0]
+    return known[tables]
+
+
+def not_modified(etag, last_modified):
+    # If-None-Match wins when both are sent (RFC 9110, 13.2.2)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(*tables):
+    """Answer GET with 304 Not Modified while none of ``tables`` has been written.
+
+    The check runs before the view, against the counters in
+    table_watermarks, so an unchanged collection costs one primary key
+    lookup: no query, no serializer. Otherwise the view runs and a 200 is
+    tagged with a weak ETag and Last-Modified. Put it above
+    ``@query_budget``, which should only count the view's own queries.
+    """
+    tables = tuple(sorted(tables))
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return func(*args, **kwargs)
+
+            # Read before the view's queries: a write in between then makes the tag older than the body, never newer
+            etag, last_modified = watermarks(tables)
+            g.setdefault('watermarks', {})[tables] = etag
+            if not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = func(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            # Only when known: werkzeug stamps the current time for None
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+    return decorator
+
+
+CHANGED = 'The resource has changed since it was read; GET it again and retry'
+
+
+class PreconditionError(Exception):
+    def __init__(self, message, status=412):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def version_tag(versions):
+    return '-'.join(str(version) for version in versions)
+
+
+def row_response(plan, id, status=200):
+    """Row ``id`` as JSON with a strong ETag from the versions of every row in it; None if missing.
+
+    Body and versions come from the same SELECT, so the tag always
+    describes exactly this body, which is what makes it safe to send back
+    in If-Match (see ``check_if_match``). Writes to other rows leave it
+    alone, unlike the table watermarks. A GET whose If-None-Match still
+    matches gets a 304.
+    """
+    data, versions = plan.one_versioned(plan.primary_key == id)
+    if data is None:
+        return None
+    response = make_response(data, status)
+    response.set_etag(version_tag(versions))
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def check_if_match(plan, instance):
+    """Raise PreconditionError unless the request's If-Match names ``instance``'s current ETag.
+
+    ``instance`` is the row as loaded for the update. A missing If-Match is
+    428: an update must say which version it read. ``If-Match: *``
+    deliberately overwrites whatever is there. The tag is compared weakly,
+    since compression weakens strong ETags on the way out. The check is
+    only as old as ``instance``: the ORM's version_id_col then makes the
+    UPDATE itself fail with StaleDataError if another writer commits
+    first, see ``commit_versioned``.
+    """
+    if not request.if_match:
+        raise PreconditionError('If-Match is required: send the ETag from a GET of this resource', 428)
+    versions = plan.versions(plan.primary_key == instance.id)
+    # The instance must be the version the tag describes, or the UPDATE would guard the wrong one
+    if versions is None or versions[0] != instance.version or not request.if_match.contains_weak(version_tag(versions)):
+        raise PreconditionError(CHANGED)
+
+
+def commit_versioned():
+    """Commit, turning a write that lost the version_id_col race into PreconditionError (412)."""
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        raise PreconditionError(CHANGED)
@@ -1,34 +1,50 @@
 # Standard library imports
+import os
 
 # Remote library imports
 from flask import Flask
-from flask_cors import CORS
-from flask_bcrypt import Bcrypt
-from flask_migrate import Migrate
-from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
 
 # Local imports
+from hashing import PasswordHasher
+from database import database_config, install_sqlite_pragmas
 
-# Instantiate app, set attributes
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.json.compact = False
-
-# Define metadata, instantiate db
+# Define metadata, instantiate extensions; create_app() binds them to an app
 metadata = MetaData(naming_convention={
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
 })
 db = SQLAlchemy(metadata=metadata)
-migrate = Migrate(app, db)
-db.init_app(app)
+hasher = PasswordHasher()
+
+
+def create_app(overrides=None):
+    """The app with its database and password hasher, and nothing HTTP.
 
-# Instantiate REST API
-api = Api(app)
+    This is all seed.py and the CLI (manage.py) need. app.create_app()
+    builds the API on top of it. ``overrides`` is applied to the config
+    before any extension reads it.
+    """
+    app = Flask(__name__)
+    # DATABASE_URI / DB_PROFILE and friends, see database.py
+    app.config.update(database_config())
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # bcrypt work runs in a process pool so logins cannot starve the request threads
+    app.config['PASSWORD_HASH_EXECUTOR'] = os.environ.get('PASSWORD_HASH_EXECUTOR', 'process')
+    # One pool per server process; see hashing.PasswordHasher for how they share the cores
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    app.config['WEB_CONCURRENCY'] = int(os.environ.get('WEB_CONCURRENCY', 1))
+    # Where uploaded item images and their variants live, shared by the API and `flask images`; see images.py
+    app.config['IMAGE_STORE'] = os.environ.get('IMAGE_STORE')
+    # Where audit events are written, read by the API and `flask audit`: the audit_events table or segment files
+    app.config['AUDIT_SINK'] = os.environ.get('AUDIT_SINK', 'table')
+    app.config['AUDIT_DIR'] = os.environ.get('AUDIT_DIR')
+    app.config.update(overrides or {})
 
-bcrypt = Bcrypt(app)
+    db.init_app(app)
+    install_sqlite_pragmas(app, db)
+    hasher.init_app(app)
 
-# Instantiate CORS
-CORS(app)
+    # Every model, triggers included, must be on db.metadata before create_all or autogenerate
+    import models
+    return app
@@ -0,0 +1,109 @@
+# Standard library imports
+import os
+
+# Remote library imports
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Local imports
+
+# PRAGMAs applied to every new SQLite connection, per DB_PROFILE
+SQLITE_PROFILES = {
+    # SQLite's own defaults: rollback journal, every write locks the whole file
+    'default': {},
+    # Readers keep going while a writer commits; fsync only at checkpoints
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative means KiB, so 64 MiB
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Environment overrides for individual PRAGMAs and pool settings
+SQLITE_PRAGMA_ENV = {
+    'journal_mode': 'SQLITE_JOURNAL_MODE',
+    'synchronous': 'SQLITE_SYNCHRONOUS',
+    'mmap_size': 'SQLITE_MMAP_SIZE',
+    'cache_size': 'SQLITE_CACHE_SIZE',
+    'busy_timeout': 'SQLITE_BUSY_TIMEOUT',
+}
+POOL_ENV = {
+    'pool_size': 'DB_POOL_SIZE',
+    'max_overflow': 'DB_MAX_OVERFLOW',
+    'pool_timeout': 'DB_POOL_TIMEOUT',
+    'pool_recycle': 'DB_POOL_RECYCLE',
+}
+
+
+def database_uri(environ):
+    uri = environ.get('DATABASE_URI') or environ.get('DATABASE_URL') or 'sqlite:///app.db'
+    # Hosting providers still hand out the postgres:// scheme SQLAlchemy 2 rejects
+    if uri.startswith('postgres://'):
+        uri = 'postgresql+psycopg2://' + uri[len('postgres://'):]
+    return uri
+
+
+def database_config(environ=os.environ):
+    """Flask config for the database: URI, engine options and SQLite PRAGMAs.
+
+    ``DATABASE_URI`` (or ``DATABASE_URL``) selects the database; a
+    ``postgresql://`` URI uses the psycopg2 driver from requirements.txt.
+    ``DB_PROFILE`` picks the SQLite PRAGMA set, ``performance`` by default.
+    """
+    uri = database_uri(environ)
+    url = make_url(uri)
+    profile = environ.get('DB_PROFILE', 'performance')
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f'DB_PROFILE must be one of {", ".join(SQLITE_PROFILES)}')
+
+    backend = url.get_backend_name()
+    # Flask-SQLAlchemy gives in-memory SQLite a StaticPool, which takes no pool options
+    in_memory = backend == 'sqlite' and url.database in (None, '', ':memory:')
+
+    engine_options = {}
+    pragmas = {}
+    if backend == 'sqlite':
+        pragmas = dict(SQLITE_PROFILES[profile])
+        for pragma, name in SQLITE_PRAGMA_ENV.items():
+            if environ.get(name):
+                pragmas[pragma] = environ[name]
+        if in_memory:
+            # There is no file to journal or map
+            pragmas.pop('journal_mode', None)
+            pragmas.pop('mmap_size', None)
+        elif profile == 'performance':
+            engine_options.update(pool_size=10, max_overflow=20)
+    else:
+        engine_options.update(pool_size=10, max_overflow=20, pool_pre_ping=True)
+
+    if not in_memory:
+        for option, name in POOL_ENV.items():
+            if environ.get(name):
+                engine_options[option] = int(environ[name])
+
+    return {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options,
+        'SQLITE_PRAGMAS': pragmas,
+    }
+
+
+def install_sqlite_pragmas(app, db):
+    """Run ``app.config['SQLITE_PRAGMAS']`` on every new connection of the app's SQLite engines."""
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f'PRAGMA {pragma}={value}')
+        cursor.close()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', set_pragmas)
@@ -0,0 +1,31 @@
+# gunicorn settings for wsgi:app; every value can be overridden from the environment
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+
+# Standard library imports
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5555')}")
+
+# Processes for CPU-bound work (serialization), threads for I/O waits: SQLite
+# and psycopg2 release the GIL, and bcrypt runs in hashing.py's process pool
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Read by the preloaded app, so each worker's bcrypt pool takes its share of the cores
+os.environ['WEB_CONCURRENCY'] = str(workers)
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Import and warm the app once in the master (see wsgi.warm_up), then fork
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# Set GUNICORN_ACCESS_LOG= (empty) to turn access logging off
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
@@ -0,0 +1,133 @@
+# Standard library imports
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Remote library imports
+import bcrypt
+from flask import jsonify
+from werkzeug.exceptions import ServiceUnavailable
+
+# Local imports
+
+
+class HashingBusy(ServiceUnavailable):
+    """Raised instead of queueing when every hashing slot is taken."""
+
+    description = 'Too many password checks in progress, please retry shortly'
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after=retry_after)
+        # A ready-made response makes Flask-RESTful return it as-is instead of logging a server error
+        self.response = jsonify(error=self.description)
+        self.response.status_code = self.code
+        self.response.headers['Retry-After'] = str(retry_after)
+
+
+def _hash(password, rounds, prefix):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds, prefix=prefix)).decode('utf-8')
+
+
+def _check(pw_hash, password):
+    return bcrypt.checkpw(password, pw_hash)
+
+
+def pool_size(server_workers):
+    """This process's share of the cores, when ``server_workers`` processes each run a pool."""
+    return max(1, (os.cpu_count() or 1) // max(1, server_workers))
+
+
+class PasswordHasher:
+    """Runs bcrypt off the request thread with bounded concurrency.
+
+    Config:
+        BCRYPT_LOG_ROUNDS        cost factor for new hashes (Flask-Bcrypt's key, default 12)
+        PASSWORD_HASH_EXECUTOR   'process' (default), 'thread' or 'inline'
+        PASSWORD_HASH_WORKERS    pool size per server process, defaults to the cores
+                                 divided by WEB_CONCURRENCY (at least 1)
+        WEB_CONCURRENCY          server processes, each with its own pool (default 1;
+                                 gunicorn.conf.py sets it, uvicorn --workers reads it)
+        PASSWORD_HASH_MAX_PENDING  running + queued operations before HashingBusy
+        PASSWORD_HASH_RETRY_AFTER  seconds advertised in Retry-After
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.prefix = b'2b'
+        self.executor_kind = 'process'
+        self.workers = pool_size(1)
+        self.max_pending = self.workers * 4
+        self.retry_after = 1
+        self._executor = None
+        self._executor_pid = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.prefix = app.config.get('BCRYPT_HASH_PREFIX', '2b').encode('utf-8')
+        self.executor_kind = app.config.get('PASSWORD_HASH_EXECUTOR', 'process')
+        # Every server process builds its own pool, so by default they split the cores between them
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS') or pool_size(app.config.get('WEB_CONCURRENCY', 1))
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING') or self.workers * 4
+        self.retry_after = app.config.get('PASSWORD_HASH_RETRY_AFTER', 1)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self.shutdown()
+
+    def _get_executor(self):
+        # Pools do not survive fork, so each gunicorn worker builds its own on first use
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                if self.executor_kind == 'process':
+                    # forkserver children do not inherit the server's listening sockets or threads
+                    context = multiprocessing.get_context('forkserver' if os.name == 'posix' else 'spawn')
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, func, *args):
+        if self.executor_kind == 'inline':
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy(self.retry_after)
+        try:
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password.encode('utf-8'), self.rounds, self.prefix)
+
+    def hash_many(self, passwords):
+        """Hash a batch across the whole pool, holding a single slot for it."""
+        encoded = [password.encode('utf-8') for password in passwords]
+        if self.executor_kind == 'inline':
+            return [_hash(password, self.rounds, self.prefix) for password in encoded]
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy(self.retry_after)
+        try:
+            count = len(encoded)
+            return list(self._get_executor().map(_hash, encoded, [self.rounds] * count, [self.prefix] * count))
+        finally:
+            self._slots.release()
+
+    def check(self, pw_hash, password):
+        return self._run(_check, pw_hash.encode('utf-8'), password.encode('utf-8'))
+
+    def needs_rehash(self, pw_hash):
+        """True when ``pw_hash`` was made with a different cost factor than configured."""
+        try:
+            return int(pw_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
@@ -0,0 +1,135 @@
+# Standard library imports
+from datetime import datetime
+
+# Remote library imports
+from flask import current_app, make_response, request
+from sqlalchemy import String, and_, or_, select, type_coerce
+from sqlalchemy.orm import load_only, selectinload
+
+# Local imports
+from config import db
+from cache import catalog_cache, order_history_cache
+from models import Item, Order, OrderItem
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+# created_at as the database stores it. SQLite compares DATETIME columns as
+# text, and CURRENT_TIMESTAMP defaults have no fractional part while
+# SQLAlchemy writes six digits of one. A cursor rebuilt from a datetime would
+# sort after its own row and page back onto it, so the cursor carries the
+# stored text and is compared as text. PostgreSQL returns a timestamp, whose
+# str() it parses back.
+created_at_text = type_coerce(Order.created_at, String)
+
+
+def encode_cursor(created_at, order_id):
+    return f'{created_at},{order_id}'
+
+
+def decode_cursor(cursor):
+    created_at, _, order_id = cursor.rpartition(',')
+    try:
+        datetime.fromisoformat(created_at)
+        # Both SQLite formats separate date and time with a space
+        return created_at.replace('T', ' '), int(order_id)
+    except ValueError:
+        raise ValueError('before must be a cursor from next_cursor')
+
+
+def history_args():
+    """Read ``limit`` and ``before`` from the query string.
+
+    Raises ValueError with a client-facing message on bad input.
+    """
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    max_limit = current_app.config.get('ORDER_HISTORY_MAX_LIMIT', MAX_LIMIT)
+    if not 1 <= limit <= max_limit:
+        raise ValueError(f'limit must be between 1 and {max_limit}')
+    before = request.args.get('before')
+    return limit, before and decode_cursor(before)
+
+
+def order_history(customer_id, limit=DEFAULT_LIMIT, before=None):
+    """One page of a customer's orders, newest first, with their lines and items, in two queries.
+
+    The first reads the page of orders, seeking past ``before`` (the
+    ``(created_at, id)`` of the previous page's last order, created_at as
+    stored) on the ``(customer_id, created_at)`` index instead of using
+    OFFSET. The second is selectinload's: every line of those orders with
+    its item joined, whatever the number of orders.
+    """
+    stmt = (
+        select(Order, created_at_text.label('cursor_created_at'))
+        .where(Order.customer_id == customer_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit)
+        .options(
+            load_only(Order.id, Order.total, Order.created_at, Order.updated_at),
+            selectinload(Order.order_items)
+            .load_only(OrderItem.id, OrderItem.quantity)
+            .joinedload(OrderItem.item)
+            .load_only(Item.id, Item.title, Item.price),
+        )
+    )
+    if before is not None:
+        created_at, order_id = before
+        stmt = stmt.where(or_(created_at_text < created_at,
+                              and_(created_at_text == created_at, Order.id < order_id)))
+    rows = db.session.execute(stmt).all()
+    orders = [order for order, _ in rows]
+
+    def timestamp(value):
+        return None if value is None else value.strftime(Order.datetime_format)
+
+    return {
+        'orders': [
+            {
+                'id': order.id,
+                'total': order.total,
+                'created_at': timestamp(order.created_at),
+                'updated_at': timestamp(order.updated_at),
+                'order_items': [
+                    {
+                        'id': line.id,
+                        'quantity': line.quantity,
+                        'item': None if line.item is None else
+                        {'id': line.item.id, 'title': line.item.title, 'price': line.item.price},
+                    }
+                    for line in sorted(order.order_items, key=lambda line: line.id)
+                ],
+            }
+            for order in orders
+        ],
+        'next_cursor': encode_cursor(rows[-1][1], rows[-1][0].id) if len(rows) == limit else None,
+    }
+
+
+def history_response(customer_id):
+    """The cached history page asked for in the query string, or a 400.
+
+    Cached per customer until ``invalidate`` is called for them, and
+    rebuilt when the catalog changes, since lines show current titles and
+    prices. Two queries on a miss, plus a watermark read without
+    ``CACHE_URL`` (see ResponseCache).
+    """
+    try:
+        limit, before = history_args()
+    except ValueError as e:
+        return make_response({'error': str(e)}, 400)
+
+    key = f'{customer_id}:{limit}:{request.args.get("before")}:{catalog_cache.generation()}'
+    return order_history_cache.response(key, lambda: order_history(customer_id, limit, before), scope=customer_id)
+
+
+def order_owners(*order_ids):
+    """Ids of the customers who placed ``order_ids``, for invalidating after an order item write."""
+    return set(db.session.execute(select(Order.customer_id).where(Order.id.in_(order_ids))).scalars())
+
+
+def invalidate(*customer_ids):
+    """Call after a write to these customers' orders or order items."""
+    for customer_id in customer_ids:
+        if customer_id is not None:
+            order_history_cache.invalidate(customer_id)
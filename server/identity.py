@@ -0,0 +1,89 @@
+# Standard library imports
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# Remote library imports
+from flask import make_response
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+
+# Local imports
+from config import db
+from models import Customer
+
+
+class SnapshotCache:
+    """Small TTL + LRU cache of serialized Customer rows keyed by id.
+
+    Each entry remembers the customer's ``version`` so a token issued after
+    a change (carrying a newer ``ver`` claim) forces a reload even before
+    the entry expires.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, customer_id, min_version=0):
+        with self._lock:
+            entry = self._entries.get(customer_id)
+            if entry is None:
+                return None
+            expires_at, version, snapshot = entry
+            if expires_at < time.monotonic() or version < min_version:
+                del self._entries[customer_id]
+                return None
+            self._entries.move_to_end(customer_id)
+            return snapshot
+
+    def set(self, customer_id, version, snapshot):
+        with self._lock:
+            self._entries[customer_id] = (time.monotonic() + self.ttl, version, snapshot)
+            self._entries.move_to_end(customer_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, customer_id):
+        with self._lock:
+            self._entries.pop(customer_id, None)
+
+
+customer_snapshots = SnapshotCache()
+
+
+def token_claims(customer):
+    """Extra JWT claims, enough to authorize without loading the customer."""
+    return {'admin': bool(customer.admin), 'username': customer.username, 'ver': customer.version}
+
+
+def current_customer():
+    """Serialized row of the authenticated customer, or None if it was deleted.
+
+    Served from ``customer_snapshots`` when possible; endpoints that only
+    need the id, username or admin flag should read ``get_jwt()`` instead.
+    """
+    customer_id = int(get_jwt_identity())
+    min_version = get_jwt().get('ver', 0)
+
+    snapshot = customer_snapshots.get(customer_id, min_version)
+    if snapshot is None:
+        customer = db.session.get(Customer, customer_id)
+        if customer is None:
+            return None
+        snapshot = customer.to_dict()
+        customer_snapshots.set(customer_id, customer.version, snapshot)
+    return snapshot
+
+
+def admin_required(func):
+    """``jwt_required()`` plus the token's admin claim; 403 for everyone else."""
+    @wraps(func)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if not get_jwt().get('admin'):
+            return make_response({'error': 'Admin access required'}, 403)
+        return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,304 @@
+# Standard library imports
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Remote library imports
+import click
+from flask import request, send_file
+from flask.cli import AppGroup
+from sqlalchemy import select, update
+
+# Local imports
+from config import db
+from cache import catalog_cache
+from models import Item
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+MIMETYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+DIGEST = re.compile(r'[0-9a-f]{64}')
+VARIANT = re.compile(r'(\d+)\.(\w+)')
+
+
+class ImageError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _pillow():
+    # Imported on first use: Pillow adds ~30 ms to every entry point's import otherwise, see benchmarks.startup
+    from PIL import Image, ImageOps
+    return Image, ImageOps
+
+
+def _write_atomic(path, write):
+    """Call ``write(file)`` on a temporary file next to ``path``, then rename it into place.
+
+    Readers never see a half-written file, and two workers writing the
+    same content-addressed path just replace one copy with an identical one.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            write(file)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class ImageStore:
+    """Item images on local disk, addressed by the SHA-256 of the uploaded bytes.
+
+    An original is stored once however many items use it, and each is
+    resized into every configured width and format by a pool of background
+    threads (Pillow releases the GIL while it decodes, resizes and encodes).
+    A file's name never changes meaning, so variants are served with
+    ``send_file`` (sendfile(2) under gunicorn, or X-Sendfile behind a proxy
+    with ``USE_X_SENDFILE``) and cached by browsers and CDNs for a year. A
+    variant asked for before the pool got to it is rendered on the spot.
+
+    Config:
+        IMAGE_STORE          directory, default ``<instance>/images``
+        IMAGE_WIDTHS         variant widths in pixels, default (160, 480, 960); never upscaled
+        IMAGE_FORMATS        default ('webp', 'jpeg')
+        IMAGE_DEFAULT_WIDTH  width of the WebP variant items show as img_url, default 480
+        IMAGE_QUALITY        encoder quality, default 80
+        IMAGE_MAX_BYTES      largest upload, default 10 MB
+        IMAGE_MAX_PIXELS     largest decoded image, default 40 megapixels
+        IMAGE_WORKERS        rendering threads, defaults to the number of cores; 0 renders inline
+    """
+
+    def __init__(self, app=None):
+        self.root = None
+        self.widths = (160, 480, 960)
+        self.formats = ('webp', 'jpeg')
+        self.default_width = 480
+        self.quality = 80
+        self.max_bytes = 10 * 1024 * 1024
+        self.max_pixels = 40_000_000
+        self.workers = os.cpu_count() or 1
+        self.max_age = 365 * 24 * 3600
+        self.logger = None
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = app.config.get('IMAGE_STORE') or os.path.join(app.instance_path, 'images')
+        self.widths = tuple(sorted(int(width) for width in app.config.get('IMAGE_WIDTHS', (160, 480, 960))))
+        self.formats = tuple(app.config.get('IMAGE_FORMATS', ('webp', 'jpeg')))
+        self.default_width = int(app.config.get('IMAGE_DEFAULT_WIDTH', 480))
+        self.quality = int(app.config.get('IMAGE_QUALITY', 80))
+        self.max_bytes = int(app.config.get('IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+        self.max_pixels = int(app.config.get('IMAGE_MAX_PIXELS', 40_000_000))
+        workers = app.config.get('IMAGE_WORKERS')
+        self.workers = int(workers) if workers is not None else os.cpu_count() or 1
+        self.logger = app.logger
+
+    def original_path(self, digest):
+        return os.path.join(self.root, 'originals', digest[:2], digest)
+
+    def variant_path(self, digest, width, fmt):
+        return os.path.join(self.root, 'variants', digest[:2], digest, f'{width}.{EXTENSIONS[fmt]}')
+
+    def url(self, digest, width, fmt):
+        return f'/images/{digest}/{width}.{EXTENSIONS[fmt]}'
+
+    def with_variants(self, data, digest):
+        """Point an item's ``img_url`` at its default variant and list every variant, once it has an image."""
+        if digest is None:
+            data['image_variants'] = []
+            return
+        data['img_url'] = self.url(digest, self.default_width, 'webp' if 'webp' in self.formats else self.formats[0])
+        data['image_variants'] = [{'width': width, 'format': fmt, 'url': self.url(digest, width, fmt)}
+                                  for fmt in self.formats for width in self.widths]
+
+    def ingest(self, data):
+        """Check ``data`` is an image Pillow can read, store it, and return its digest.
+
+        ImageError when it is too big (413) or not an image (400). Storing
+        bytes that are already there costs nothing but the hash.
+        """
+        if len(data) > self.max_bytes:
+            raise ImageError(f'Images are limited to {self.max_bytes} bytes', 413)
+        Image, _ = _pillow()
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                if image.width * image.height > self.max_pixels:
+                    raise ImageError(f'Images are limited to {self.max_pixels} pixels', 413)
+                image.verify()
+        except ImageError:
+            raise
+        except Exception:
+            raise ImageError('Not an image Pillow can read')
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.original_path(digest)
+        if not os.path.exists(path):
+            _write_atomic(path, lambda file: file.write(data))
+        return digest
+
+    def render(self, digest, width, fmt):
+        """Write one variant of a stored original; returns its path."""
+        Image, ImageOps = _pillow()
+        with Image.open(self.original_path(digest)) as image:
+            # JPEGs can decode straight at a fraction of full size, far cheaper than resizing afterwards
+            image.draft('RGB', (width, width * 4))
+            image = ImageOps.exif_transpose(image)
+            if image.width > width:
+                image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            if fmt == 'jpeg':
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA'):
+                # Palette and greyscale images keep their transparency in WebP
+                image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+            options = {'quality': self.quality}
+            if fmt == 'jpeg':
+                options.update(optimize=True, progressive=True)
+            else:
+                options.update(method=4)
+            path = self.variant_path(digest, width, fmt)
+            _write_atomic(path, lambda file: image.save(file, fmt.upper(), **options))
+        return path
+
+    def render_all(self, digest):
+        """Render every missing variant of ``digest``; returns how many were written."""
+        rendered = 0
+        for fmt in self.formats:
+            for width in self.widths:
+                if not os.path.exists(self.variant_path(digest, width, fmt)):
+                    self.render(digest, width, fmt)
+                    rendered += 1
+        return rendered
+
+    def _get_executor(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own pool on first use
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='images')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _log_failure(self, digest):
+        def callback(future):
+            if future.exception() is not None:
+                self.logger.error('Rendering variants of image %s failed', digest, exc_info=future.exception())
+        return callback
+
+    def schedule(self, digest):
+        """Render ``digest``'s variants in the background; inline when IMAGE_WORKERS is 0."""
+        if self.workers == 0:
+            self.render_all(digest)
+            return
+        self._get_executor().submit(self.render_all, digest).add_done_callback(self._log_failure(digest))
+
+    def variant(self, digest, name):
+        """``(path, mimetype)`` of a variant named like ``480.webp``, rendering it if needed, or None."""
+        match = VARIANT.fullmatch(name)
+        if not DIGEST.fullmatch(digest) or match is None:
+            return None
+        width, extension = int(match.group(1)), match.group(2)
+        fmt = next((fmt for fmt in self.formats if EXTENSIONS[fmt] == extension), None)
+        if width not in self.widths or fmt is None:
+            return None
+
+        path = self.variant_path(digest, width, fmt)
+        if not os.path.exists(path):
+            if not os.path.exists(self.original_path(digest)):
+                return None
+            path = self.render(digest, width, fmt)
+        return path, MIMETYPES[fmt]
+
+    def send(self, digest, name):
+        """The variant as an immutable, conditional ``send_file`` response, or None."""
+        found = self.variant(digest, name)
+        if found is None:
+            return None
+        path, mimetype = found
+        response = send_file(path, mimetype=mimetype, max_age=self.max_age, conditional=True,
+                             etag=f'{digest}-{name}')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def upload_bytes(max_bytes):
+    """The uploaded image: a multipart ``image`` field, or else the raw request body.
+
+    ImageError (413) before reading anything when the declared length is
+    already over ``max_bytes``, (400) when there is nothing.
+    """
+    if request.content_length is not None and request.content_length > max_bytes + 64 * 1024:
+        raise ImageError(f'Images are limited to {max_bytes} bytes', 413)
+    upload = request.files.get('image')
+    data = upload.read(max_bytes + 1) if upload is not None else request.get_data(cache=False)
+    if not data:
+        raise ImageError('Send the image as the request body or as a multipart "image" field')
+    return data
+
+
+def fetch(url, max_bytes, timeout=10):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read(max_bytes + 1)
+
+
+images_cli = AppGroup('images', help='The local item image store.')
+
+
+@images_cli.command('fetch')
+@click.option('--timeout', default=10.0, help='Seconds per download.')
+def fetch_command(timeout):
+    """Download every item's remote img_url into the store and render its variants."""
+    items = db.session.execute(
+        select(Item.id, Item.img_url).where(Item.image_hash.is_(None), Item.img_url.like('http%'))
+    ).all()
+    stored = 0
+    for item_id, url in items:
+        try:
+            digest = image_store.ingest(fetch(url, image_store.max_bytes, timeout))
+            image_store.render_all(digest)
+        except (ImageError, OSError, ValueError) as e:
+            click.echo(f'item {item_id}: {url}: {getattr(e, "message", e)}', err=True)
+            continue
+        db.session.execute(
+            update(Item).where(Item.id == item_id)
+            .values(image_hash=digest, version=Item.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        stored += 1
+    if stored:
+        catalog_cache.invalidate()
+    click.echo(f'{stored} of {len(items)} item images stored')
+
+
+@images_cli.command('render')
+def render_command():
+    """Render any missing variant of every stored item image, e.g. after changing IMAGE_WIDTHS."""
+    digests = db.session.execute(select(Item.image_hash).where(Item.image_hash.is_not(None)).distinct()).scalars()
+    click.echo(f'{sum(image_store.render_all(digest) for digest in digests)} variants rendered')
+
+
+def init_app(app):
+    image_store.init_app(app)
+    app.cli.add_command(images_cli)
+
+
+image_store = ImageStore()
@@ -0,0 +1,305 @@
+# Standard library imports
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+# Remote library imports
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, delete, func, insert, select, update
+
+# Local imports
+from config import db
+from cache import catalog_cache
+from models import Item, ItemStock, Reservation
+
+
+class InventoryError(Exception):
+    def __init__(self, message, status=409):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def utcnow():
+    # Naive UTC, like CURRENT_TIMESTAMP and the other DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def totals(cart):
+    """``{item_id: quantity}`` for (item_id, quantity) pairs, adding up repeated items."""
+    quantities = Counter()
+    for item_id, quantity in cart:
+        quantities[item_id] += quantity
+    return dict(quantities)
+
+
+def sync_in_stock(item_ids):
+    """Bring ``items.in_stock`` in line with item_stock for ``item_ids``; True if any flag changed.
+
+    Only called for items whose quantity just reached or left 0, so a
+    sale that leaves units on the shelf never writes to items: its
+    triggers, watermark and the item's ETag stay put. The flag is
+    recomputed from the row rather than set, so two transactions crossing
+    0 in opposite directions still leave it right; the item_stock row
+    lock they both took orders them.
+    """
+    if not item_ids:
+        return False
+    available = func.coalesce(
+        select(ItemStock.quantity > 0).where(ItemStock.item_id == Item.id).scalar_subquery(), True)
+    return bool(db.session.execute(
+        update(Item)
+        .where(Item.id.in_(item_ids), Item.in_stock != available)
+        .values(in_stock=available, version=Item.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount)
+
+
+def take_stock(quantities):
+    """Take ``{item_id: quantity}`` out of stock with one conditional UPDATE; True if an item sold out.
+
+    Each row is only decremented while it holds enough, in the database,
+    so concurrent buyers can never take the same unit and stock never goes
+    negative. If any item is short, InventoryError (409) names them and the
+    caller rolls back whatever was taken. Untracked items always succeed.
+    """
+    if not quantities:
+        return False
+    amount = case(quantities, value=ItemStock.item_id)
+    rows = db.session.execute(
+        update(ItemStock)
+        .where(ItemStock.item_id.in_(quantities), ItemStock.quantity >= amount)
+        .values(quantity=ItemStock.quantity - amount)
+        .returning(ItemStock.item_id, ItemStock.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    missing = quantities.keys() - {item_id for item_id, _ in rows}
+    if missing:
+        # Untracked, or tracked and short
+        short = db.session.execute(select(ItemStock.item_id).where(ItemStock.item_id.in_(missing))).scalars().all()
+        if short:
+            raise InventoryError(f'Out of stock: item ids {sorted(short)}')
+    return sync_in_stock({item_id for item_id, quantity in rows if quantity == 0})
+
+
+def return_stock(quantities):
+    """Put ``{item_id: quantity}`` back in one UPDATE; True if an item came back in stock."""
+    if not quantities:
+        return False
+    amount = case(quantities, value=ItemStock.item_id)
+    rows = db.session.execute(
+        update(ItemStock)
+        .where(ItemStock.item_id.in_(quantities))
+        .values(quantity=ItemStock.quantity + amount)
+        .returning(ItemStock.item_id, ItemStock.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return sync_in_stock({item_id for item_id, quantity in rows if quantity == quantities[item_id]})
+
+
+def claim_reservations(customer_id, item_ids):
+    """Delete the customer's live reservations of ``item_ids``; returns ``{item_id: quantity}`` they held.
+
+    DELETE ... RETURNING hands each row to exactly one claimant, so a
+    checkout and the expiry sweep can never both count the same units.
+    """
+    rows = db.session.execute(
+        delete(Reservation)
+        .where(Reservation.customer_id == customer_id, Reservation.item_id.in_(item_ids),
+               Reservation.expires_at > utcnow())
+        .returning(Reservation.item_id, Reservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return totals(rows)
+
+
+def fulfil(customer_id, quantities):
+    """Stock for an order of ``{item_id: quantity}``: claim the customer's reservations, take the rest.
+
+    Reserved units beyond what is bought go back on the shelf. Runs in the
+    caller's transaction; True if an item's in_stock flag changed.
+    """
+    reserved = claim_reservations(customer_id, quantities)
+    flipped = take_stock({item_id: quantity - reserved.get(item_id, 0)
+                          for item_id, quantity in quantities.items() if quantity > reserved.get(item_id, 0)})
+    extra = {item_id: held - quantities[item_id] for item_id, held in reserved.items() if held > quantities[item_id]}
+    return return_stock(extra) or flipped
+
+
+def commit_stock(flipped):
+    db.session.commit()
+    # After the commit, or a cache rebuilt in between would keep the old flag
+    if flipped:
+        catalog_cache.invalidate()
+
+
+def reserve(customer_id, cart, ttl):
+    """Hold the units in ``cart`` for ``ttl`` seconds; returns the new reservations.
+
+    All or nothing: InventoryError when an item is unknown (404) or short (409).
+    """
+    quantities = totals(cart)
+    known = set(db.session.execute(select(Item.id).where(Item.id.in_(quantities))).scalars())
+    if known != quantities.keys():
+        raise InventoryError(f'Unknown item ids: {sorted(quantities.keys() - known)}', 404)
+
+    expires_at = utcnow() + timedelta(seconds=ttl)
+    try:
+        flipped = take_stock(quantities)
+        rows = db.session.execute(
+            insert(Reservation).returning(Reservation.id, Reservation.item_id, Reservation.quantity),
+            [{'customer_id': customer_id, 'item_id': item_id, 'quantity': quantity, 'expires_at': expires_at}
+             for item_id, quantity in quantities.items()],
+        ).all()
+        commit_stock(flipped)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    expires = expires_at.replace(tzinfo=timezone.utc).isoformat()
+    return [{'id': id, 'item_id': item_id, 'quantity': quantity, 'expires_at': expires} for id, item_id, quantity in rows]
+
+
+def release(customer_id, reservation_id):
+    """Give a reservation's units back early; False if the customer holds no such reservation."""
+    row = db.session.execute(
+        delete(Reservation)
+        .where(Reservation.id == reservation_id, Reservation.customer_id == customer_id)
+        .returning(Reservation.item_id, Reservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        db.session.rollback()
+        return False
+    commit_stock(return_stock({row.item_id: row.quantity}))
+    return True
+
+
+def release_expired(batch_size=500):
+    """Delete lapsed reservations and return their units, ``batch_size`` rows per transaction.
+
+    Each batch gives stock back with a single UPDATE however many rows it
+    holds. Returns the number of reservations released.
+    """
+    released = 0
+    while True:
+        ids = db.session.execute(
+            select(Reservation.id).where(Reservation.expires_at <= utcnow())
+            .order_by(Reservation.expires_at).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return released
+        # Rows another worker's sweep or an early release took in the meantime are not returned twice
+        rows = db.session.execute(
+            delete(Reservation).where(Reservation.id.in_(ids))
+            .returning(Reservation.item_id, Reservation.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+        commit_stock(return_stock(totals(rows)))
+        released += len(rows)
+        if len(ids) < batch_size:
+            return released
+
+
+def restock(item_id, amount):
+    """Add ``amount`` units (negative to write off) in one atomic statement; returns the new quantity.
+
+    Adding to an untracked item starts tracking it. InventoryError when the
+    item is unknown (404) or would go below zero (409).
+    """
+    # Imported here: bulk pulls in the JWT stack, which manage.py's `flask reservations` should not load
+    from bulk import dialect_insert
+
+    if db.session.get(Item, item_id) is None:
+        raise InventoryError('Item not found', 404)
+    try:
+        if amount >= 0:
+            stmt = dialect_insert(ItemStock.__table__).values(item_id=item_id, quantity=amount)
+            stmt = stmt.on_conflict_do_update(index_elements=['item_id'],
+                                              set_={'quantity': ItemStock.__table__.c.quantity + amount})
+        else:
+            stmt = (update(ItemStock)
+                    .where(ItemStock.item_id == item_id, ItemStock.quantity + amount >= 0)
+                    .values(quantity=ItemStock.quantity + amount)
+                    .execution_options(synchronize_session=False))
+        quantity = db.session.execute(stmt.returning(ItemStock.__table__.c.quantity)).scalar()
+        if quantity is None:
+            raise InventoryError('Not enough stock to remove')
+        # Only crossing 0 can change the flag, as in take_stock and return_stock
+        commit_stock(sync_in_stock({item_id}) if quantity in (0, amount) else False)
+    except Exception:
+        db.session.rollback()
+        raise
+    return quantity
+
+
+def stock_level(item_id):
+    """Units left to sell or reserve, or None when the item is not tracked."""
+    return db.session.execute(select(ItemStock.quantity).where(ItemStock.item_id == item_id)).scalar()
+
+
+class ReservationSweeper:
+    """Background thread in each worker releasing expired reservations.
+
+    Started on a worker's first request rather than in init_app, so it
+    lives in the worker processes even when gunicorn preloads the app and
+    forks. Several workers sweeping at once is safe: every reservation is
+    deleted, and its stock returned, by exactly one of them.
+
+    Config:
+        RESERVATION_SWEEP_INTERVAL  seconds between sweeps, default 30; 0 disables the thread
+    """
+
+    def __init__(self, app=None):
+        self.interval = 30
+        self._app = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = float(app.config.get('RESERVATION_SWEEP_INTERVAL', 30))
+        self._app = app
+        if self.interval > 0:
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='reservation-sweeper', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._app.app_context():
+                try:
+                    release_expired()
+                except Exception:
+                    db.session.rollback()
+                    self._app.logger.exception('Releasing expired reservations failed')
+                finally:
+                    db.session.remove()
+
+
+reservations_cli = AppGroup('reservations', help='Cart reservations holding item stock.')
+
+
+@reservations_cli.command('sweep')
+def sweep_command():
+    """Release every expired reservation now, e.g. from cron when the sweeper thread is off."""
+    click.echo(f'{release_expired()} reservations released')
+
+
+def init_app(app):
+    app.cli.add_command(reservations_cli)
+
+
+sweeper = ReservationSweeper()
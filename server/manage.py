@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""Command line entry point: migrations and maintenance commands, without the HTTP stack.
+
+    export FLASK_APP=manage.py
+    flask db upgrade
+    flask rollups rebuild
+    flask reservations sweep
+    flask images fetch
+    flask audit replay --entity order --from 2024-01-01
+"""
+
+# Standard library imports
+
+# Remote library imports
+from flask_migrate import Migrate
+
+# Local imports
+from config import create_app, db
+import audit
+import images
+import inventory
+import reports
+
+app = create_app()
+migrate = Migrate(app, db)
+reports.init_app(app)
+inventory.init_app(app)
+images.init_app(app)
+audit.init_app(app)
@@ -0,0 +1,197 @@
+# Standard library imports
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+# Remote library imports
+from flask import Response, g, has_app_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Local imports
+from query_budget import query_count
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram for one label set."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        running = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            running += count
+            yield bound, running
+
+
+class Counter:
+    """Prometheus counter for values recorded outside the request cycle, see ``Metrics.counter``."""
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] += amount
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            rendered = ','.join(f'{key}="{label}"' for key, label in labels)
+            yield f'{self.name}{{{rendered}}} {value}'
+
+
+class Metrics:
+    """Per resource and method request metrics, exposed as Prometheus text on /metrics.
+
+    Recorded for every request: latency, response size, number and total
+    time of SQL statements, and time spent turning rows into JSON. Other
+    modules add their own counters with ``counter()``.
+
+    Everything is kept in this process's memory. Under gunicorn every
+    worker counts only the requests it handled, and a scrape of /metrics
+    reads whichever worker accepted it. The figures also start again from
+    zero when a worker is recycled (``max_requests``).
+    """
+
+    HISTOGRAMS = {
+        'http_request_duration_seconds': ('Request latency', LATENCY_BUCKETS),
+        'http_response_size_bytes': ('Response body size', BYTES_BUCKETS),
+        'db_queries_per_request': ('SQL statements issued per request', QUERY_BUCKETS),
+        'db_query_duration_seconds': ('Time spent in SQL per request', LATENCY_BUCKETS),
+        'serialization_duration_seconds': ('Time spent serializing rows and JSON per request', LATENCY_BUCKETS),
+    }
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in self.HISTOGRAMS}
+        self._requests = defaultdict(int)
+        self._counters = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.json = TimedJSONProvider.from_provider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+
+    def counter(self, name, description):
+        counter = Counter(name, description)
+        self._counters.append(counter)
+        return counter
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = query_count()
+
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None or request.endpoint == 'metrics':
+            return response
+
+        labels = (request.endpoint or 'unmatched', request.method)
+        observations = {
+            'http_request_duration_seconds': time.perf_counter() - started,
+            'db_queries_per_request': query_count() - g.pop('metrics_queries', 0),
+            'db_query_duration_seconds': g.get('query_time', 0.0),
+            'serialization_duration_seconds': g.get('serialization_time', 0.0),
+        }
+        if not response.is_streamed:
+            observations['http_response_size_bytes'] = response.calculate_content_length() or 0
+
+        with self._lock:
+            self._requests[(*labels, response.status_code)] += 1
+            for name, value in observations.items():
+                histograms = self._histograms[name]
+                if labels not in histograms:
+                    histograms[labels] = Histogram(self.HISTOGRAMS[name][1])
+                histograms[labels].observe(value)
+        return response
+
+    def render(self):
+        lines = [
+            '# HELP http_requests_total Requests by resource, method and status',
+            '# TYPE http_requests_total counter',
+        ]
+        with self._lock:
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            for name, (description, _) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (endpoint, method), histogram in sorted(self._histograms[name].items()):
+                    labels = f'endpoint="{endpoint}",method="{method}"'
+                    for bound, count in histogram.samples():
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {sum(histogram.counts)}')
+        for counter in self._counters:
+            lines.extend(counter.lines())
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+def record_serialization(seconds):
+    if has_app_context():
+        g.serialization_time = g.get('serialization_time', 0.0) + seconds
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that adds its encoding time to the request's serialization time."""
+
+    @classmethod
+    def from_provider(cls, app):
+        provider = cls(app)
+        for setting in ('ensure_ascii', 'sort_keys', 'compact', 'mimetype'):
+            setattr(provider, setting, getattr(app.json, setting))
+        return provider
+
+    def dumps(self, obj, **kwargs):
+        began = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_serialization(time.perf_counter() - began)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    if has_app_context():
+        g.query_time = g.get('query_time', 0.0) + time.perf_counter() - started
+
+
+@event.listens_for(Engine, 'handle_error')
+def drop_query_timer(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get('query_started'):
+        context.connection.info['query_started'].pop()
+
+
+metrics = Metrics()
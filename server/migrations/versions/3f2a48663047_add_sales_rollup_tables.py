@@ -0,0 +1,105 @@
+"""Add sales rollup tables
+
+Revision ID: 3f2a48663047
+Revises: 9c1f3e7a2b40
+Create Date: 2026-10-17 13:50:27.895547
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a48663047'
+down_revision = '9c1f3e7a2b40'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of models.SALES_ROLLUP_TRIGGERS at this revision (SQLite only)
+SALES_ROLLUP_TRIGGERS = (
+    'CREATE TRIGGER IF NOT EXISTS sales_orders_insert AFTER INSERT ON orders BEGIN INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = orders + 1, lifetime_value = lifetime_value + excluded.lifetime_value; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orders_delete AFTER DELETE ON orders BEGIN UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) WHERE day = date(old.created_at); UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) WHERE customer_id = old.customer_id; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orders_update AFTER UPDATE OF total, customer_id, created_at ON orders BEGIN UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) WHERE day = date(old.created_at); UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) WHERE customer_id = old.customer_id; INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = orders + 1, lifetime_value = lifetime_value + excluded.lifetime_value; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orderitems_insert AFTER INSERT ON orderitems BEGIN INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT new.item_id, (SELECT category FROM items WHERE id = new.item_id), coalesce(new.quantity, 0), 1 WHERE new.order_id IS NOT NULL AND new.item_id IS NOT NULL ON CONFLICT(item_id) DO UPDATE SET quantity = quantity + excluded.quantity, order_lines = order_lines + 1; INSERT INTO category_sales(category, quantity) SELECT category, coalesce(new.quantity, 0) FROM item_sales WHERE new.order_id IS NOT NULL AND item_id = new.item_id AND category IS NOT NULL ON CONFLICT(category) DO UPDATE SET quantity = quantity + excluded.quantity; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orderitems_delete AFTER DELETE ON orderitems BEGIN UPDATE category_sales SET quantity = quantity - coalesce(old.quantity, 0) WHERE old.order_id IS NOT NULL AND category = (SELECT category FROM item_sales WHERE item_id = old.item_id); UPDATE item_sales SET quantity = quantity - coalesce(old.quantity, 0), order_lines = order_lines - 1 WHERE old.order_id IS NOT NULL AND item_id = old.item_id; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orderitems_update AFTER UPDATE OF quantity, item_id, order_id ON orderitems BEGIN UPDATE category_sales SET quantity = quantity - coalesce(old.quantity, 0) WHERE old.order_id IS NOT NULL AND category = (SELECT category FROM item_sales WHERE item_id = old.item_id); UPDATE item_sales SET quantity = quantity - coalesce(old.quantity, 0), order_lines = order_lines - 1 WHERE old.order_id IS NOT NULL AND item_id = old.item_id; INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT new.item_id, (SELECT category FROM items WHERE id = new.item_id), coalesce(new.quantity, 0), 1 WHERE new.order_id IS NOT NULL AND new.item_id IS NOT NULL ON CONFLICT(item_id) DO UPDATE SET quantity = quantity + excluded.quantity, order_lines = order_lines + 1; INSERT INTO category_sales(category, quantity) SELECT category, coalesce(new.quantity, 0) FROM item_sales WHERE new.order_id IS NOT NULL AND item_id = new.item_id AND category IS NOT NULL ON CONFLICT(category) DO UPDATE SET quantity = quantity + excluded.quantity; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_items_category AFTER UPDATE OF category ON items BEGIN UPDATE category_sales SET quantity = quantity - (SELECT quantity FROM item_sales WHERE item_id = new.id) WHERE category = (SELECT category FROM item_sales WHERE item_id = new.id); UPDATE item_sales SET category = new.category WHERE item_id = new.id; INSERT INTO category_sales(category, quantity) SELECT new.category, quantity FROM item_sales WHERE item_id = new.id ON CONFLICT(category) DO UPDATE SET quantity = quantity + excluded.quantity; END',
+)
+
+# Backfill, the same aggregates as reports.rebuild()
+BACKFILL = (
+    "INSERT INTO sales_daily(day, orders, revenue) "
+    "SELECT date(created_at), count(*), coalesce(sum(total), 0) FROM orders "
+    "WHERE created_at IS NOT NULL GROUP BY date(created_at)",
+    "INSERT INTO item_sales(item_id, category, quantity, order_lines) "
+    "SELECT orderitems.item_id, items.category, coalesce(sum(orderitems.quantity), 0), count(*) "
+    "FROM orderitems LEFT OUTER JOIN items ON items.id = orderitems.item_id "
+    "WHERE orderitems.order_id IS NOT NULL AND orderitems.item_id IS NOT NULL "
+    "GROUP BY orderitems.item_id, items.category",
+    "INSERT INTO category_sales(category, quantity) "
+    "SELECT category, sum(quantity) FROM item_sales WHERE category IS NOT NULL GROUP BY category",
+    "INSERT INTO customer_sales(customer_id, orders, lifetime_value) "
+    "SELECT customer_id, count(*), coalesce(sum(total), 0) FROM orders "
+    "WHERE customer_id IS NOT NULL GROUP BY customer_id",
+)
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('category_sales',
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('category')
+    )
+    op.create_table('customer_sales',
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('lifetime_value', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('customer_id')
+    )
+    with op.batch_alter_table('customer_sales', schema=None) as batch_op:
+        batch_op.create_index('ix_customer_sales_lifetime_value', ['lifetime_value'], unique=False)
+
+    op.create_table('item_sales',
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('order_lines', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('item_id')
+    )
+    with op.batch_alter_table('item_sales', schema=None) as batch_op:
+        batch_op.create_index('ix_item_sales_quantity', ['quantity'], unique=False)
+
+    op.create_table('sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    # ### end Alembic commands ###
+
+    for statement in BACKFILL:
+        op.execute(statement)
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SALES_ROLLUP_TRIGGERS:
+            op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('sales_orders_insert', 'sales_orders_delete', 'sales_orders_update', 'sales_orderitems_insert',
+                        'sales_orderitems_delete', 'sales_orderitems_update', 'sales_items_category'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('sales_daily')
+    with op.batch_alter_table('item_sales', schema=None) as batch_op:
+        batch_op.drop_index('ix_item_sales_quantity')
+
+    op.drop_table('item_sales')
+    with op.batch_alter_table('customer_sales', schema=None) as batch_op:
+        batch_op.drop_index('ix_customer_sales_lifetime_value')
+
+    op.drop_table('customer_sales')
+    op.drop_table('category_sales')
+    # ### end Alembic commands ###
@@ -0,0 +1,57 @@
+"""count order lines written before their order
+
+Revision ID: 7c475fd20971
+Revises: a74e88576ce9
+Create Date: 2026-10-17 15:12:05.652864
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7c475fd20971'
+down_revision = 'a74e88576ce9'
+branch_labels = None
+depends_on = None
+
+# Frozen copies of the orders triggers in models.py at this revision, which
+# also count the order's lines already written
+SQLITE_TRIGGER = 'CREATE TRIGGER IF NOT EXISTS sales_orders_insert AFTER INSERT ON orders BEGIN INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = sales_daily.orders + 1, revenue = sales_daily.revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = customer_sales.orders + 1, lifetime_value = customer_sales.lifetime_value + excluded.lifetime_value; INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT item_id, (SELECT category FROM items WHERE id = orderitems.item_id), coalesce(sum(quantity), 0), count(*) FROM orderitems WHERE order_id = new.id AND item_id IS NOT NULL GROUP BY item_id ON CONFLICT(item_id) DO UPDATE SET quantity = item_sales.quantity + excluded.quantity, order_lines = item_sales.order_lines + excluded.order_lines; INSERT INTO category_sales(category, quantity) SELECT item_sales.category, coalesce(sum(orderitems.quantity), 0) FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = new.id AND item_sales.category IS NOT NULL GROUP BY item_sales.category ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; END'
+POSTGRESQL_FUNCTION = "CREATE OR REPLACE FUNCTION sales_orders_rollup() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN IF TG_OP <> 'INSERT' THEN UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) WHERE day = date(old.created_at); UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) WHERE customer_id = old.customer_id; END IF; IF TG_OP = 'DELETE' THEN UPDATE category_sales SET quantity = quantity - (SELECT coalesce(sum(orderitems.quantity), 0) FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = old.id AND item_sales.category = category_sales.category) WHERE category IN (SELECT item_sales.category FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = old.id); UPDATE item_sales SET quantity = quantity - (SELECT coalesce(sum(quantity), 0) FROM orderitems WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id), order_lines = order_lines - (SELECT count(*) FROM orderitems WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id) WHERE item_id IN (SELECT item_id FROM orderitems WHERE order_id = old.id); END IF; IF TG_OP <> 'DELETE' THEN INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = sales_daily.orders + 1, revenue = sales_daily.revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = customer_sales.orders + 1, lifetime_value = customer_sales.lifetime_value + excluded.lifetime_value; END IF; IF TG_OP = 'INSERT' THEN INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT item_id, (SELECT category FROM items WHERE id = orderitems.item_id), coalesce(sum(quantity), 0), count(*) FROM orderitems WHERE order_id = new.id AND item_id IS NOT NULL GROUP BY item_id ON CONFLICT(item_id) DO UPDATE SET quantity = item_sales.quantity + excluded.quantity, order_lines = item_sales.order_lines + excluded.order_lines; INSERT INTO category_sales(category, quantity) SELECT item_sales.category, coalesce(sum(orderitems.quantity), 0) FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = new.id AND item_sales.category IS NOT NULL GROUP BY item_sales.category ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; END IF; RETURN NULL; END $$"
+
+# As a74e88576ce9 created them, for downgrade
+PREVIOUS_SQLITE_TRIGGER = 'CREATE TRIGGER IF NOT EXISTS sales_orders_insert AFTER INSERT ON orders BEGIN INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = sales_daily.orders + 1, revenue = sales_daily.revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = customer_sales.orders + 1, lifetime_value = customer_sales.lifetime_value + excluded.lifetime_value; END'
+PREVIOUS_POSTGRESQL_FUNCTION = "CREATE OR REPLACE FUNCTION sales_orders_rollup() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN IF TG_OP <> 'INSERT' THEN UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) WHERE day = date(old.created_at); UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) WHERE customer_id = old.customer_id; END IF; IF TG_OP = 'DELETE' THEN UPDATE category_sales SET quantity = quantity - (SELECT coalesce(sum(orderitems.quantity), 0) FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = old.id AND item_sales.category = category_sales.category) WHERE category IN (SELECT item_sales.category FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = old.id); UPDATE item_sales SET quantity = quantity - (SELECT coalesce(sum(quantity), 0) FROM orderitems WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id), order_lines = order_lines - (SELECT count(*) FROM orderitems WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id) WHERE item_id IN (SELECT item_id FROM orderitems WHERE order_id = old.id); END IF; IF TG_OP <> 'DELETE' THEN INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = sales_daily.orders + 1, revenue = sales_daily.revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = customer_sales.orders + 1, lifetime_value = customer_sales.lifetime_value + excluded.lifetime_value; END IF; RETURN NULL; END $$"
+
+# Recompute, the same aggregates as reports.rebuild(): lines written before
+# their order (seed.py's fixture did) were never counted
+REBUILD = (
+    'DELETE FROM sales_daily',
+    'DELETE FROM item_sales',
+    'DELETE FROM category_sales',
+    'DELETE FROM customer_sales',
+    'INSERT INTO sales_daily(day, orders, revenue) SELECT date(created_at), count(*), coalesce(sum(total), 0) FROM orders WHERE created_at IS NOT NULL GROUP BY date(created_at)',
+    'INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT orderitems.item_id, items.category, coalesce(sum(orderitems.quantity), 0), count(*) FROM orderitems JOIN orders ON orders.id = orderitems.order_id LEFT OUTER JOIN items ON items.id = orderitems.item_id WHERE orderitems.item_id IS NOT NULL GROUP BY orderitems.item_id, items.category',
+    'INSERT INTO category_sales(category, quantity) SELECT category, sum(quantity) FROM item_sales WHERE category IS NOT NULL GROUP BY category',
+    'INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT customer_id, count(*), coalesce(sum(total), 0) FROM orders WHERE customer_id IS NOT NULL GROUP BY customer_id',
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS sales_orders_insert')
+        op.execute(SQLITE_TRIGGER)
+    elif dialect == 'postgresql':
+        op.execute(POSTGRESQL_FUNCTION)
+    for statement in REBUILD:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS sales_orders_insert')
+        op.execute(PREVIOUS_SQLITE_TRIGGER)
+    elif dialect == 'postgresql':
+        op.execute(PREVIOUS_POSTGRESQL_FUNCTION)
@@ -0,0 +1,54 @@
+"""Add items full-text index and price index
+
+Revision ID: 9c1f3e7a2b40
+Revises: 525919cb136d
+Create Date: 2026-10-17 14:05:12.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1f3e7a2b40'
+down_revision = '525919cb136d'
+branch_labels = None
+depends_on = None
+
+# Copied from models.ITEMS_FTS_DDL at the time of this revision. A batch
+# migration that recreates the items table drops these triggers, so it must
+# run them again.
+ITEMS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE items_fts USING fts5("
+    "title, description, content='items', content_rowid='id', prefix='2 3', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER items_fts_insert AFTER INSERT ON items BEGIN "
+    "INSERT INTO items_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER items_fts_delete AFTER DELETE ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER items_fts_update AFTER UPDATE OF title, description ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO items_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+)
+
+
+def upgrade():
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.create_index('ix_items_price', ['price'], unique=False)
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in ITEMS_FTS_DDL:
+        op.execute(statement)
+    # Index the rows that already exist
+    op.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('items_fts_insert', 'items_fts_delete', 'items_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS items_fts')
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.drop_index('ix_items_price')
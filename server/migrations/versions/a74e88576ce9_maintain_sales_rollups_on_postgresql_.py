@@ -0,0 +1,104 @@
+"""maintain sales rollups on postgresql and order deletion
+
+Revision ID: a74e88576ce9
+Revises: 953a324ad498
+Create Date: 2026-10-17 15:00:39.245996
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a74e88576ce9'
+down_revision = '953a324ad498'
+branch_labels = None
+depends_on = None
+
+SQLITE_TRIGGER_NAMES = ('sales_orders_insert', 'sales_orders_delete', 'sales_orders_update', 'sales_orderitems_insert',
+                        'sales_orderitems_delete', 'sales_orderitems_update', 'sales_items_category')
+
+# Frozen copies of models.SALES_ROLLUP_TRIGGERS and
+# models.POSTGRESQL_SALES_ROLLUP_TRIGGERS at this revision
+SQLITE_TRIGGERS = (
+    'CREATE TRIGGER IF NOT EXISTS sales_orders_insert AFTER INSERT ON orders BEGIN INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = sales_daily.orders + 1, revenue = sales_daily.revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = customer_sales.orders + 1, lifetime_value = customer_sales.lifetime_value + excluded.lifetime_value; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orders_delete AFTER DELETE ON orders BEGIN UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) WHERE day = date(old.created_at); UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) WHERE customer_id = old.customer_id; UPDATE category_sales SET quantity = quantity - (SELECT coalesce(sum(orderitems.quantity), 0) FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = old.id AND item_sales.category = category_sales.category) WHERE category IN (SELECT item_sales.category FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = old.id); UPDATE item_sales SET quantity = quantity - (SELECT coalesce(sum(quantity), 0) FROM orderitems WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id), order_lines = order_lines - (SELECT count(*) FROM orderitems WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id) WHERE item_id IN (SELECT item_id FROM orderitems WHERE order_id = old.id); END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orders_update AFTER UPDATE OF total, customer_id, created_at ON orders BEGIN UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) WHERE day = date(old.created_at); UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) WHERE customer_id = old.customer_id; INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = sales_daily.orders + 1, revenue = sales_daily.revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = customer_sales.orders + 1, lifetime_value = customer_sales.lifetime_value + excluded.lifetime_value; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orderitems_insert AFTER INSERT ON orderitems BEGIN INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT new.item_id, (SELECT category FROM items WHERE id = new.item_id), coalesce(new.quantity, 0), 1 WHERE EXISTS (SELECT 1 FROM orders WHERE id = new.order_id) AND new.item_id IS NOT NULL ON CONFLICT(item_id) DO UPDATE SET quantity = item_sales.quantity + excluded.quantity, order_lines = item_sales.order_lines + 1; INSERT INTO category_sales(category, quantity) SELECT category, coalesce(new.quantity, 0) FROM item_sales WHERE EXISTS (SELECT 1 FROM orders WHERE id = new.order_id) AND item_id = new.item_id AND category IS NOT NULL ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orderitems_delete AFTER DELETE ON orderitems BEGIN UPDATE category_sales SET quantity = quantity - coalesce(old.quantity, 0) WHERE EXISTS (SELECT 1 FROM orders WHERE id = old.order_id) AND category = (SELECT category FROM item_sales WHERE item_id = old.item_id); UPDATE item_sales SET quantity = quantity - coalesce(old.quantity, 0), order_lines = order_lines - 1 WHERE EXISTS (SELECT 1 FROM orders WHERE id = old.order_id) AND item_id = old.item_id; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orderitems_update AFTER UPDATE OF quantity, item_id, order_id ON orderitems BEGIN UPDATE category_sales SET quantity = quantity - coalesce(old.quantity, 0) WHERE EXISTS (SELECT 1 FROM orders WHERE id = old.order_id) AND category = (SELECT category FROM item_sales WHERE item_id = old.item_id); UPDATE item_sales SET quantity = quantity - coalesce(old.quantity, 0), order_lines = order_lines - 1 WHERE EXISTS (SELECT 1 FROM orders WHERE id = old.order_id) AND item_id = old.item_id; INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT new.item_id, (SELECT category FROM items WHERE id = new.item_id), coalesce(new.quantity, 0), 1 WHERE EXISTS (SELECT 1 FROM orders WHERE id = new.order_id) AND new.item_id IS NOT NULL ON CONFLICT(item_id) DO UPDATE SET quantity = item_sales.quantity + excluded.quantity, order_lines = item_sales.order_lines + 1; INSERT INTO category_sales(category, quantity) SELECT category, coalesce(new.quantity, 0) FROM item_sales WHERE EXISTS (SELECT 1 FROM orders WHERE id = new.order_id) AND item_id = new.item_id AND category IS NOT NULL ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_items_category AFTER UPDATE OF category ON items BEGIN UPDATE category_sales SET quantity = quantity - (SELECT quantity FROM item_sales WHERE item_id = new.id) WHERE category = (SELECT category FROM item_sales WHERE item_id = new.id); UPDATE item_sales SET category = new.category WHERE item_id = new.id; INSERT INTO category_sales(category, quantity) SELECT new.category, quantity FROM item_sales WHERE item_id = new.id ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; END',
+)
+POSTGRESQL_TRIGGERS = (
+    "CREATE OR REPLACE FUNCTION sales_orders_rollup() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN IF TG_OP <> 'INSERT' THEN UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) WHERE day = date(old.created_at); UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) WHERE customer_id = old.customer_id; END IF; IF TG_OP = 'DELETE' THEN UPDATE category_sales SET quantity = quantity - (SELECT coalesce(sum(orderitems.quantity), 0) FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = old.id AND item_sales.category = category_sales.category) WHERE category IN (SELECT item_sales.category FROM orderitems JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = old.id); UPDATE item_sales SET quantity = quantity - (SELECT coalesce(sum(quantity), 0) FROM orderitems WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id), order_lines = order_lines - (SELECT count(*) FROM orderitems WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id) WHERE item_id IN (SELECT item_id FROM orderitems WHERE order_id = old.id); END IF; IF TG_OP <> 'DELETE' THEN INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = sales_daily.orders + 1, revenue = sales_daily.revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = customer_sales.orders + 1, lifetime_value = customer_sales.lifetime_value + excluded.lifetime_value; END IF; RETURN NULL; END $$",
+    "CREATE OR REPLACE FUNCTION sales_orderitems_rollup() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN IF TG_OP <> 'INSERT' THEN UPDATE category_sales SET quantity = quantity - coalesce(old.quantity, 0) WHERE EXISTS (SELECT 1 FROM orders WHERE id = old.order_id) AND category = (SELECT category FROM item_sales WHERE item_id = old.item_id); UPDATE item_sales SET quantity = quantity - coalesce(old.quantity, 0), order_lines = order_lines - 1 WHERE EXISTS (SELECT 1 FROM orders WHERE id = old.order_id) AND item_id = old.item_id; END IF; IF TG_OP <> 'DELETE' THEN INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT new.item_id, (SELECT category FROM items WHERE id = new.item_id), coalesce(new.quantity, 0), 1 WHERE EXISTS (SELECT 1 FROM orders WHERE id = new.order_id) AND new.item_id IS NOT NULL ON CONFLICT(item_id) DO UPDATE SET quantity = item_sales.quantity + excluded.quantity, order_lines = item_sales.order_lines + 1; INSERT INTO category_sales(category, quantity) SELECT category, coalesce(new.quantity, 0) FROM item_sales WHERE EXISTS (SELECT 1 FROM orders WHERE id = new.order_id) AND item_id = new.item_id AND category IS NOT NULL ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; END IF; RETURN NULL; END $$",
+    'CREATE OR REPLACE FUNCTION sales_items_category_rollup() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN UPDATE category_sales SET quantity = quantity - (SELECT quantity FROM item_sales WHERE item_id = new.id) WHERE category = (SELECT category FROM item_sales WHERE item_id = new.id); UPDATE item_sales SET category = new.category WHERE item_id = new.id; INSERT INTO category_sales(category, quantity) SELECT new.category, quantity FROM item_sales WHERE item_id = new.id ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; RETURN NULL; END $$',
+    'DROP TRIGGER IF EXISTS sales_orders ON orders',
+    'CREATE TRIGGER sales_orders AFTER INSERT OR DELETE OR UPDATE OF total, customer_id, created_at ON orders FOR EACH ROW EXECUTE FUNCTION sales_orders_rollup()',
+    'DROP TRIGGER IF EXISTS sales_orderitems ON orderitems',
+    'CREATE TRIGGER sales_orderitems AFTER INSERT OR DELETE OR UPDATE OF quantity, item_id, order_id ON orderitems FOR EACH ROW EXECUTE FUNCTION sales_orderitems_rollup()',
+    'DROP TRIGGER IF EXISTS sales_items_category ON items',
+    'CREATE TRIGGER sales_items_category AFTER UPDATE OF category ON items FOR EACH ROW EXECUTE FUNCTION sales_items_category_rollup()',
+)
+
+# The SQLite triggers as 3f2a48663047 created them, for downgrade
+PREVIOUS_SQLITE_TRIGGERS = (
+    'CREATE TRIGGER IF NOT EXISTS sales_orders_insert AFTER INSERT ON orders BEGIN INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = orders + 1, lifetime_value = lifetime_value + excluded.lifetime_value; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orders_delete AFTER DELETE ON orders BEGIN UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) WHERE day = date(old.created_at); UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) WHERE customer_id = old.customer_id; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orders_update AFTER UPDATE OF total, customer_id, created_at ON orders BEGIN UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) WHERE day = date(old.created_at); UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) WHERE customer_id = old.customer_id; INSERT INTO sales_daily(day, orders, revenue) SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL ON CONFLICT(day) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue; INSERT INTO customer_sales(customer_id, orders, lifetime_value) SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL ON CONFLICT(customer_id) DO UPDATE SET orders = orders + 1, lifetime_value = lifetime_value + excluded.lifetime_value; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orderitems_insert AFTER INSERT ON orderitems BEGIN INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT new.item_id, (SELECT category FROM items WHERE id = new.item_id), coalesce(new.quantity, 0), 1 WHERE new.order_id IS NOT NULL AND new.item_id IS NOT NULL ON CONFLICT(item_id) DO UPDATE SET quantity = quantity + excluded.quantity, order_lines = order_lines + 1; INSERT INTO category_sales(category, quantity) SELECT category, coalesce(new.quantity, 0) FROM item_sales WHERE new.order_id IS NOT NULL AND item_id = new.item_id AND category IS NOT NULL ON CONFLICT(category) DO UPDATE SET quantity = quantity + excluded.quantity; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orderitems_delete AFTER DELETE ON orderitems BEGIN UPDATE category_sales SET quantity = quantity - coalesce(old.quantity, 0) WHERE old.order_id IS NOT NULL AND category = (SELECT category FROM item_sales WHERE item_id = old.item_id); UPDATE item_sales SET quantity = quantity - coalesce(old.quantity, 0), order_lines = order_lines - 1 WHERE old.order_id IS NOT NULL AND item_id = old.item_id; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_orderitems_update AFTER UPDATE OF quantity, item_id, order_id ON orderitems BEGIN UPDATE category_sales SET quantity = quantity - coalesce(old.quantity, 0) WHERE old.order_id IS NOT NULL AND category = (SELECT category FROM item_sales WHERE item_id = old.item_id); UPDATE item_sales SET quantity = quantity - coalesce(old.quantity, 0), order_lines = order_lines - 1 WHERE old.order_id IS NOT NULL AND item_id = old.item_id; INSERT INTO item_sales(item_id, category, quantity, order_lines) SELECT new.item_id, (SELECT category FROM items WHERE id = new.item_id), coalesce(new.quantity, 0), 1 WHERE new.order_id IS NOT NULL AND new.item_id IS NOT NULL ON CONFLICT(item_id) DO UPDATE SET quantity = quantity + excluded.quantity, order_lines = order_lines + 1; INSERT INTO category_sales(category, quantity) SELECT category, coalesce(new.quantity, 0) FROM item_sales WHERE new.order_id IS NOT NULL AND item_id = new.item_id AND category IS NOT NULL ON CONFLICT(category) DO UPDATE SET quantity = quantity + excluded.quantity; END',
+    'CREATE TRIGGER IF NOT EXISTS sales_items_category AFTER UPDATE OF category ON items BEGIN UPDATE category_sales SET quantity = quantity - (SELECT quantity FROM item_sales WHERE item_id = new.id) WHERE category = (SELECT category FROM item_sales WHERE item_id = new.id); UPDATE item_sales SET category = new.category WHERE item_id = new.id; INSERT INTO category_sales(category, quantity) SELECT new.category, quantity FROM item_sales WHERE item_id = new.id ON CONFLICT(category) DO UPDATE SET quantity = quantity + excluded.quantity; END',
+)
+
+# Recompute, the same aggregates as reports.rebuild(): lines of deleted orders
+# were still counted, and PostgreSQL had no triggers at all
+REBUILD = (
+    "DELETE FROM sales_daily",
+    "DELETE FROM item_sales",
+    "DELETE FROM category_sales",
+    "DELETE FROM customer_sales",
+    "INSERT INTO sales_daily(day, orders, revenue) "
+    "SELECT date(created_at), count(*), coalesce(sum(total), 0) FROM orders "
+    "WHERE created_at IS NOT NULL GROUP BY date(created_at)",
+    "INSERT INTO item_sales(item_id, category, quantity, order_lines) "
+    "SELECT orderitems.item_id, items.category, coalesce(sum(orderitems.quantity), 0), count(*) "
+    "FROM orderitems JOIN orders ON orders.id = orderitems.order_id "
+    "LEFT OUTER JOIN items ON items.id = orderitems.item_id "
+    "WHERE orderitems.item_id IS NOT NULL "
+    "GROUP BY orderitems.item_id, items.category",
+    "INSERT INTO category_sales(category, quantity) "
+    "SELECT category, sum(quantity) FROM item_sales WHERE category IS NOT NULL GROUP BY category",
+    "INSERT INTO customer_sales(customer_id, orders, lifetime_value) "
+    "SELECT customer_id, count(*), coalesce(sum(total), 0) FROM orders "
+    "WHERE customer_id IS NOT NULL GROUP BY customer_id",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in SQLITE_TRIGGER_NAMES:
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRESQL_TRIGGERS:
+            op.execute(statement)
+    for statement in REBUILD:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in SQLITE_TRIGGER_NAMES:
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        for statement in PREVIOUS_SQLITE_TRIGGERS:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for table, trigger in (('orders', 'sales_orders'), ('orderitems', 'sales_orderitems'),
+                               ('items', 'sales_items_category')):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger} ON {table}')
+        for function in ('sales_orders_rollup', 'sales_orderitems_rollup', 'sales_items_category_rollup'):
+            op.execute(f'DROP FUNCTION IF EXISTS {function}()')
@@ -0,0 +1,31 @@
+"""add version columns
+
+Revision ID: d19664a0a23b
+Revises: 25845e780564
+Create Date: 2026-10-17 14:11:50.237175
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd19664a0a23b'
+down_revision = '25845e780564'
+branch_labels = None
+depends_on = None
+
+
+# Plain ALTER TABLE rather than batch mode: recreating these tables on SQLite would drop
+# their FTS, rollup and watermark triggers. DROP COLUMN needs SQLite 3.35 or newer.
+VERSIONED_TABLES = ('items', 'orderitems', 'orders')
+
+
+def upgrade():
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in VERSIONED_TABLES:
+        op.drop_column(table, 'version')
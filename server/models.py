@@ -2,8 +2,9 @@ from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import validates
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import DDL, event
 
-from config import db, bcrypt
+from config import db, hasher
 
 # Models go here!
 
@@ -19,11 +20,17 @@ class Customer(db.Model, SerializerMixin):
     _password_hash = db.Column(db.String, nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, onupdate=db.func.now())
+    # Bumped on every update (version_id_col), so If-Match, JWT claims and cached snapshots can tell they are stale
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     orders = db.relationship('Order', backref='customer')
     order_items = association_proxy('orders', 'order_items')
 
-    serialize_rules = ('-_password_hash', '-orders', '-created_at', '-updated_at')
+    serialize_rules = ('-_password_hash', '-orders', '-created_at', '-updated_at', '-version')
+
+    # The ORM adds "AND version = <loaded>" to every UPDATE/DELETE and raises StaleDataError if
+    # another writer got there first. Core UPDATEs must bump it themselves (see checkout.py, bulk.py).
+    __mapper_args__ = {'version_id_col': version}
 
     @validates('name')
     def validate_name(self, key, name):
@@ -37,13 +44,15 @@ class Customer(db.Model, SerializerMixin):
     
     @password_hash.setter
     def password_hash(self, password):
-        password_hash = bcrypt.generate_password_hash(
-            password.encode('utf-8'))
-        self._password_hash = password_hash.decode('utf-8')
+        self._password_hash = hasher.hash(password)
     
     def authenticate(self, password):
-        return bcrypt.check_password_hash(
-            self._password_hash, password.encode('utf-8'))
+        if not hasher.check(self._password_hash, password):
+            return False
+        # Upgrade hashes made with an older cost factor while we have the plaintext
+        if hasher.needs_rehash(self._password_hash):
+            self.password_hash = password
+        return True
 
 class Item(db.Model, SerializerMixin):
     __tablename__ = 'items'
@@ -54,10 +63,23 @@ class Item(db.Model, SerializerMixin):
     description = db.Column(db.String)
     category = db.Column(db.String, nullable=False)
     price = db.Column(db.Integer)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Whether anything is left to buy; inventory.py keeps it in step with item_stock
+    in_stock = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
+    # SHA-256 of the uploaded original in images.py's store; /items then serves its variants instead of img_url
+    image_hash = db.Column(db.String(64))
 
     order_items = db.relationship('OrderItem', backref='item')
 
-    serialize_rules = ('-order_items', '-created_at', '-updated_at')
+    serialize_rules = ('-order_items', '-created_at', '-updated_at', '-version', '-image_hash')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    __table_args__ = (
+        db.Index('ix_items_category', 'category'),
+        # Price range filter on /items/search
+        db.Index('ix_items_price', 'price'),
+    )
 
     @validates('category')
     def validate_category(self, key, category):
@@ -71,6 +93,55 @@ class Item(db.Model, SerializerMixin):
             raise ValueError('Must have a price of 1 or more')
         return price
 
+# Full-text index behind /items/search (see search.py). SQLite only: an FTS5
+# table over the items table's own rows, kept in sync by triggers so every
+# write path, bulk inserts and seed.py included, updates it.
+ITEMS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE items_fts USING fts5("
+    "title, description, content='items', content_rowid='id', prefix='2 3', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER items_fts_insert AFTER INSERT ON items BEGIN "
+    "INSERT INTO items_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER items_fts_delete AFTER DELETE ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER items_fts_update AFTER UPDATE OF title, description ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO items_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+)
+for statement in ITEMS_FTS_DDL:
+    event.listen(Item.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Item.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS items_fts').execute_if(dialect='sqlite'))
+
+# Units left to sell or reserve, per item; an item without a row is not tracked
+# and never runs out. Kept out of the items table so a sale's decrement does
+# not fire the items triggers or change the item's ETag, see inventory.py.
+class ItemStock(db.Model):
+    __tablename__ = 'item_stock'
+
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id', ondelete='CASCADE'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.CheckConstraint('quantity >= 0', name='ck_item_stock_quantity'),
+    )
+
+# Units taken from item_stock for a customer's cart until expires_at; checkout
+# claims them, the sweep in inventory.py gives back the ones that lapse.
+class Reservation(db.Model):
+    __tablename__ = 'reservations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id', ondelete='CASCADE'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_reservations_customer_id_item_id', 'customer_id', 'item_id'),
+        # The sweep's range scan
+        db.Index('ix_reservations_expires_at', 'expires_at'),
+    )
+
 class Order(db.Model, SerializerMixin):
     __tablename__ = 'orders'
 
@@ -79,11 +150,19 @@ class Order(db.Model, SerializerMixin):
     total = db.Column(db.Float)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, onupdate=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     order_items = db.relationship('OrderItem', backref='order')
     items = association_proxy('order_items', 'item')
 
-    serialize_rules = ('-order_items', '-customer_id', 'updated_at')
+    serialize_rules = ('-order_items', '-customer_id', 'updated_at', '-version')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    __table_args__ = (
+        # Serves Customer.orders and order history sorted by date
+        db.Index('ix_orders_customer_id_created_at', 'customer_id', 'created_at'),
+    )
 
 
 class OrderItem(db.Model, SerializerMixin):
@@ -95,8 +174,17 @@ class OrderItem(db.Model, SerializerMixin):
     item_id = db.Column(db.Integer, db.ForeignKey('items.id'))
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, onupdate=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    serialize_rules = ('-created_at', '-updated_at', 'order', '-order_id', '-item_id', '-version')
 
-    serialize_rules = ('-created_at', '-updated_at', 'order', '-order_id', '-item_id')
+    __mapper_args__ = {'version_id_col': version}
+
+    __table_args__ = (
+        # Serves Order.order_items; Item.order_items uses the item_id index
+        db.Index('ix_orderitems_order_id_item_id', 'order_id', 'item_id'),
+        db.Index('ix_orderitems_item_id', 'item_id'),
+    )
 
     @validates('quantity')
     def validate_quantity(self, key, quantity):
@@ -104,4 +192,250 @@ class OrderItem(db.Model, SerializerMixin):
         if quantity > 0:
             return quantity
         else:
-            raise ValueError('Quantity must be greater than 0')
\ No newline at end of file
+            raise ValueError('Quantity must be greater than 0')
+
+# Sales rollups behind the /reports endpoints (see reports.py). Triggers on
+# SQLite and PostgreSQL keep them current on every write to orders, orderitems
+# and items, /checkout and bulk inserts included; `flask rollups rebuild`
+# recomputes them from scratch.
+
+class SalesDaily(db.Model):
+    __tablename__ = 'sales_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+
+class ItemSales(db.Model):
+    __tablename__ = 'item_sales'
+
+    # No foreign key: sales history outlives deleted items
+    item_id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    order_lines = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_item_sales_quantity', 'quantity'),
+    )
+
+
+class CategorySales(db.Model):
+    __tablename__ = 'category_sales'
+
+    category = db.Column(db.String, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CustomerSales(db.Model):
+    __tablename__ = 'customer_sales'
+
+    customer_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    lifetime_value = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_customer_sales_lifetime_value', 'lifetime_value'),
+    )
+
+
+# Each trigger body is "take the old row out, put the new row in"; only order
+# lines that belong to an existing order count as sales. Upsert columns are
+# qualified with their table, which PostgreSQL needs and SQLite accepts.
+_ORDER_OUT = (
+    "UPDATE sales_daily SET orders = orders - 1, revenue = revenue - coalesce(old.total, 0) "
+    "WHERE day = date(old.created_at); "
+    "UPDATE customer_sales SET orders = orders - 1, lifetime_value = lifetime_value - coalesce(old.total, 0) "
+    "WHERE customer_id = old.customer_id; "
+)
+_ORDER_IN = (
+    "INSERT INTO sales_daily(day, orders, revenue) "
+    "SELECT date(new.created_at), 1, coalesce(new.total, 0) WHERE new.created_at IS NOT NULL "
+    "ON CONFLICT(day) DO UPDATE SET orders = sales_daily.orders + 1, revenue = sales_daily.revenue + excluded.revenue; "
+    "INSERT INTO customer_sales(customer_id, orders, lifetime_value) "
+    "SELECT new.customer_id, 1, coalesce(new.total, 0) WHERE new.customer_id IS NOT NULL "
+    "ON CONFLICT(customer_id) DO UPDATE SET orders = customer_sales.orders + 1, "
+    "lifetime_value = customer_sales.lifetime_value + excluded.lifetime_value; "
+)
+# SQLite does not enforce orderitems.order_id, so a deleted order can leave its
+# lines behind; they stop counting with it (the ORM detaches them first instead)
+_ORDER_LINES_OUT = (
+    "UPDATE category_sales SET quantity = quantity - ("
+    "SELECT coalesce(sum(orderitems.quantity), 0) FROM orderitems "
+    "JOIN item_sales ON item_sales.item_id = orderitems.item_id "
+    "WHERE orderitems.order_id = old.id AND item_sales.category = category_sales.category) "
+    "WHERE category IN (SELECT item_sales.category FROM orderitems "
+    "JOIN item_sales ON item_sales.item_id = orderitems.item_id WHERE orderitems.order_id = old.id); "
+    "UPDATE item_sales SET "
+    "quantity = quantity - (SELECT coalesce(sum(quantity), 0) FROM orderitems "
+    "WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id), "
+    "order_lines = order_lines - (SELECT count(*) FROM orderitems "
+    "WHERE order_id = old.id AND orderitems.item_id = item_sales.item_id) "
+    "WHERE item_id IN (SELECT item_id FROM orderitems WHERE order_id = old.id); "
+)
+# Lines written before their order (SQLite lets them) start counting with it
+_ORDER_LINES_IN = (
+    "INSERT INTO item_sales(item_id, category, quantity, order_lines) "
+    "SELECT item_id, (SELECT category FROM items WHERE id = orderitems.item_id), coalesce(sum(quantity), 0), count(*) "
+    "FROM orderitems WHERE order_id = new.id AND item_id IS NOT NULL GROUP BY item_id "
+    "ON CONFLICT(item_id) DO UPDATE SET quantity = item_sales.quantity + excluded.quantity, "
+    "order_lines = item_sales.order_lines + excluded.order_lines; "
+    "INSERT INTO category_sales(category, quantity) "
+    "SELECT item_sales.category, coalesce(sum(orderitems.quantity), 0) FROM orderitems "
+    "JOIN item_sales ON item_sales.item_id = orderitems.item_id "
+    "WHERE orderitems.order_id = new.id AND item_sales.category IS NOT NULL GROUP BY item_sales.category "
+    "ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; "
+)
+_LINE_OUT = (
+    "UPDATE category_sales SET quantity = quantity - coalesce(old.quantity, 0) "
+    "WHERE EXISTS (SELECT 1 FROM orders WHERE id = old.order_id) "
+    "AND category = (SELECT category FROM item_sales WHERE item_id = old.item_id); "
+    "UPDATE item_sales SET quantity = quantity - coalesce(old.quantity, 0), order_lines = order_lines - 1 "
+    "WHERE EXISTS (SELECT 1 FROM orders WHERE id = old.order_id) AND item_id = old.item_id; "
+)
+_LINE_IN = (
+    "INSERT INTO item_sales(item_id, category, quantity, order_lines) "
+    "SELECT new.item_id, (SELECT category FROM items WHERE id = new.item_id), coalesce(new.quantity, 0), 1 "
+    "WHERE EXISTS (SELECT 1 FROM orders WHERE id = new.order_id) AND new.item_id IS NOT NULL "
+    "ON CONFLICT(item_id) DO UPDATE SET quantity = item_sales.quantity + excluded.quantity, "
+    "order_lines = item_sales.order_lines + 1; "
+    "INSERT INTO category_sales(category, quantity) "
+    "SELECT category, coalesce(new.quantity, 0) FROM item_sales "
+    "WHERE EXISTS (SELECT 1 FROM orders WHERE id = new.order_id) AND item_id = new.item_id AND category IS NOT NULL "
+    "ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; "
+)
+# A recategorized item takes its sales with it
+_ITEM_CATEGORY = (
+    "UPDATE category_sales SET quantity = quantity - (SELECT quantity FROM item_sales WHERE item_id = new.id) "
+    "WHERE category = (SELECT category FROM item_sales WHERE item_id = new.id); "
+    "UPDATE item_sales SET category = new.category WHERE item_id = new.id; "
+    "INSERT INTO category_sales(category, quantity) SELECT new.category, quantity FROM item_sales WHERE item_id = new.id "
+    "ON CONFLICT(category) DO UPDATE SET quantity = category_sales.quantity + excluded.quantity; "
+)
+SALES_ROLLUP_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS sales_orders_insert AFTER INSERT ON orders BEGIN {_ORDER_IN}{_ORDER_LINES_IN}END",
+    f"CREATE TRIGGER IF NOT EXISTS sales_orders_delete AFTER DELETE ON orders BEGIN {_ORDER_OUT}{_ORDER_LINES_OUT}END",
+    f"CREATE TRIGGER IF NOT EXISTS sales_orders_update AFTER UPDATE OF total, customer_id, created_at ON orders "
+    f"BEGIN {_ORDER_OUT}{_ORDER_IN}END",
+    f"CREATE TRIGGER IF NOT EXISTS sales_orderitems_insert AFTER INSERT ON orderitems BEGIN {_LINE_IN}END",
+    f"CREATE TRIGGER IF NOT EXISTS sales_orderitems_delete AFTER DELETE ON orderitems BEGIN {_LINE_OUT}END",
+    f"CREATE TRIGGER IF NOT EXISTS sales_orderitems_update AFTER UPDATE OF quantity, item_id, order_id ON orderitems "
+    f"BEGIN {_LINE_OUT}{_LINE_IN}END",
+    f"CREATE TRIGGER IF NOT EXISTS sales_items_category AFTER UPDATE OF category ON items BEGIN {_ITEM_CATEGORY}END",
+)
+# PostgreSQL runs the same bodies from one row-level trigger function per table
+POSTGRESQL_SALES_ROLLUP_TRIGGERS = (
+    "CREATE OR REPLACE FUNCTION sales_orders_rollup() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    f"IF TG_OP <> 'INSERT' THEN {_ORDER_OUT}END IF; "
+    f"IF TG_OP = 'DELETE' THEN {_ORDER_LINES_OUT}END IF; "
+    f"IF TG_OP <> 'DELETE' THEN {_ORDER_IN}END IF; "
+    f"IF TG_OP = 'INSERT' THEN {_ORDER_LINES_IN}END IF; "
+    "RETURN NULL; END $$",
+    "CREATE OR REPLACE FUNCTION sales_orderitems_rollup() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    f"IF TG_OP <> 'INSERT' THEN {_LINE_OUT}END IF; "
+    f"IF TG_OP <> 'DELETE' THEN {_LINE_IN}END IF; "
+    "RETURN NULL; END $$",
+    "CREATE OR REPLACE FUNCTION sales_items_category_rollup() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    f"{_ITEM_CATEGORY}RETURN NULL; END $$",
+    "DROP TRIGGER IF EXISTS sales_orders ON orders",
+    "CREATE TRIGGER sales_orders AFTER INSERT OR DELETE OR UPDATE OF total, customer_id, created_at ON orders "
+    "FOR EACH ROW EXECUTE FUNCTION sales_orders_rollup()",
+    "DROP TRIGGER IF EXISTS sales_orderitems ON orderitems",
+    "CREATE TRIGGER sales_orderitems AFTER INSERT OR DELETE OR UPDATE OF quantity, item_id, order_id ON orderitems "
+    "FOR EACH ROW EXECUTE FUNCTION sales_orderitems_rollup()",
+    "DROP TRIGGER IF EXISTS sales_items_category ON items",
+    "CREATE TRIGGER sales_items_category AFTER UPDATE OF category ON items "
+    "FOR EACH ROW EXECUTE FUNCTION sales_items_category_rollup()",
+)
+# After the whole create_all, since the triggers span seven tables
+for statement in SALES_ROLLUP_TRIGGERS:
+    event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRESQL_SALES_ROLLUP_TRIGGERS:
+    event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+# Change counters behind conditional GETs (see conditional.py). Every write to
+# a watched table bumps its row here, from a trigger, so the counters also see
+# bulk writes, /checkout, seed.py and other processes. They never go back, so
+# an ETag built from them is never reused for different data.
+
+class TableWatermark(db.Model):
+    __tablename__ = 'table_watermarks'
+
+    table_name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime)
+
+
+WATCHED_TABLES = ('customers', 'items', 'orderitems', 'orders')
+# SQLite has only row triggers, so a statement touching n rows bumps n times
+WATERMARK_TRIGGERS = tuple(
+    f"CREATE TRIGGER IF NOT EXISTS watermark_{table}_{event_name.lower()} AFTER {event_name} ON {table} BEGIN "
+    f"INSERT INTO table_watermarks(table_name, version, updated_at) VALUES ('{table}', 1, CURRENT_TIMESTAMP) "
+    "ON CONFLICT(table_name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at; END"
+    for table in WATCHED_TABLES
+    for event_name in ('INSERT', 'UPDATE', 'DELETE')
+)
+# PostgreSQL bumps once per statement, TRUNCATE included
+WATERMARK_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION bump_table_watermark() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    "INSERT INTO table_watermarks(table_name, version, updated_at) "
+    "VALUES (TG_TABLE_NAME, 1, clock_timestamp() AT TIME ZONE 'utc') "
+    "ON CONFLICT (table_name) DO UPDATE SET version = table_watermarks.version + 1, updated_at = excluded.updated_at; "
+    "RETURN NULL; END $$"
+)
+WATERMARK_STATEMENT_TRIGGERS = tuple(
+    statement
+    for table in WATCHED_TABLES
+    for statement in (
+        f"DROP TRIGGER IF EXISTS watermark_{table} ON {table}",
+        f"CREATE TRIGGER watermark_{table} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_table_watermark()",
+    )
+)
+for statement in WATERMARK_TRIGGERS:
+    event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in (WATERMARK_FUNCTION, *WATERMARK_STATEMENT_TRIGGERS):
+    event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+# Who changed what, written in batches behind the request by audit.py. Rows
+# are only ever inserted: the triggers below reject UPDATE and DELETE.
+
+class AuditEvent(db.Model):
+    __tablename__ = 'audit_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # When the change was made, not when the batch was written
+    occurred_at = db.Column(db.DateTime, nullable=False)
+    entity_type = db.Column(db.String, nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String, nullable=False)
+    # JWT identity of the caller, None on routes that do not require one
+    actor_id = db.Column(db.Integer)
+    remote_addr = db.Column(db.String)
+    changes = db.Column(db.JSON)
+
+    __table_args__ = (
+        db.Index('ix_audit_events_entity', 'entity_type', 'entity_id', 'occurred_at'),
+        db.Index('ix_audit_events_occurred_at', 'occurred_at'),
+    )
+
+
+AUDIT_APPEND_ONLY_TRIGGERS = tuple(
+    f"CREATE TRIGGER IF NOT EXISTS audit_events_no_{event_name.lower()} BEFORE {event_name} ON audit_events BEGIN "
+    "SELECT RAISE(ABORT, 'audit_events is append-only'); END"
+    for event_name in ('UPDATE', 'DELETE')
+)
+AUDIT_APPEND_ONLY_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION reject_audit_change() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    "RAISE EXCEPTION 'audit_events is append-only'; END $$"
+)
+AUDIT_APPEND_ONLY_STATEMENT_TRIGGERS = (
+    "DROP TRIGGER IF EXISTS audit_events_append_only ON audit_events",
+    "CREATE TRIGGER audit_events_append_only BEFORE UPDATE OR DELETE OR TRUNCATE ON audit_events "
+    "FOR EACH STATEMENT EXECUTE FUNCTION reject_audit_change()",
+)
+for statement in AUDIT_APPEND_ONLY_TRIGGERS:
+    event.listen(AuditEvent.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in (AUDIT_APPEND_ONLY_FUNCTION, *AUDIT_APPEND_ONLY_STATEMENT_TRIGGERS):
+    event.listen(AuditEvent.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
@@ -0,0 +1,78 @@
+# Standard library imports
+import functools
+
+# Remote library imports
+from flask import request, make_response, current_app, stream_with_context, Response
+
+# Local imports
+
+DEFAULT_MAX_LIMIT = 1000
+STREAM_CHUNK_SIZE = 1000
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def page_args():
+    """Read ``after``, ``limit`` and ``stream`` from the query string.
+
+    Raises ValueError with a client-facing message on bad input.
+    """
+    after = request.args.get('after', type=int)
+    if after is None and 'after' in request.args:
+        raise ValueError('after must be an integer id')
+
+    limit = request.args.get('limit', type=int)
+    max_limit = current_app.config.get('PAGINATION_MAX_LIMIT', DEFAULT_MAX_LIMIT)
+    if 'limit' in request.args and (limit is None or not 1 <= limit <= max_limit):
+        raise ValueError(f'limit must be between 1 and {max_limit}')
+
+    stream = request.args.get('stream')
+    if stream is not None and stream not in STREAM_FORMATS:
+        raise ValueError(f'stream must be one of {", ".join(STREAM_FORMATS)}')
+
+    return after, limit, stream
+
+
+def collection_response(plan, *criteria):
+    """Serve a FieldPlan as a full list, a keyset page or a streamed body.
+
+    Without parameters the whole collection is returned as before. With
+    ``limit`` the response is one page and ``X-Next-Cursor`` carries the id
+    to pass as ``after`` for the next one. ``stream=ndjson|json`` sends the
+    rows from a server-side cursor in chunks so memory stays flat.
+    """
+    try:
+        after, limit, stream = page_args()
+    except ValueError as e:
+        return make_response({'error': str(e)}, 400)
+
+    if stream is not None:
+        return stream_response(plan, stream, *criteria, after=after, limit=limit)
+
+    rows = plan.all(*criteria, after=after, limit=limit)
+    response = make_response(rows, 200)
+    if limit is not None and len(rows) == limit:
+        response.headers['X-Next-Cursor'] = str(rows[-1][plan.primary_key.key])
+    return response
+
+
+def stream_response(plan, stream, *criteria, after=None, limit=None):
+    dumps = functools.partial(current_app.json.dumps, separators=(',', ':'))
+    chunks = plan.chunks(*criteria, after=after, limit=limit, size=STREAM_CHUNK_SIZE)
+
+    def ndjson():
+        for chunk in chunks:
+            yield ''.join(f'{dumps(row)}\n' for row in chunk)
+
+    def json_array():
+        yield '['
+        separator = ''
+        for chunk in chunks:
+            yield separator + ','.join(dumps(row) for row in chunk)
+            separator = ','
+        yield ']\n'
+
+    body = ndjson() if stream == 'ndjson' else json_array()
+    return Response(stream_with_context(body), mimetype=STREAM_FORMATS[stream])
@@ -0,0 +1,136 @@
+# Standard library imports
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+# Remote library imports
+from flask import g, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+# Local imports
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts.
+
+    The ``.folded`` output is what flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True, name='stack-sampler')
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def dump(self, path):
+        with open(path, 'w') as folded:
+            for stack, count in self.stacks.most_common():
+                folded.write(f'{stack} {count}\n')
+
+
+class RequestProfiler:
+    """Opt-in cProfile and stack sampling of individual requests.
+
+    A request is profiled when an admin token sends ``?__profile=1`` (always
+    dumped, file name returned in ``X-Profile``), or when it is picked by
+    ``PROFILE_SAMPLE_RATE`` (dumped only if slower than ``PROFILE_SLOW_SECONDS``).
+    Each dump is a ``.prof`` file for pstats/snakeviz and a ``.folded`` file
+    for flame graphs, written to ``PROFILE_DIR``.
+
+    Config:
+        PROFILE_DIR            defaults to <instance path>/profiles
+        PROFILE_SAMPLE_RATE    fraction of requests to profile, default 0
+        PROFILE_SLOW_SECONDS   threshold for keeping sampled profiles, default 0.5
+        PROFILE_INTERVAL       stack sampling interval in seconds, default 0.001
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.sample_rate = 0.0
+        self.slow_seconds = 0.5
+        self.interval = 0.001
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.sample_rate = float(app.config.get('PROFILE_SAMPLE_RATE', 0.0))
+        self.slow_seconds = float(app.config.get('PROFILE_SLOW_SECONDS', 0.5))
+        self.interval = float(app.config.get('PROFILE_INTERVAL', 0.001))
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._abandon)
+
+    def _requested_by_admin(self):
+        if request.args.get('__profile') != '1':
+            return False
+        try:
+            verify_jwt_in_request(optional=True)
+        except (JWTExtendedException, PyJWTError):
+            return False
+        return bool(get_jwt().get('admin'))
+
+    def _start(self):
+        explicit = self._requested_by_admin()
+        if not explicit and not (self.sample_rate and random.random() < self.sample_rate):
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one cProfile at a time per process
+            return
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        g.profiling = (profile, sampler, explicit, time.perf_counter())
+
+    def _stop(self):
+        profile, sampler, explicit, started = g.pop('profiling')
+        profile.disable()
+        sampler.stop()
+        return profile, sampler, explicit, time.perf_counter() - started
+
+    def _finish(self, response):
+        if 'profiling' not in g:
+            return response
+
+        profile, sampler, explicit, elapsed = self._stop()
+        if explicit or elapsed >= self.slow_seconds:
+            name = f'{time.strftime("%Y%m%dT%H%M%S")}-{request.endpoint or "unmatched"}-{request.method}-{elapsed * 1000:.0f}ms-{os.getpid()}'
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(os.path.join(self.directory, f'{name}.prof'))
+            sampler.dump(os.path.join(self.directory, f'{name}.folded'))
+            if explicit:
+                response.headers['X-Profile'] = name
+        return response
+
+    def _abandon(self, exc):
+        # after_request is skipped when the view raised
+        if 'profiling' in g:
+            self._stop()
+
+
+profiler = RequestProfiler()
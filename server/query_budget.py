@@ -0,0 +1,54 @@
+# Standard library imports
+from functools import wraps
+
+# Remote library imports
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Local imports
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    # Bookkeeping on a connection of its own, like audit.py's writes, opts out with query_budget=False
+    if has_app_context() and conn.get_execution_options().get('query_budget', True):
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def query_count():
+    return g.get('query_count', 0)
+
+
+def query_budget(limit):
+    """Cap the number of SQL statements a resource method may issue.
+
+    Only enforced when the app runs with ``debug`` or ``testing`` on. Under
+    ``testing`` (or ``QUERY_BUDGET_STRICT``) an overrun raises
+    QueryBudgetExceeded so the test fails; under ``debug`` it is logged.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            app = current_app
+            if not (app.debug or app.testing):
+                return func(*args, **kwargs)
+
+            before = query_count()
+            result = func(*args, **kwargs)
+            used = query_count() - before
+
+            if used > limit:
+                message = f'{request.method} {request.path} ran {used} queries, budget is {limit}'
+                if app.config.get('QUERY_BUDGET_STRICT', app.testing):
+                    raise QueryBudgetExceeded(message)
+                app.logger.warning(message)
+            return result
+
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
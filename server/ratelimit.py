@@ -0,0 +1,206 @@
+# Standard library imports
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# Remote library imports
+from flask import g, make_response, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+try:
+    import redis
+except ImportError:  # optional, only needed for a shared limiter backend
+    redis = None
+
+# Local imports
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+LIMIT = re.compile(r'^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$')
+
+
+class Limit:
+    """``'10/minute'``: a bucket of 10 tokens, refilled at 10 per minute."""
+
+    def __init__(self, text):
+        match = LIMIT.match(text)
+        if match is None:
+            raise ValueError(f'Bad rate limit {text!r}, expected e.g. "10/minute"')
+        self.text = text
+        self.burst = int(match.group(1))
+        self.rate = self.burst / PERIODS[match.group(2)]
+
+
+class MemoryStorage:
+    """Token buckets in this process, for a single worker or per-worker limits.
+
+    Bounded so a flood of distinct keys cannot grow it without limit; the
+    least recently used bucket is dropped, which only ever forgives.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, limit):
+        """Take one token; returns ``(allowed, tokens left)``."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, at = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - at) * limit.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+# Same algorithm as MemoryStorage.take, atomic in Redis and on Redis's clock
+TAKE_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = math.min(burst, (tonumber(state[1]) or burst) + math.max(0, now - (tonumber(state[2]) or now)) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisStorage:
+    """Token buckets shared by every worker and host using the same Redis."""
+
+    def __init__(self, client):
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, limit):
+        allowed, tokens = self._take(keys=[key], args=[limit.rate, limit.burst])
+        return bool(allowed), float(tokens)
+
+
+def storage_from_url(url):
+    if not url:
+        return MemoryStorage()
+    if redis is None:
+        raise RuntimeError('RATELIMIT_URL is set but the redis package is not installed')
+    return RedisStorage(redis.Redis.from_url(url))
+
+
+def client_ip():
+    # Behind a proxy, set TRUSTED_PROXIES so this is the client and not the proxy (see app.create_app)
+    return request.remote_addr or 'unknown'
+
+
+def request_username():
+    data = request.get_json(silent=True)
+    username = data.get('username') if isinstance(data, dict) else None
+    # Case and padding variants of one name share its bucket
+    return username.strip().lower()[:128] if isinstance(username, str) and username.strip() else None
+
+
+def token_identity():
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return None
+    return get_jwt_identity()
+
+
+# What each bucket is counted per; None skips the bucket (e.g. no username sent)
+KEYS = {
+    'ip': client_ip,
+    'username': request_username,
+    'user': token_identity,
+    'route': lambda: '*',
+}
+
+
+class RateLimiter:
+    """Token-bucket limits per route, counted per client IP, submitted username, JWT user or route-wide.
+
+    Limits are declared on resource methods with ``@limiter.limit(...)``,
+    which checks them before the method runs, so a rejected request costs
+    a bucket update: no query, no bcrypt. Responses carry ``RateLimit-Limit``,
+    ``RateLimit-Remaining`` and ``RateLimit-Reset`` for the tightest bucket,
+    and a 429 adds ``Retry-After``.
+
+    Config:
+        RATELIMIT_ENABLED   default True
+        RATELIMIT_URL       redis:// URL for buckets shared across workers; in-process when unset
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.storage = MemoryStorage()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        self.storage = storage_from_url(app.config.get('RATELIMIT_URL'))
+        app.after_request(self._add_headers)
+
+    def limit(self, **limits):
+        """Decorate a resource method, e.g. ``@limiter.limit(ip='20/minute', username='5/minute')``.
+
+        Keywords name what the bucket is counted per (see ``KEYS``). The
+        buckets are tried in the order given and the first empty one rejects.
+        """
+        unknown = limits.keys() - KEYS.keys()
+        if unknown:
+            raise ValueError(f'Unknown rate limit keys: {", ".join(sorted(unknown))}')
+        limits = [(per, Limit(text)) for per, text in limits.items()]
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                for per, limit in limits:
+                    value = KEYS[per]()
+                    if value is None:
+                        continue
+                    allowed, tokens = self.storage.take(f'ratelimit:{request.endpoint}:{per}:{value}', limit)
+                    self._remember(limit, tokens)
+                    if not allowed:
+                        retry_after = math.ceil((1 - tokens) / limit.rate)
+                        response = make_response({'error': 'Too many requests, try again later'}, 429)
+                        response.headers['Retry-After'] = str(retry_after)
+                        return response
+                return func(*args, **kwargs)
+
+            wrapper.rate_limits = limits
+            return wrapper
+        return decorator
+
+    def _remember(self, limit, tokens):
+        # Report whichever bucket is closest to empty
+        remaining = int(tokens)
+        current = g.get('rate_limit')
+        if current is None or remaining < current[1]:
+            g.rate_limit = (limit, remaining, math.ceil((limit.burst - tokens) / limit.rate))
+
+    def _add_headers(self, response):
+        if 'rate_limit' in g:
+            limit, remaining, reset = g.rate_limit
+            response.headers['RateLimit-Limit'] = str(limit.burst)
+            response.headers['RateLimit-Remaining'] = str(remaining)
+            response.headers['RateLimit-Reset'] = str(reset)
+        return response
+
+
+limiter = RateLimiter()
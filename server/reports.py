@@ -0,0 +1,135 @@
+# Standard library imports
+from datetime import date
+
+# Remote library imports
+import click
+from flask import request
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select
+
+# Local imports
+from config import db
+from models import Customer, Item, Order, OrderItem, SalesDaily, ItemSales, CategorySales, CustomerSales
+
+ROLLUPS = (SalesDaily, ItemSales, CategorySales, CustomerSales)
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+def rebuild():
+    """Recompute every rollup table from orders and order items, in one transaction.
+
+    Use it to backfill after a restore or an import that bypassed the
+    triggers; only SQLite and PostgreSQL have them. Returns the number of rows written per table.
+    """
+    try:
+        for model in ROLLUPS:
+            db.session.execute(delete(model))
+
+        day = func.date(Order.created_at)
+        db.session.execute(insert(SalesDaily).from_select(
+            ['day', 'orders', 'revenue'],
+            select(day, func.count(), func.coalesce(func.sum(Order.total), 0))
+            .where(Order.created_at.isnot(None))
+            .group_by(day)
+        ))
+        db.session.execute(insert(ItemSales).from_select(
+            ['item_id', 'category', 'quantity', 'order_lines'],
+            select(OrderItem.item_id, Item.category, func.coalesce(func.sum(OrderItem.quantity), 0), func.count())
+            .join(Order, Order.id == OrderItem.order_id)
+            .outerjoin(Item, Item.id == OrderItem.item_id)
+            .where(OrderItem.item_id.isnot(None))
+            .group_by(OrderItem.item_id, Item.category)
+        ))
+        db.session.execute(insert(CategorySales).from_select(
+            ['category', 'quantity'],
+            select(ItemSales.category, func.sum(ItemSales.quantity))
+            .where(ItemSales.category.isnot(None))
+            .group_by(ItemSales.category)
+        ))
+        db.session.execute(insert(CustomerSales).from_select(
+            ['customer_id', 'orders', 'lifetime_value'],
+            select(Order.customer_id, func.count(), func.coalesce(func.sum(Order.total), 0))
+            .where(Order.customer_id.isnot(None))
+            .group_by(Order.customer_id)
+        ))
+        counts = {model.__tablename__: db.session.scalar(select(func.count()).select_from(model)) for model in ROLLUPS}
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return counts
+
+
+def report_limit():
+    """``limit`` from the query string; raises ValueError with a client-facing message."""
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+    return limit
+
+
+def date_range():
+    """``from`` and ``to`` (YYYY-MM-DD, inclusive) from the query string, either may be missing."""
+    bounds = []
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        try:
+            bounds.append(None if value is None else date.fromisoformat(value))
+        except ValueError:
+            raise ValueError(f'{name} must be a date like 2024-01-31')
+    return bounds
+
+
+def revenue_by_day(start=None, end=None):
+    criteria = []
+    if start is not None:
+        criteria.append(SalesDaily.day >= start)
+    if end is not None:
+        criteria.append(SalesDaily.day <= end)
+    rows = db.session.execute(select(SalesDaily).where(*criteria).order_by(SalesDaily.day)).scalars()
+    return [{'day': row.day.isoformat(), 'orders': row.orders, 'revenue': row.revenue} for row in rows]
+
+
+def top_items(limit=DEFAULT_LIMIT):
+    rows = db.session.execute(
+        select(ItemSales.item_id, Item.title, ItemSales.category, ItemSales.quantity, ItemSales.order_lines)
+        .outerjoin(Item, Item.id == ItemSales.item_id)
+        .order_by(ItemSales.quantity.desc())
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in rows]
+
+
+def category_mix():
+    rows = db.session.execute(select(CategorySales.category, CategorySales.quantity).order_by(CategorySales.category)).all()
+    total = sum(quantity for _, quantity in rows)
+    return [
+        {'category': category, 'quantity': quantity, 'share': quantity / total if total else 0.0}
+        for category, quantity in rows
+    ]
+
+
+def customer_lifetime_value(limit=DEFAULT_LIMIT):
+    rows = db.session.execute(
+        select(CustomerSales.customer_id, Customer.name, Customer.username,
+               CustomerSales.orders, CustomerSales.lifetime_value)
+        .outerjoin(Customer, Customer.id == CustomerSales.customer_id)
+        .order_by(CustomerSales.lifetime_value.desc())
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in rows]
+
+
+rollups_cli = AppGroup('rollups', help='Sales rollup tables behind the /reports endpoints.')
+
+
+@rollups_cli.command('rebuild')
+def rebuild_command():
+    """Recompute the rollup tables from orders and order items."""
+    for table, count in rebuild().items():
+        click.echo(f'{table}: {count} rows')
+
+
+def init_app(app):
+    app.cli.add_command(rollups_cli)
@@ -0,0 +1,96 @@
+# Standard library imports
+import re
+
+# Remote library imports
+from flask import request
+from sqlalchemy import column, func, literal_column, or_, select, table
+
+# Local imports
+from config import db
+from models import Item
+from serializers import item_plan
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+TERM = re.compile(r'\w+')
+# bm25 column weights: a hit in the title counts ten times one in the description
+TITLE_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 1.0
+
+# The FTS5 table created next to items in models.py; only its rowid (= items.id) is selected
+items_fts = table('items_fts', column('rowid'))
+fts_match = literal_column('items_fts').op('MATCH')
+
+
+def search_args():
+    """Read ``q``, ``category``, ``min_price``, ``max_price``, ``limit`` and ``offset``.
+
+    ``category`` may be repeated or comma separated. Raises ValueError with
+    a client-facing message on bad input.
+    """
+    categories = sorted({c for value in request.args.getlist('category') for c in value.split(',') if c})
+
+    numbers = {}
+    for name, default in (('min_price', None), ('max_price', None), ('limit', DEFAULT_LIMIT), ('offset', 0)):
+        value = request.args.get(name, type=int)
+        if value is None and name in request.args:
+            raise ValueError(f'{name} must be an integer')
+        numbers[name] = default if value is None else value
+    if not 1 <= numbers['limit'] <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+    if numbers['offset'] < 0:
+        raise ValueError('offset cannot be negative')
+
+    return {'q': request.args.get('q', ''), 'categories': categories, **numbers}
+
+
+def search_key(q, categories, min_price, max_price, limit, offset):
+    """Cache key that is the same for every spelling of the same search."""
+    terms = ' '.join(TERM.findall(q.lower()))
+    return f'items:search:{terms}|{",".join(categories)}|{min_price}|{max_price}|{limit}|{offset}'
+
+
+def search_items(q='', categories=(), min_price=None, max_price=None, limit=DEFAULT_LIMIT, offset=0):
+    """One page of items matching ``q``, best match first, with category facet counts.
+
+    Every word of ``q`` must match a word in the title or description, as a
+    prefix, so ``scop`` finds "Scope". On SQLite this uses the items_fts
+    index and bm25 ranking; other databases fall back to unranked
+    case-insensitive substring matching. Facet counts ignore the category
+    filter so clients can show how many results each category would give.
+    """
+    terms = TERM.findall(q.lower())
+    criteria = []
+    if min_price is not None:
+        criteria.append(Item.price >= min_price)
+    if max_price is not None:
+        criteria.append(Item.price <= max_price)
+
+    ranked = bool(terms) and db.session.get_bind().dialect.name == 'sqlite'
+    if ranked:
+        # Quoted so user input is never parsed as FTS5 syntax; implicit AND between terms
+        criteria.append(fts_match(' '.join(f'"{term}"*' for term in terms)))
+    else:
+        for term in terms:
+            pattern = f'%{term}%'
+            criteria.append(or_(Item.title.ilike(pattern), Item.description.ilike(pattern)))
+
+    facets = select(Item.category, func.count()).select_from(Item)
+    page = item_plan.select(*criteria, *([Item.category.in_(categories)] if categories else []))
+    if ranked:
+        facets = facets.join(items_fts, items_fts.c.rowid == Item.id)
+        page = page.join(items_fts, items_fts.c.rowid == Item.id).order_by(None).order_by(
+            func.bm25(literal_column('items_fts'), TITLE_WEIGHT, DESCRIPTION_WEIGHT), Item.id)
+    if criteria:
+        facets = facets.where(*criteria)
+
+    counts = dict(db.session.execute(facets.group_by(Item.category)).all())
+    total = sum(count for category, count in counts.items() if not categories or category in categories)
+    items = item_plan.dump_all(db.session.execute(page.limit(limit).offset(offset)))
+
+    return {
+        # The words searched for, not q as sent: the body is cached under search_key for every spelling
+        'query': ' '.join(terms),
+        'total': total,
+        'facets': {'category': counts},
+        'items': items,
+    }
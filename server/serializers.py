@@ -0,0 +1,175 @@
+# Standard library imports
+import time
+
+# Remote library imports
+from sqlalchemy import inspect, select, DateTime, Date, Time, Numeric
+from sqlalchemy.orm import aliased, RelationshipProperty
+from sqlalchemy_serializer.lib.schema import Schema
+
+# Local imports
+from config import db
+from metrics import record_serialization
+from models import Customer, Item, Order, OrderItem
+from images import image_store
+
+
+class FieldPlan:
+    """Precompiled replacement for ``SerializerMixin.to_dict`` on list endpoints.
+
+    The model's ``serialize_only``/``serialize_rules`` are resolved once, with
+    sqlalchemy_serializer's own rule engine, into a flat list of columns. Rows
+    are then read as plain tuples from a single SELECT (many-to-one
+    relationships become outer joins) and turned into the same dicts that
+    ``to_dict()`` would produce, without building ORM objects.
+
+    ``finish(data, *values)``, if given, then edits each dict in place, with
+    the values of the ``extra`` columns read alongside the row.
+    """
+
+    def __init__(self, model, only=(), rules=(), extra=(), finish=None):
+        self.model = model
+        self.primary_key = inspect(model).primary_key[0]
+        self.columns = []
+        self.joins = []
+        # version_id_col of every row a dump reads, the plan's own model first
+        self.version_columns = []
+
+        schema = Schema()
+        schema.update(only=only, extend=rules)
+        self.dump = self._compile(model, model, schema)
+        if finish is not None:
+            self.dump = self._finishing(self.dump, [self._add_column(column) for column in extra], finish)
+        # Every table a dump reads from; conditional.py validates responses against their watermarks
+        self.tables = tuple(sorted({model.__tablename__, *(inspect(target).mapper.local_table.name for target, _ in self.joins)}))
+
+    def select(self, *criteria, after=None, limit=None):
+        stmt = select(*self.columns).select_from(self.model)
+        for target, onclause in self.joins:
+            stmt = stmt.outerjoin(target, onclause)
+        if after is not None:
+            # Keyset pagination: seek past the cursor on the primary key instead of OFFSET
+            criteria = (*criteria, self.primary_key > after)
+        if criteria:
+            stmt = stmt.where(*criteria)
+        stmt = stmt.order_by(self.primary_key)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return stmt
+
+    def one_versioned(self, *criteria):
+        """``(dump, versions)`` of one row from a single SELECT, or ``(None, None)``."""
+        row = db.session.execute(self.select(*criteria).add_columns(*self.version_columns)).first()
+        if row is None:
+            return None, None
+        return self.dump(row), tuple(row[len(self.columns):])
+
+    def versions(self, *criteria):
+        """The versions of the rows behind one dump, as a tuple, or None if nothing matches."""
+        stmt = select(*self.version_columns).select_from(self.model)
+        for target, onclause in self.joins:
+            stmt = stmt.outerjoin(target, onclause)
+        row = db.session.execute(stmt.where(*criteria)).first()
+        return None if row is None else tuple(row)
+
+    def dump_all(self, rows):
+        dump = self.dump
+        began = time.perf_counter()
+        dumped = [dump(row) for row in rows]
+        record_serialization(time.perf_counter() - began)
+        return dumped
+
+    def all(self, *criteria, after=None, limit=None):
+        return self.dump_all(db.session.execute(self.select(*criteria, after=after, limit=limit)))
+
+    def one(self, *criteria):
+        row = db.session.execute(self.select(*criteria)).first()
+        return None if row is None else self.dump(row)
+
+    def chunks(self, *criteria, after=None, limit=None, size=1000):
+        """Yield serialized rows in lists of ``size`` from a server-side cursor."""
+        stmt = self.select(*criteria, after=after, limit=limit).execution_options(yield_per=size)
+        for partition in db.session.execute(stmt).partitions():
+            yield self.dump_all(partition)
+
+    @staticmethod
+    def _finishing(dump, indexes, finish):
+        def dump_finished(row):
+            data = dump(row)
+            finish(data, *(row[index] for index in indexes))
+            return data
+        return dump_finished
+
+    def _add_column(self, column):
+        self.columns.append(column)
+        return len(self.columns) - 1
+
+    def _compile(self, model, entity, schema, selected=None):
+        # Mirrors Serializer.serialize_model, but runs once per plan
+        selected = selected or {}
+        schema.update(only=model.serialize_only, extend=model.serialize_rules)
+        mapper = inspect(model)
+        if mapper.version_id_col is not None:
+            self.version_columns.append(getattr(entity, mapper.get_property_by_column(mapper.version_id_col).key))
+
+        keys = set(schema.keys)
+        if schema.is_greedy:
+            keys.update(attr.key for attr in mapper.attrs)
+
+        plain, converted, nested = [], [], []
+        for key in sorted(keys):
+            if not schema.is_included(key):
+                continue
+
+            prop = mapper.attrs.get(key)
+            if prop is None:
+                raise ValueError(f'{model.__name__}.{key} is not a mapped attribute')
+
+            if isinstance(prop, RelationshipProperty):
+                if prop.uselist:
+                    raise ValueError(f'{model.__name__}.{key} is a collection and cannot be flattened')
+                target = aliased(prop.mapper.class_)
+                self.joins.append((target, getattr(entity, key).of_type(target)))
+                pk_key = prop.mapper.get_property_by_column(prop.mapper.primary_key[0]).key
+                pk_index = self._add_column(getattr(target, pk_key))
+                dump_related = self._compile(prop.mapper.class_, target, schema.fork(key), {pk_key: pk_index})
+                nested.append((key, pk_index, dump_related))
+                continue
+
+            index = selected.get(key)
+            if index is None:
+                index = self._add_column(getattr(entity, key))
+            convert = _converter(model, prop.columns[0].type)
+            if convert is None:
+                plain.append((key, index))
+            else:
+                converted.append((key, index, convert))
+
+        def dump(row):
+            data = {key: row[index] for key, index in plain}
+            for key, index, convert in converted:
+                value = row[index]
+                data[key] = None if value is None else convert(value)
+            for key, pk_index, dump_related in nested:
+                data[key] = None if row[pk_index] is None else dump_related(row)
+            return data
+
+        return dump
+
+
+def _converter(model, column_type):
+    if isinstance(column_type, DateTime):
+        return lambda value: value.strftime(model.datetime_format)
+    if isinstance(column_type, Date):
+        return lambda value: value.strftime(model.date_format)
+    if isinstance(column_type, Time):
+        return lambda value: value.strftime(model.time_format)
+    if isinstance(column_type, Numeric) and column_type.asdecimal:
+        return model.decimal_format.format
+    return None
+
+
+customer_plan = FieldPlan(Customer)
+# Items with a stored image list its variants, see images.py
+item_plan = FieldPlan(Item, rules=('-order_items',), extra=(Item.image_hash,), finish=image_store.with_variants)
+order_plan = FieldPlan(Order)
+order_item_plan = FieldPlan(OrderItem)
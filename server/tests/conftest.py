@@ -0,0 +1,85 @@
+# Standard library imports
+import os
+import socket
+import sys
+from contextlib import contextmanager
+
+# Remote library imports
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+# Tests never touch instance/app.db, nor start the background sweeper or audit flusher
+os.environ['DATABASE_URI'] = 'sqlite://'
+os.environ.setdefault('RATELIMIT_ENABLED', '0')
+os.environ.setdefault('RESERVATION_SWEEP_INTERVAL', '0')
+os.environ.setdefault('AUDIT_FLUSH_INTERVAL', '0')
+os.environ.setdefault('PASSWORD_HASH_EXECUTOR', 'inline')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Local imports
+from benchmarks import populate
+from app import create_app
+from config import db
+from database import database_config
+from models import Customer
+
+ROWS = 50
+
+
+def free_port():
+    """A local TCP port nothing is listening on, for tests that start a server."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def counted_queries(app):
+    """The statements ``app``'s engine runs in the block; run requests in it outside an app context of the test's."""
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+
+@pytest.fixture
+def app():
+    """The API on a generated in-memory database of ``ROWS`` rows per table; every 50th customer is an admin."""
+    app = create_app({'TESTING': True, 'BCRYPT_LOG_ROUNDS': 4})
+    with app.app_context():
+        populate(ROWS)
+    return app
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """Like ``app``, on a database file with a connection pool, for tests that write from several threads."""
+    app = create_app({**database_config({'DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}'}),
+                      'TESTING': True, 'BCRYPT_LOG_ROUNDS': 4})
+    with app.app_context():
+        populate(ROWS)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth():
+    """``auth(app, customer_id, admin=False, version=1)``: Authorization headers with a token ``app`` minted."""
+    def headers(app, customer_id, admin=False, version=1):
+        with app.app_context():
+            customer = Customer(id=customer_id, username=f'customer{customer_id}', admin=admin, version=version)
+            return {'Authorization': f'Bearer {create_access_token(identity=customer)}'}
+    return headers
@@ -0,0 +1,165 @@
+# Standard library imports
+import json
+import os
+from types import SimpleNamespace
+
+# Remote library imports
+import pytest
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+# Local imports
+from conftest import counted_queries
+from benchmarks import populate
+from app import create_app
+import audit
+from audit import audit_log, current_actor, diff
+from config import db
+from models import AuditEvent
+
+
+def events(app):
+    with app.app_context():
+        return [{field: getattr(event, field) for field in audit.FIELDS}
+                for event in db.session.scalars(select(AuditEvent).order_by(AuditEvent.id))]
+
+
+@pytest.fixture
+def behind_app():
+    """Events wait for an explicit flush: the flusher thread is an hour away."""
+    app = create_app({'TESTING': True, 'AUDIT_FLUSH_INTERVAL': 3600})
+    with app.app_context():
+        populate(5)
+    yield app
+    with app.app_context():
+        audit_log.flush()
+
+
+def test_events_are_written_behind_the_request(behind_app, auth):
+    client = behind_app.test_client()
+    price = client.get('/items/1').get_json()['price']
+    admin = auth(behind_app, 50, admin=True)
+
+    with counted_queries(behind_app) as statements:
+        response = client.patch('/items/1', json={'price': price + 1}, headers={'If-Match': '*', **admin})
+    assert response.status_code == 202
+    assert not any('audit_events' in statement for statement in statements)
+    assert events(behind_app) == []
+
+    with behind_app.app_context():
+        assert audit_log.flush() == 1
+        assert audit_log.flush() == 0
+    [event] = events(behind_app)
+    assert {key: event[key] for key in ('entity_type', 'entity_id', 'action', 'actor_id', 'remote_addr', 'changes')} \
+        == {'entity_type': 'item', 'entity_id': 1, 'action': 'updated', 'actor_id': 50, 'remote_addr': '127.0.0.1',
+            'changes': {'price': [price, price + 1]}}
+
+
+def test_an_unchanged_write_records_nothing(app, client):
+    price = client.get('/items/1').get_json()['price']
+    assert client.patch('/items/1', json={'price': price}, headers={'If-Match': '*'}).status_code == 202
+    assert events(app) == []
+
+
+def test_a_failed_write_keeps_the_batch(behind_app, monkeypatch):
+    write = audit_log.sink.write
+    with behind_app.test_request_context():
+        for entity_id in range(1, 4):
+            audit_log.record('order', entity_id, 'created')
+
+        def locked(batch):
+            raise OperationalError('INSERT', {}, Exception('database is locked'))
+        monkeypatch.setattr(audit_log.sink, 'write', locked)
+        with pytest.raises(OperationalError):
+            audit_log.flush()
+
+        # One event the sink rejects outright is dropped, not the batch around it
+        def reject_second(batch):
+            if any(event['entity_id'] == 2 for event in batch):
+                raise ValueError('bad event')
+            write(batch)
+        monkeypatch.setattr(audit_log.sink, 'write', reject_second)
+        assert audit_log.flush() == 2
+    assert [event['entity_id'] for event in events(behind_app)] == [1, 3]
+
+
+def test_audit_events_are_append_only(app, client, auth):
+    client.post('/customers/3/wallet', json={'amount': 1}, headers=auth(app, 50, admin=True))
+    with app.app_context():
+        for statement in (update(AuditEvent).values(actor_id=None), delete(AuditEvent)):
+            with pytest.raises(IntegrityError, match='audit_events is append-only'):
+                db.session.execute(statement)
+            db.session.rollback()
+    assert len(events(app)) == 1
+
+
+def test_current_actor(app, auth):
+    with app.test_request_context(headers=auth(app, 7)):
+        assert current_actor() == 7
+    with app.test_request_context(headers={'Authorization': 'Bearer not-a-token'}):
+        assert current_actor() is None
+    with app.test_request_context():
+        assert current_actor() is None
+    assert current_actor() is None
+
+
+def test_diff_only_covers_the_audited_fields():
+    row = SimpleNamespace(price=5, name='lamp', admin=False)
+    data = {'price': 6, 'name': 'lamp', 'admin': True}
+    assert diff(row, data, ('price', 'name')) == {'price': [5, 6]}
+    assert diff(row, {'name': 'lamp'}, ('price', 'name')) == {}
+
+
+def test_audit_resource(app, client, auth):
+    admin = auth(app, 50, admin=True)
+    for customer_id in (3, 3, 4, 3):
+        client.post(f'/customers/{customer_id}/wallet', json={'amount': 1}, headers=admin)
+
+    assert client.get('/audit').status_code == 401
+    assert client.get('/audit', headers=auth(app, 3)).status_code == 403
+
+    page = client.get('/audit?entity=customer&id=3&limit=2', headers=admin).get_json()
+    assert [(event['entity_id'], event['action'], event['actor_id']) for event in page['events']] == [
+        (3, 'wallet_adjusted', 50)] * 2
+    assert page['events'][0]['occurred_at'].endswith('+00:00')
+    page = client.get(f'/audit?entity=customer&id=3&limit=2&after={page["next_cursor"]}', headers=admin).get_json()
+    assert len(page['events']) == 1 and page['next_cursor'] is None
+    assert len(client.get('/audit?from=2000-01-01&to=2999-01-01', headers=admin).get_json()['events']) == 4
+    assert client.get('/audit?to=2000-01-01', headers=admin).get_json()['events'] == []
+
+    for query, error in [('limit=0', 'limit must be between 1 and 1000'), ('id=x', 'id must be an integer'),
+                         ('from=yesterday', 'from must be an ISO time like 2024-01-31T12:00:00'),
+                         ('after=x', 'after must be a next_cursor from a previous page')]:
+        response = client.get(f'/audit?{query}', headers=admin)
+        assert (response.status_code, response.get_json()) == (400, {'error': error})
+
+
+def test_segment_sink_and_replay(tmp_path, auth):
+    directory = tmp_path / 'audit'
+    app = create_app({'TESTING': True, 'AUDIT_SINK': 'segments', 'AUDIT_DIR': str(directory)})
+    with app.app_context():
+        populate(5)
+    admin = auth(app, 50, admin=True)
+    client = app.test_client()
+    for customer_id in (3, 4):
+        client.post(f'/customers/{customer_id}/wallet', json={'amount': 1}, headers=admin)
+    audit_log.sink.close()
+
+    assert events(app) == []
+    [segment] = os.listdir(directory)
+    with open(directory / segment) as lines:
+        assert [json.loads(line)['entity_id'] for line in lines] == [3, 4]
+    page = client.get('/audit?entity=customer&id=4', headers=admin).get_json()
+    assert [event['entity_id'] for event in page['events']] == [4]
+
+    audit.init_app(app)
+    result = app.test_cli_runner().invoke(args=['audit', 'replay', '--entity', 'customer', '--id', '3'])
+    [line] = result.output.splitlines()
+    assert json.loads(line)['changes']['amount'] == 1
+    result = app.test_cli_runner().invoke(args=['audit', 'replay', '--from', 'yesterday'])
+    assert result.exit_code == 2 and '--from must be an ISO time' in result.output
+
+
+def test_bad_sink():
+    with pytest.raises(ValueError, match='AUDIT_SINK must be one of table, segments'):
+        create_app({'TESTING': True, 'AUDIT_SINK': 'kafka'})
@@ -0,0 +1,99 @@
+# Standard library imports
+
+# Remote library imports
+import pytest
+from sqlalchemy import func, select
+
+# Local imports
+from config import db
+from models import Item, OrderItem
+
+ADMIN = 50
+
+
+@pytest.fixture
+def admin(app, auth):
+    return auth(app, ADMIN, admin=True)
+
+
+def statuses(response):
+    assert response.status_code == 200, response.json
+    return [result['status'] for result in response.json['results']]
+
+
+def test_requires_an_admin(app, client, auth):
+    response = client.post('/bulk/items/patch', json=[{'id': 1, 'price': 5}], headers=auth(app, 3))
+    assert response.status_code == 403
+
+
+def test_unknown_endpoint(client, admin):
+    assert client.post('/bulk/orders/patch', json=[], headers=admin).status_code == 404
+
+
+def test_create_reports_a_status_per_row(app, client, admin):
+    response = client.post('/bulk/items/create', headers=admin, json=[
+        {'title': 'New', 'category': 'accessory', 'price': 5},
+        {'title': 'No price', 'category': 'accessory'},
+        {'title': 'Free', 'category': 'accessory', 'price': 0},
+        {'title': 'Typed', 'category': 'accessory', 'price': '5'},
+        {'title': 'With id', 'category': 'accessory', 'price': 5, 'id': 7},
+        {'title': 'Extra', 'category': 'accessory', 'price': 5, 'colour': 'red'},
+    ])
+    assert statuses(response) == [201, 400, 400, 400, 400, 400]
+    with app.app_context():
+        assert db.session.get(Item, response.json['results'][0]['id']).title == 'New'
+
+
+def test_patch_and_delete_report_missing_rows(app, client, admin):
+    response = client.post('/bulk/items/patch', json=[{'id': 1, 'price': 7}, {'id': 10_000, 'price': 7}, {'id': 2}],
+                           headers=admin)
+    assert statuses(response) == [200, 404, 400]
+    response = client.post('/bulk/orderitems/delete', json=[1, {'id': 2}, 10_000, 'x'], headers=admin)
+    assert statuses(response) == [200, 200, 404, 400]
+    with app.app_context():
+        assert db.session.get(Item, 1).price == 7
+        assert db.session.scalar(select(func.count()).select_from(OrderItem).where(OrderItem.id.in_([1, 2]))) == 0
+
+
+def test_upsert_creates_and_updates(app, client, admin):
+    response = client.post('/bulk/items/upsert', headers=admin, json=[
+        {'id': 3, 'title': 'Replaced', 'category': 'firearm', 'price': 9},
+        {'id': 5000, 'title': 'Inserted', 'category': 'firearm', 'price': 9},
+    ])
+    assert statuses(response) == [200, 201]
+    with app.app_context():
+        assert db.session.get(Item, 3).title == 'Replaced'
+        assert db.session.get(Item, 5000).title == 'Inserted'
+
+
+def test_bad_references_fail_only_their_row(client, admin):
+    response = client.post('/bulk/orderitems/create', headers=admin, json=[
+        {'quantity': 1, 'order_id': 3, 'item_id': 8},
+        {'quantity': 1, 'order_id': 10_000, 'item_id': 8},
+    ])
+    assert statuses(response) == [201, 400]
+
+
+def test_constraint_failures_fall_back_to_single_rows(client, admin):
+    response = client.post('/bulk/customers/create', headers=admin, json=[
+        {'name': 'A', 'username': 'fresh-one', 'password': 'secret-1'},
+        {'name': 'B', 'username': 'customer1', 'password': 'secret-2'},
+    ])
+    assert statuses(response) == [201, 409]
+
+
+@pytest.mark.parametrize('op, rows', [
+    ('upsert', [{'id': 3, 'title': 'A', 'category': 'firearm', 'price': 1},
+                {'id': 4, 'title': 'B', 'category': 'firearm', 'price': 2},
+                {'id': 3, 'title': 'C', 'category': 'firearm', 'price': 3}]),
+    ('patch', [{'id': 3, 'price': 1}, {'id': 4, 'price': 2}, {'id': 3, 'price': 3}]),
+    ('delete', [3, 4, {'id': 3}]),
+])
+def test_duplicate_ids_are_rejected(app, client, admin, op, rows):
+    with app.app_context():
+        before = db.session.get(Item, 3).to_dict()
+    response = client.post(f'/bulk/items/{op}', json=rows, headers=admin)
+    assert statuses(response) == [400, 200, 400]
+    assert 'more than once' in response.json['results'][0]['error']
+    with app.app_context():
+        assert db.session.get(Item, 3).to_dict() == before
@@ -0,0 +1,115 @@
+# Standard library imports
+import threading
+
+# Remote library imports
+import pytest
+from sqlalchemy import func, select, update
+
+# Local imports
+from config import db
+from models import Customer, Item, Order
+
+CUSTOMER = 3
+
+
+def set_wallet(app, amount):
+    with app.app_context():
+        db.session.execute(update(Customer).where(Customer.id == CUSTOMER).values(wallet=amount))
+        db.session.commit()
+
+
+def set_price(app, item_id, price):
+    with app.app_context():
+        db.session.execute(update(Item).where(Item.id == item_id).values(price=price))
+        db.session.commit()
+
+
+def checkout(client, headers, *lines):
+    return client.post('/checkout', json={'items': [{'item_id': item_id, 'quantity': quantity}
+                                                    for item_id, quantity in lines]}, headers=headers)
+
+
+def test_charges_the_wallet_at_catalog_prices(app, client, auth):
+    set_wallet(app, 1000)
+    set_price(app, 1, 100)
+    set_price(app, 2, 30)
+    response = checkout(client, auth(app, CUSTOMER), (1, 2), (2, 1))
+    assert response.status_code == 201
+    assert response.json['total'] == 230
+    assert [(line['item_id'], line['quantity']) for line in response.json['order_items']] == [(1, 2), (2, 1)]
+    with app.app_context():
+        assert db.session.get(Customer, CUSTOMER).wallet == 770
+
+
+def test_insufficient_wallet_changes_nothing(app, client, auth):
+    set_wallet(app, 50)
+    set_price(app, 1, 100)
+    with app.app_context():
+        orders = db.session.scalar(select(func.count()).select_from(Order))
+    response = checkout(client, auth(app, CUSTOMER), (1, 1))
+    assert response.status_code == 402
+    assert response.json == {'error': 'Insufficient funds'}
+    with app.app_context():
+        assert db.session.get(Customer, CUSTOMER).wallet == 50
+        assert db.session.scalar(select(func.count()).select_from(Order)) == orders
+
+
+def test_unknown_item(app, client, auth):
+    response = checkout(client, auth(app, CUSTOMER), (1, 1), (10_000, 1))
+    assert response.status_code == 400
+    assert response.json == {'error': 'Unknown item ids: [10000]'}
+
+
+def test_item_without_a_price(app, client, auth):
+    set_wallet(app, 1000)
+    set_price(app, 1, None)
+    response = checkout(client, auth(app, CUSTOMER), (1, 1))
+    assert response.status_code == 409
+    assert response.json == {'error': 'Items without a price cannot be bought: [1]'}
+
+
+@pytest.mark.parametrize('body', [
+    [{'item_id': 1, 'quantity': 1}],
+    {'items': []},
+    {'items': [{'item_id': True, 'quantity': 1}]},
+    {'items': [{'item_id': 1, 'quantity': True}]},
+    {'items': [{'item_id': '1', 'quantity': 1}]},
+    {'items': [{'item_id': 1, 'quantity': 0}]},
+    {'items': [{'item_id': 1}]},
+])
+def test_malformed_cart(app, client, auth, body):
+    response = client.post('/checkout', json=body, headers=auth(app, CUSTOMER))
+    assert response.status_code == 400
+
+
+def test_requires_a_token(client):
+    assert checkout(client, {}, (1, 1)).status_code == 401
+
+
+def test_concurrent_checkouts_never_overdraw(file_app, auth):
+    # The wallet covers exactly one of the competing checkouts
+    set_wallet(file_app, 150)
+    set_price(file_app, 1, 100)
+    headers = auth(file_app, CUSTOMER)
+    with file_app.app_context():
+        orders = db.session.scalar(select(func.count()).select_from(Order).where(Order.customer_id == CUSTOMER))
+
+    statuses = []
+    barrier = threading.Barrier(6)
+
+    def buy():
+        client = file_app.test_client()
+        barrier.wait()
+        statuses.append(checkout(client, headers, (1, 1)).status_code)
+
+    threads = [threading.Thread(target=buy) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] + [402] * 5
+    with file_app.app_context():
+        assert db.session.get(Customer, CUSTOMER).wallet == 50
+        placed = db.session.scalar(select(func.count()).select_from(Order).where(Order.customer_id == CUSTOMER))
+        assert placed == orders + 1
@@ -0,0 +1,191 @@
+# Standard library imports
+import itertools
+import re
+import threading
+import time
+
+# Remote library imports
+import pytest
+from flask import Response, jsonify
+
+# Local imports
+from benchmarks import populate
+from app import create_app
+import coalesce
+from coalesce import coalescer
+import conditional
+
+# Endpoint names are unique per test: the outcome counters are process-wide
+endpoints = (f'slow{n}' for n in itertools.count())
+
+
+class CountingEvent(threading.Event):
+    """An Event that knows how many threads are waiting on it."""
+
+    def __init__(self):
+        super().__init__()
+        self.waiting = 0
+
+    def wait(self, timeout=None):
+        self.waiting += 1
+        return super().wait(timeout)
+
+
+class Flight(coalesce.Flight):
+    flights = []
+
+    def __init__(self):
+        super().__init__()
+        self.done = CountingEvent()
+        Flight.flights.append(self)
+
+
+def release_when_waiting(release, waiters, hold=0):
+    """Set ``release`` once ``waiters`` requests wait on a leader, and ``hold`` seconds after that."""
+    deadline = time.monotonic() + 10
+    while sum(flight.done.waiting for flight in Flight.flights) < waiters and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(hold)
+    release.set()
+
+
+class SlowView:
+    """A coalesced GET route whose runs block until ``release`` is set."""
+
+    def __init__(self, app, make_response=lambda n: jsonify(run=n), endpoint=None, **options):
+        self.endpoint = endpoint or next(endpoints)
+        self.runs = 0
+        self.release = threading.Event()
+        self.client = app.test_client()
+
+        @coalescer.coalesce(**options)
+        def view():
+            self.runs += 1
+            run = self.runs
+            self.release.wait(10)
+            return make_response(run)
+
+        app.add_url_rule(f'/{self.endpoint}', self.endpoint, view)
+
+    def get(self, results, **kwargs):
+        response = self.client.get(f'/{self.endpoint}', **kwargs)
+        results.append((response.status_code, response.get_data()))
+
+    def concurrently(self, requests, waiters, hold=0):
+        """Send ``requests`` (kwargs for get) at once; see ``release_when_waiting``."""
+        Flight.flights.clear()
+        results = []
+        threads = [threading.Thread(target=self.get, args=(results,), kwargs=kwargs) for kwargs in requests]
+        for thread in threads:
+            thread.start()
+        release_when_waiting(self.release, waiters, hold)
+        for thread in threads:
+            thread.join()
+        return results
+
+    def outcomes(self):
+        text = self.client.get('/metrics').get_data(as_text=True)
+        pattern = rf'http_coalesced_requests_total{{endpoint="{self.endpoint}",outcome="(\w+)"}} (\d+)'
+        return {outcome: int(count) for outcome, count in re.findall(pattern, text)}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(coalesce, 'Flight', Flight)
+    app = create_app({'TESTING': True})
+    with app.app_context():
+        populate(5)
+    return app
+
+
+def test_identical_requests_share_one_run(app):
+    view = SlowView(app)
+    results = view.concurrently([{}] * 6, waiters=5)
+    assert view.runs == 1
+    assert set(results) == {(200, b'{"run":1}\n')}
+    assert view.outcomes() == {'leader': 1, 'shared': 5}
+
+    # Not a cache: a later request runs the view again
+    view.get(results)
+    assert view.runs == 2
+
+
+def test_different_requests_do_not_share(app):
+    view = SlowView(app)
+    requests = [{'query_string': {'page': 1}}, {'query_string': {'page': 2}}, {'query_string': {'page': 1}},
+                {'headers': {'If-None-Match': '"x"'}}]
+    view.concurrently(requests, waiters=1)
+    assert view.runs == 3
+    assert view.outcomes() == {'leader': 3, 'shared': 1}
+
+
+def test_caller_scope_keys_on_authorization(app):
+    view, public = SlowView(app, scope='caller'), SlowView(app)
+    requests = [{'headers': {'Authorization': 'Bearer a'}}] * 2 + [{'headers': {'Authorization': 'Bearer b'}}]
+    view.concurrently(requests, waiters=1)
+    assert view.runs == 2
+    public.concurrently(requests, waiters=2)
+    assert public.runs == 1
+
+
+def test_a_new_generation_starts_a_new_flight(app):
+    generation = iter([1, 2])
+    view = SlowView(app, generation=lambda: next(generation))
+    view.concurrently([{}, {}], waiters=0)
+    assert view.runs == 2
+
+
+def test_waiting_is_bounded(app):
+    view = SlowView(app, wait=0.05)
+    results = view.concurrently([{}, {}], waiters=1, hold=0.2)
+    assert view.runs == 2
+    assert sorted(body for _, body in results) == [b'{"run":1}\n', b'{"run":2}\n']
+    assert view.outcomes() == {'leader': 1, 'timeout': 1}
+
+
+def test_streamed_responses_are_not_shared(app):
+    view = SlowView(app, make_response=lambda n: Response(iter([f'run {n}']), mimetype='text/plain'))
+    view.concurrently([{}, {}], waiters=1)
+    assert view.runs == 2
+    assert view.outcomes() == {'leader': 1, 'unshared': 1}
+
+
+def test_configured_per_resource(monkeypatch):
+    monkeypatch.setattr(coalesce, 'Flight', Flight)
+    endpoint = next(endpoints)
+    app = create_app({'TESTING': True, 'COALESCE_RESOURCES': {endpoint: {'enabled': False}}})
+    view = SlowView(app, endpoint=endpoint)
+    results = view.concurrently([{}, {}], waiters=0)
+    # Nothing to wait for: both run, and release together
+    assert view.runs == 2 and len(results) == 2
+    assert view.outcomes() == {}
+
+
+def test_bad_scope():
+    with pytest.raises(ValueError, match='scope must be one of public, caller'):
+        coalescer.coalesce(scope='everyone')
+
+
+def test_catalog_reads_are_coalesced(app, monkeypatch):
+    # The real resource, as wired in app.py: the row is read once for all of them
+    release, reads = threading.Event(), []
+    row_response = conditional.row_response
+
+    def slow_row_response(*args, **kwargs):
+        reads.append(args)
+        release.wait(10)
+        return row_response(*args, **kwargs)
+
+    monkeypatch.setattr('app.row_response', slow_row_response)
+    client = app.test_client()
+    Flight.flights.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get('/items/1'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release_when_waiting(release, 3)
+    for thread in threads:
+        thread.join()
+    assert len(reads) == 1
+    assert [response.status_code for response in results] == [200] * 4
+    assert len({(response.get_data(), response.headers['ETag']) for response in results}) == 1
@@ -0,0 +1,66 @@
+# Standard library imports
+import gzip
+import zlib
+
+# Remote library imports
+import pytest
+
+# Local imports
+from benchmarks import populate
+from app import create_app
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+def test_large_bodies_are_gzipped(client):
+    plain = client.get('/items')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.vary.as_set() == {'accept-encoding'}
+
+    response = client.get('/items', headers=GZIP)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'accept-encoding' in response.vary.as_set()
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+    assert len(response.get_data()) < len(plain.get_data())
+    # Same tag for either representation, and a repeat is served from the compressed LRU unchanged
+    assert response.get_etag() == plain.get_etag()
+    assert client.get('/items', headers=GZIP).get_data() == response.get_data()
+
+
+def test_strong_etags_are_weakened():
+    app = create_app({'TESTING': True, 'COMPRESS_MIN_SIZE': 0})
+    with app.app_context():
+        populate(3)
+    client = app.test_client()
+    plain = client.get('/items/1')
+    response = client.get('/items/1', headers=GZIP)
+    assert plain.get_etag()[1] is False
+    assert response.get_etag() == (plain.get_etag()[0], True)
+    # Still good for If-Match, which compares weakly
+    patched = client.patch('/items/1', json={'price': 5}, headers={'If-Match': response.headers['ETag']})
+    assert patched.status_code == 202
+
+
+def test_small_and_empty_bodies_are_left_alone(client):
+    response = client.get('/items/1', headers=GZIP)
+    assert len(response.get_data()) < 1024
+    assert 'Content-Encoding' not in response.headers
+    etag = client.get('/items', headers=GZIP).headers['ETag']
+    response = client.get('/items', headers={**GZIP, 'If-None-Match': etag})
+    assert response.status_code == 304 and 'Content-Encoding' not in response.headers
+
+
+def test_streams_are_compressed_chunk_by_chunk(client):
+    plain = client.get('/orderitems?stream=ndjson').get_data()
+    response = client.get('/orderitems?stream=ndjson', headers=GZIP)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert zlib.decompress(response.get_data(), 16 + zlib.MAX_WBITS) == plain
+
+
+def test_brotli_is_preferred_when_installed(client):
+    brotli = pytest.importorskip('brotli')
+    plain = client.get('/items')
+    response = client.get('/items', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.get_data()) == plain.get_data()
@@ -0,0 +1,78 @@
+# Standard library imports
+
+# Remote library imports
+import pytest
+from sqlalchemy import text
+
+# Local imports
+from conftest import counted_queries
+from config import db
+
+NEW_ITEM = {'title': 'New', 'img_url': 'https://example.com/new.jpg', 'description': 'New item',
+            'category': 'accessory', 'price': 10}
+
+
+def set_watermarks(app, updated_at):
+    with app.app_context():
+        db.session.execute(text('UPDATE table_watermarks SET updated_at = :updated_at'), {'updated_at': updated_at})
+        db.session.commit()
+
+
+@pytest.mark.parametrize('path', ['/items', '/items/firearm', '/orders', '/orderitems', '/customers'])
+def test_unchanged_collection_is_not_modified(app, client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag, weak = response.get_etag()
+    assert weak and response.cache_control.no_cache
+
+    with counted_queries(app) as statements:
+        response = client.get(path, headers={'If-None-Match': f'W/"{etag}"'})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.get_etag() == (etag, True)
+    # The watermark lookup, and neither the query nor the serializer
+    assert len(statements) == 1 and 'table_watermarks' in statements[0]
+
+
+def test_writes_change_the_tag(app, client, auth):
+    items = client.get('/items')
+    orders = client.get('/orders')
+    assert client.post('/items', json=NEW_ITEM).status_code == 201
+
+    response = client.get('/items', headers={'If-None-Match': items.headers['ETag']})
+    assert response.status_code == 200
+    assert response.get_etag() != items.get_etag()
+    assert response.get_json()[-1]['title'] == 'New'
+    # Other tables' tags are left alone
+    assert client.get('/orders', headers={'If-None-Match': orders.headers['ETag']}).status_code == 304
+
+    # Writes that bypass the API count too: the watermarks are kept by triggers
+    with app.app_context():
+        db.session.execute(text('UPDATE orders SET total = total + 1 WHERE id = 1'))
+        db.session.commit()
+    response = client.get('/orders', headers={'If-None-Match': orders.headers['ETag']})
+    assert response.status_code == 200
+    assert response.get_json()[0]['total'] == orders.get_json()[0]['total'] + 1
+
+
+def test_if_modified_since(app, client):
+    # Last-Modified is withheld until the second of the last write is over
+    set_watermarks(app, '2999-01-01 00:00:00')
+    assert client.get('/items').last_modified is None
+    set_watermarks(app, '2024-05-01 12:00:00')
+    response = client.get('/items')
+    last_modified = response.last_modified
+    assert last_modified is not None and last_modified.isoformat() == '2024-05-01T12:00:00+00:00'
+
+    assert client.get('/items', headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+    assert client.get('/items', headers={'If-Modified-Since': 'Wed, 01 May 2024 11:59:59 GMT'}).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    response = client.get('/items', headers={'If-None-Match': 'W/"other"',
+                                             'If-Modified-Since': response.headers['Last-Modified']})
+    assert response.status_code == 200
+
+
+def test_json_is_compact_outside_debug(client):
+    for path in ('/items', '/items/1', '/orders?limit=5'):
+        body = client.get(path).get_data(as_text=True)
+        assert body.lstrip('[').startswith('{"') and ': ' not in body and ', "' not in body, path
@@ -0,0 +1,69 @@
+# Standard library imports
+
+# Remote library imports
+import pytest
+from sqlalchemy import text
+
+# Local imports
+from config import create_app, db
+from database import SQLITE_PROFILES, database_config
+
+
+def test_file_database_defaults_to_the_performance_profile():
+    config = database_config({'DATABASE_URI': 'sqlite:////tmp/shop.db'})
+    assert config['SQLALCHEMY_DATABASE_URI'] == 'sqlite:////tmp/shop.db'
+    assert config['SQLITE_PRAGMAS'] == SQLITE_PROFILES['performance']
+    assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {'pool_size': 10, 'max_overflow': 20}
+
+
+def test_default_profile_keeps_sqlite_defaults():
+    config = database_config({'DATABASE_URI': 'sqlite:////tmp/shop.db', 'DB_PROFILE': 'default'})
+    assert config['SQLITE_PRAGMAS'] == {}
+    assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {}
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError, match='DB_PROFILE must be one of default, performance'):
+        database_config({'DB_PROFILE': 'fast'})
+
+
+def test_environment_overrides():
+    config = database_config({
+        'DATABASE_URI': 'sqlite:///shop.db', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT': '100',
+        'DB_POOL_SIZE': '3', 'DB_MAX_OVERFLOW': '0', 'DB_POOL_TIMEOUT': '5', 'DB_POOL_RECYCLE': '600',
+    })
+    assert config['SQLITE_PRAGMAS']['synchronous'] == 'FULL'
+    assert config['SQLITE_PRAGMAS']['busy_timeout'] == '100'
+    assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {
+        'pool_size': 3, 'max_overflow': 0, 'pool_timeout': 5, 'pool_recycle': 600}
+
+
+def test_in_memory_database_takes_no_pool_options():
+    config = database_config({'DATABASE_URI': 'sqlite://', 'DB_POOL_SIZE': '3'})
+    assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {}
+    assert 'journal_mode' not in config['SQLITE_PRAGMAS']
+    assert 'mmap_size' not in config['SQLITE_PRAGMAS']
+
+
+@pytest.mark.parametrize('uri, expected', [
+    ('postgres://shop:secret@db/shop', 'postgresql+psycopg2://shop:secret@db/shop'),
+    ('postgresql://shop@db/shop', 'postgresql://shop@db/shop'),
+])
+def test_postgresql(uri, expected):
+    for name in ('DATABASE_URI', 'DATABASE_URL'):
+        config = database_config({name: uri})
+        assert config['SQLALCHEMY_DATABASE_URI'] == expected
+        assert config['SQLITE_PRAGMAS'] == {}
+        assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {'pool_size': 10, 'max_overflow': 20, 'pool_pre_ping': True}
+
+
+def test_pragmas_are_set_on_every_connection(tmp_path):
+    app = create_app(database_config({'DATABASE_URI': f'sqlite:///{tmp_path / "shop.db"}'}))
+    with app.app_context():
+        with db.engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            # NORMAL
+            assert connection.execute(text('PRAGMA synchronous')).scalar() == 1
+            assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+            assert connection.execute(text('PRAGMA cache_size')).scalar() == -64 * 1024
+        assert db.engine.pool.size() == 10
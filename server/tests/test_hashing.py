@@ -0,0 +1,101 @@
+# Standard library imports
+import threading
+
+# Remote library imports
+import bcrypt
+import pytest
+from flask import Flask
+
+# Local imports
+from benchmarks import populate
+from app import create_app
+from config import db, hasher
+from models import Customer
+import hashing
+from hashing import HashingBusy, PasswordHasher, pool_size
+
+
+def password_hasher(**config):
+    app = Flask(__name__)
+    app.config.update({'BCRYPT_LOG_ROUNDS': 4, **config})
+    return PasswordHasher(app)
+
+
+@pytest.mark.parametrize('executor', ['inline', 'thread', 'process'])
+def test_hash_and_check(executor):
+    pw_hasher = password_hasher(PASSWORD_HASH_EXECUTOR=executor, PASSWORD_HASH_WORKERS=2)
+    try:
+        pw_hash = pw_hasher.hash('hunter2')
+        assert pw_hash.startswith('$2b$04$')
+        assert pw_hasher.check(pw_hash, 'hunter2')
+        assert not pw_hasher.check(pw_hash, 'hunter3')
+        hashes = pw_hasher.hash_many(['a', 'b', 'c'])
+        assert [pw_hasher.check(h, p) for h, p in zip(hashes, 'abc')] == [True, True, True]
+    finally:
+        pw_hasher.shutdown()
+
+
+def test_needs_rehash():
+    pw_hasher = password_hasher(PASSWORD_HASH_EXECUTOR='inline', BCRYPT_LOG_ROUNDS=5)
+    assert not pw_hasher.needs_rehash(pw_hasher.hash('x'))
+    assert pw_hasher.needs_rehash(bcrypt.hashpw(b'x', bcrypt.gensalt(4)).decode('utf-8'))
+    assert pw_hasher.needs_rehash('not a bcrypt hash')
+
+
+def test_pool_size_splits_the_cores(monkeypatch):
+    monkeypatch.setattr(hashing.os, 'cpu_count', lambda: 8)
+    assert [pool_size(workers) for workers in (0, 1, 3, 8, 16)] == [8, 8, 2, 1, 1]
+    monkeypatch.setattr(hashing.os, 'cpu_count', lambda: None)
+    assert pool_size(4) == 1
+
+
+def test_login_upgrades_the_cost_factor():
+    old_hash = bcrypt.hashpw(b'hunter2', bcrypt.gensalt(4)).decode('utf-8')
+    app = create_app({'TESTING': True, 'BCRYPT_LOG_ROUNDS': 5})
+    with app.app_context():
+        populate(3, password_hash=old_hash)
+    client = app.test_client()
+
+    assert client.post('/login', json={'username': 'customer2', 'password': 'wrong'}).status_code == 401
+    with app.app_context():
+        assert db.session.get(Customer, 2).password_hash == old_hash
+
+    assert client.post('/login', json={'username': 'customer2', 'password': 'hunter2'}).status_code == 200
+    with app.app_context():
+        new_hash = db.session.get(Customer, 2).password_hash
+    assert new_hash.startswith('$2b$05$')
+    assert client.post('/login', json={'username': 'customer2', 'password': 'hunter2'}).status_code == 200
+
+
+def test_busy_hasher_answers_503(monkeypatch):
+    app = create_app({'TESTING': True, 'BCRYPT_LOG_ROUNDS': 4, 'PASSWORD_HASH_EXECUTOR': 'thread',
+                      'PASSWORD_HASH_MAX_PENDING': 1, 'PASSWORD_HASH_RETRY_AFTER': 2})
+    with app.app_context():
+        populate(3)
+    client = app.test_client()
+
+    # One hash holds the only slot until released
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash(*args):
+        started.set()
+        release.wait(10)
+        return 'hashed'
+
+    monkeypatch.setattr(hashing, '_hash', slow_hash)
+    holder = threading.Thread(target=hasher.hash, args=('x',))
+    holder.start()
+    try:
+        assert started.wait(10)
+        with app.app_context(), pytest.raises(HashingBusy):
+            hasher.check('hash', 'x')
+        for path, body in [('/login', {'username': 'customer1', 'password': 'x'}),
+                           ('/signup', {'name': 'New', 'username': 'new', 'wallet': 0, 'password': 'x'})]:
+            response = client.post(path, json=body)
+            assert response.status_code == 503, path
+            assert response.headers['Retry-After'] == '2'
+            assert response.get_json() == {'error': HashingBusy.description}
+    finally:
+        release.set()
+        holder.join()
+        hasher.shutdown()
@@ -0,0 +1,59 @@
+# Standard library imports
+from datetime import datetime
+
+# Remote library imports
+import pytest
+from sqlalchemy import text
+
+# Local imports
+from benchmarks import populate, access_token
+from app import create_app
+from config import db
+from models import Order
+
+
+@pytest.fixture
+def history():
+    """Customer 3's orders, some with explicit timestamps and some from the CURRENT_TIMESTAMP default."""
+    token = access_token(3)
+    # After the token: the extensions are shared, so the last app built configures them
+    app = create_app({'TESTING': True})
+    with app.app_context():
+        populate(40)
+        # Stored by SQLAlchemy with six fractional digits, one pair in the same second
+        db.session.execute(db.insert(Order), [
+            {'customer_id': 3, 'total': 5, 'created_at': created_at}
+            for created_at in (datetime(2024, 2, 1), datetime(2024, 2, 1), datetime(2024, 2, 1, 0, 0, 0, 500000))
+        ])
+        # Several in the same second, stored without a fractional part
+        db.session.execute(text('INSERT INTO orders(customer_id, total) VALUES (3, 1), (3, 2), (3, 3), (3, 4)'))
+        db.session.commit()
+        ids = db.session.execute(text(
+            'SELECT id FROM orders WHERE customer_id = 3 ORDER BY created_at DESC, id DESC')).scalars().all()
+    return app.test_client(), {'Authorization': f'Bearer {token}'}, ids
+
+
+def walk(client, headers, path, limit):
+    ids, cursor = [], None
+    for _ in range(50):
+        query = {'limit': limit, **({'before': cursor} if cursor else {})}
+        response = client.get(path, query_string=query, headers=headers)
+        assert response.status_code == 200, response.json
+        ids += [order['id'] for order in response.json['orders']]
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            return ids
+    pytest.fail(f'{path} never reached its last page: {ids}')
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 100])
+def test_pages_cover_every_order_once(history, limit):
+    client, headers, ids = history
+    assert len(ids) > 4
+    assert walk(client, headers, '/me/orders', limit) == ids
+
+
+def test_cursor_is_validated(history):
+    client, headers, _ = history
+    response = client.get('/me/orders', query_string={'before': 'yesterday,1'}, headers=headers)
+    assert response.status_code == 400
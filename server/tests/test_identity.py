@@ -0,0 +1,106 @@
+# Standard library imports
+
+# Remote library imports
+import bcrypt
+import pytest
+from flask_jwt_extended import decode_token
+from sqlalchemy import update
+
+# Local imports
+from conftest import ROWS, counted_queries
+from benchmarks import populate
+from app import create_app
+from config import db
+from identity import SnapshotCache, customer_snapshots
+from models import Customer
+
+
+@pytest.fixture(autouse=True)
+def empty_snapshots():
+    # The cache is process-wide and keyed by id, which every test's database reuses
+    for customer_id in range(1, ROWS + 1):
+        customer_snapshots.invalidate(customer_id)
+
+
+def test_login_token_carries_the_claims():
+    app = create_app({'TESTING': True, 'BCRYPT_LOG_ROUNDS': 4})
+    with app.app_context():
+        populate(3, password_hash=bcrypt.hashpw(b'hunter2', bcrypt.gensalt(4)).decode('utf-8'))
+    response = app.test_client().post('/login', json={'username': 'customer2', 'password': 'hunter2'})
+    assert response.status_code == 200
+    with app.app_context():
+        claims = decode_token(response.get_json()['access_token'])
+    assert claims['sub'] == '2'
+    assert (claims['admin'], claims['username'], claims['ver']) == (False, 'customer2', 1)
+
+
+def test_admin_routes_authorize_from_claims(app, client, auth):
+    with counted_queries(app) as statements:
+        response = client.get('/reports/customers', headers=auth(app, 3))
+    assert response.status_code == 403
+    assert response.get_json() == {'error': 'Admin access required'}
+    assert statements == []
+
+    # Only the claim counts: customer 3 is no admin in the database
+    assert client.get('/reports/customers', headers=auth(app, 3, admin=True)).status_code == 200
+    assert client.get('/reports/customers').status_code == 401
+
+
+def test_check_session_is_served_from_the_snapshot(app, client, auth):
+    headers = auth(app, 3)
+    with app.app_context():
+        expected = db.session.get(Customer, 3).to_dict()
+    with counted_queries(app) as statements:
+        assert client.get('/check_session', headers=headers).get_json() == expected
+    assert len(statements) == 1
+    with counted_queries(app) as statements:
+        assert client.get('/check_session', headers=headers).get_json() == expected
+    assert statements == []
+
+
+def test_newer_token_version_reloads_the_snapshot(app, client, auth):
+    client.get('/check_session', headers=auth(app, 3))
+    # Written behind the API's back, so the snapshot is not invalidated
+    with app.app_context():
+        db.session.execute(update(Customer).where(Customer.id == 3).values(name='Renamed', version=2))
+        db.session.commit()
+
+    # A token from before the change may see the snapshot until it expires; one issued after it may not
+    assert client.get('/check_session', headers=auth(app, 3, version=1)).get_json()['name'] == 'Customer 3'
+    assert client.get('/check_session', headers=auth(app, 3, version=2)).get_json()['name'] == 'Renamed'
+
+
+def test_customer_writes_invalidate_the_snapshot(app, client, auth):
+    headers = auth(app, 3)
+    client.get('/check_session', headers=headers)
+
+    response = client.patch('/customers/3', json={'wallet': 12.5}, headers={'If-Match': '*'})
+    assert response.status_code == 202
+    assert client.get('/check_session', headers=headers).get_json()['wallet'] == 12.5
+
+    response = client.post('/customers/3/wallet', json={'amount': 10}, headers=auth(app, 50, admin=True))
+    assert response.status_code == 200
+    assert client.get('/check_session', headers=headers).get_json()['wallet'] == 22.5
+
+    assert client.delete('/customers/3').status_code == 200
+    response = client.get('/check_session', headers=headers)
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Customer not found'}
+
+
+def test_snapshot_cache_expires_and_evicts(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('identity.time.monotonic', lambda: now[0])
+    cache = SnapshotCache(maxsize=2, ttl=60)
+
+    cache.set(1, 1, 'one')
+    cache.set(2, 1, 'two')
+    assert cache.get(1) == 'one'
+    # 1 was used last, so 2 goes
+    cache.set(3, 1, 'three')
+    assert (cache.get(1), cache.get(2), cache.get(3)) == ('one', None, 'three')
+
+    assert cache.get(3, min_version=2) is None
+    assert cache.get(1, min_version=1) == 'one'
+    now[0] += 61
+    assert cache.get(1) is None
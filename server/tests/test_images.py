@@ -0,0 +1,142 @@
+# Standard library imports
+import hashlib
+import io
+import os
+
+# Remote library imports
+import pytest
+from PIL import Image
+
+# Local imports
+from benchmarks import populate
+from app import create_app
+import images
+from images import image_store
+
+
+def png(width=600, height=300, color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def image_app(tmp_path, **config):
+    app = create_app({'TESTING': True, 'IMAGE_STORE': str(tmp_path / 'images'), 'IMAGE_WORKERS': 0, **config})
+    with app.app_context():
+        populate(5)
+    return app
+
+
+@pytest.fixture
+def store_app(tmp_path):
+    return image_app(tmp_path)
+
+
+@pytest.fixture
+def admin(store_app, auth):
+    return auth(store_app, 50, admin=True)
+
+
+def test_upload_lists_the_variants(store_app, admin):
+    client = store_app.test_client()
+    assert client.get('/items/1').get_json()['image_variants'] == []
+    data = png()
+    digest = hashlib.sha256(data).hexdigest()
+
+    response = client.put('/items/1/image', data=data, headers=admin)
+    assert response.status_code == 200
+    item = response.get_json()
+    assert item['img_url'] == f'/images/{digest}/480.webp'
+    assert [(variant['format'], variant['width']) for variant in item['image_variants']] == [
+        ('webp', 160), ('webp', 480), ('webp', 960), ('jpeg', 160), ('jpeg', 480), ('jpeg', 960)]
+    assert item['image_variants'][3]['url'] == f'/images/{digest}/160.jpg'
+    # The catalog was invalidated, and every variant rendered
+    assert next(row for row in client.get('/items').get_json() if row['id'] == 1) == item
+    assert all(os.path.exists(image_store.variant_path(digest, width, fmt))
+               for fmt in ('webp', 'jpeg') for width in (160, 480, 960))
+
+
+def test_variants_are_resized_and_immutable(store_app, admin):
+    client = store_app.test_client()
+    item = client.put('/items/1/image', data=png(), headers=admin).get_json()
+    urls = {(variant['format'], variant['width']): variant['url'] for variant in item['image_variants']}
+
+    response = client.get(urls['webp', 480])
+    assert response.status_code == 200 and response.mimetype == 'image/webp'
+    assert response.cache_control.public and response.cache_control.immutable
+    assert response.cache_control.max_age == 365 * 24 * 3600
+    with Image.open(io.BytesIO(response.get_data())) as image:
+        assert (image.format, image.size) == ('WEBP', (480, 240))
+    assert client.get(urls['webp', 480], headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    # Never upscaled
+    response = client.get(urls['jpeg', 960])
+    assert response.mimetype == 'image/jpeg'
+    with Image.open(io.BytesIO(response.get_data())) as image:
+        assert (image.format, image.size) == ('JPEG', (600, 300))
+
+
+def test_missing_variants_are_rendered_on_request(store_app, admin):
+    client = store_app.test_client()
+    client.put('/items/1/image', data=png(), headers=admin)
+    digest = hashlib.sha256(png()).hexdigest()
+    os.unlink(image_store.variant_path(digest, 160, 'webp'))
+    assert client.get(f'/images/{digest}/160.webp').status_code == 200
+    assert os.path.exists(image_store.variant_path(digest, 160, 'webp'))
+
+
+@pytest.mark.parametrize('name', ['100.webp', '160.png', '160', 'x.webp'])
+def test_unknown_variants(store_app, admin, name):
+    client = store_app.test_client()
+    client.put('/items/1/image', data=png(), headers=admin)
+    digest = hashlib.sha256(png()).hexdigest()
+    assert client.get(f'/images/{digest}/{name}').status_code == 404
+    assert client.get(f'/images/{"0" * 64}/160.webp').status_code == 404
+    assert client.get('/images/not-a-digest/160.webp').status_code == 404
+
+
+def test_multipart_upload_and_shared_originals(store_app, admin):
+    client = store_app.test_client()
+    data = png(color='blue')
+    response = client.put('/items/2/image', data={'image': (io.BytesIO(data), 'blue.png')}, headers=admin)
+    assert response.status_code == 200
+    assert client.put('/items/3/image', data=data, headers=admin).get_json()['img_url'] == \
+        response.get_json()['img_url']
+    assert os.listdir(os.path.join(image_store.root, 'originals', hashlib.sha256(data).hexdigest()[:2])) == [
+        hashlib.sha256(data).hexdigest()]
+
+
+def test_rejected_uploads(tmp_path, auth):
+    app = image_app(tmp_path, IMAGE_MAX_BYTES=2000)
+    admin = auth(app, 50, admin=True)
+    client = app.test_client()
+
+    def put(data, item_id=1, headers=admin):
+        response = client.put(f'/items/{item_id}/image', data=data, headers=headers)
+        return response.status_code, response.get_json()
+
+    assert put(b'not an image') == (400, {'error': 'Not an image Pillow can read'})
+    assert put(b'') == (400, {'error': 'Send the image as the request body or as a multipart "image" field'})
+    assert put(os.urandom(3000)) == (413, {'error': 'Images are limited to 2000 bytes'})
+    assert put(png(), item_id=10000)[0] == 404
+    assert put(png(), headers=auth(app, 3))[0] == 403
+    assert client.get('/items/1').get_json()['image_variants'] == []
+
+
+def test_background_rendering(tmp_path, auth):
+    app = image_app(tmp_path, IMAGE_WORKERS=2)
+    client = app.test_client()
+    client.put('/items/1/image', data=png(), headers=auth(app, 50, admin=True))
+    image_store.shutdown()
+    digest = hashlib.sha256(png()).hexdigest()
+    assert os.path.exists(image_store.variant_path(digest, 960, 'jpeg'))
+
+
+def test_render_command(store_app, admin):
+    store_app.test_client().put('/items/1/image', data=png(), headers=admin)
+    digest = hashlib.sha256(png()).hexdigest()
+    os.unlink(image_store.variant_path(digest, 480, 'webp'))
+    os.unlink(image_store.variant_path(digest, 960, 'jpeg'))
+    images.init_app(store_app)
+    result = store_app.test_cli_runner().invoke(args=['images', 'render'])
+    assert result.output == '2 variants rendered\n'
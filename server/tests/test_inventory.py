@@ -0,0 +1,174 @@
+# Standard library imports
+import threading
+
+# Remote library imports
+import pytest
+from sqlalchemy import select, update
+
+# Local imports
+from config import db
+from models import Customer, Item, Reservation
+import inventory
+from inventory import release_expired
+
+
+def cart(*lines):
+    return {'items': [{'item_id': item_id, 'quantity': quantity} for item_id, quantity in lines]}
+
+
+@pytest.fixture
+def admin(app, auth):
+    return auth(app, 50, admin=True)
+
+
+@pytest.fixture
+def buyer(app, auth):
+    with app.app_context():
+        db.session.execute(update(Customer).where(Customer.id == 3).values(wallet=1e9))
+        db.session.commit()
+    return auth(app, 3)
+
+
+def stock(client, item_id=1):
+    return client.get(f'/items/{item_id}/stock').get_json()['stock']
+
+
+def in_stock(client, item_id=1):
+    return client.get(f'/items/{item_id}').get_json()['in_stock']
+
+
+def expire_reservations(app):
+    with app.app_context():
+        db.session.execute(update(Reservation).values(expires_at=inventory.utcnow().replace(year=2000)))
+        db.session.commit()
+
+
+def test_restock(client, admin, auth, app):
+    assert stock(client) is None and in_stock(client)
+    response = client.post('/items/1/stock', json={'amount': 5}, headers=admin)
+    assert response.get_json() == {'item_id': 1, 'stock': 5}
+
+    response = client.post('/items/1/stock', json={'amount': -6}, headers=admin)
+    assert (response.status_code, response.get_json()) == (409, {'error': 'Not enough stock to remove'})
+    assert client.post('/items/1/stock', json={'amount': -5}, headers=admin).get_json()['stock'] == 0
+    assert not in_stock(client)
+    # The listing is rebuilt, not served from before the write
+    assert not next(item for item in client.get('/items').get_json() if item['id'] == 1)['in_stock']
+    assert client.post('/items/1/stock', json={'amount': 2}, headers=admin).get_json()['stock'] == 2
+    assert in_stock(client)
+
+    assert client.post('/items/10000/stock', json={'amount': 1}, headers=admin).status_code == 404
+    assert client.post('/items/1/stock', json={'amount': 1.5}, headers=admin).status_code == 400
+    assert client.post('/items/1/stock', json={'amount': 1}, headers=auth(app, 3)).status_code == 403
+
+
+def test_checkout_takes_stock(client, admin, buyer):
+    client.post('/items/1/stock', json={'amount': 3}, headers=admin)
+    assert client.post('/checkout', json=cart((1, 2), (2, 1)), headers=buyer).status_code == 201
+    assert (stock(client), stock(client, 2)) == (1, None)
+
+    response = client.post('/checkout', json=cart((1, 2)), headers=buyer)
+    assert (response.status_code, response.get_json()) == (409, {'error': 'Out of stock: item ids [1]'})
+    # All or nothing: neither the stock nor an order was written
+    assert stock(client) == 1
+    assert client.post('/checkout', json=cart((1, 1)), headers=buyer).status_code == 201
+    assert stock(client) == 0 and not in_stock(client)
+
+
+def test_reservations_hold_stock_for_checkout(app, client, admin, buyer, auth):
+    client.post('/items/1/stock', json={'amount': 5}, headers=admin)
+    response = client.post('/reservations', json=cart((1, 3)), headers=buyer)
+    assert response.status_code == 201
+    [reservation] = response.get_json()['reservations']
+    assert (reservation['item_id'], reservation['quantity']) == (1, 3)
+    assert stock(client) == 2
+
+    # Another customer cannot have the held units
+    other = auth(app, 4)
+    response = client.post('/reservations', json=cart((1, 3)), headers=other)
+    assert (response.status_code, response.get_json()) == (409, {'error': 'Out of stock: item ids [1]'})
+    response = client.post('/reservations', json=cart((10000, 1)), headers=buyer)
+    assert (response.status_code, response.get_json()) == (404, {'error': 'Unknown item ids: [10000]'})
+
+    # Checkout claims the reservation and takes only what it did not cover
+    assert client.post('/checkout', json=cart((1, 4)), headers=buyer).status_code == 201
+    assert stock(client) == 1
+    with app.app_context():
+        assert db.session.scalar(select(Reservation.id)) is None
+
+
+def test_reserved_units_not_bought_go_back(app, client, admin, buyer):
+    client.post('/items/1/stock', json={'amount': 5}, headers=admin)
+    client.post('/reservations', json=cart((1, 4)), headers=buyer)
+    assert client.post('/checkout', json=cart((1, 1)), headers=buyer).status_code == 201
+    assert stock(client) == 4
+
+
+def test_release(app, client, admin, buyer, auth):
+    client.post('/items/1/stock', json={'amount': 2}, headers=admin)
+    id = client.post('/reservations', json=cart((1, 2)), headers=buyer).get_json()['reservations'][0]['id']
+    assert not in_stock(client)
+
+    assert client.delete(f'/reservations/{id}', headers=auth(app, 4)).status_code == 404
+    assert client.delete(f'/reservations/{id}', headers=buyer).status_code == 200
+    assert stock(client) == 2 and in_stock(client)
+    assert client.delete(f'/reservations/{id}', headers=buyer).status_code == 404
+
+
+def test_expired_reservations_are_swept_in_batches(app, client, admin, buyer):
+    client.post('/items/1/stock', json={'amount': 10}, headers=admin)
+    client.post('/items/2/stock', json={'amount': 10}, headers=admin)
+    for _ in range(3):
+        client.post('/reservations', json=cart((1, 2), (2, 1)), headers=buyer)
+    live = client.post('/reservations', json=cart((1, 1)), headers=buyer).get_json()['reservations'][0]['id']
+    with app.app_context():
+        db.session.execute(update(Reservation).where(Reservation.id != live)
+                           .values(expires_at=inventory.utcnow().replace(year=2000)))
+        db.session.commit()
+
+        assert release_expired(batch_size=2) == 6
+        assert release_expired() == 0
+        assert db.session.scalars(select(Reservation.id)).all() == [live]
+    assert (stock(client), stock(client, 2)) == (9, 10)
+
+    # An expired reservation is not claimed at checkout either
+    expire_reservations(app)
+    assert client.post('/checkout', json=cart((1, 1)), headers=buyer).status_code == 201
+    assert stock(client) == 8
+
+
+def test_sweep_command(app, client, admin, buyer):
+    client.post('/items/1/stock', json={'amount': 3}, headers=admin)
+    client.post('/reservations', json=cart((1, 3)), headers=buyer)
+    expire_reservations(app)
+    inventory.init_app(app)
+    result = app.test_cli_runner().invoke(args=['reservations', 'sweep'])
+    assert result.output == '1 reservations released\n'
+    assert stock(client) == 3
+
+
+def test_hot_sku_never_oversells(file_app, auth):
+    client = file_app.test_client()
+    with file_app.app_context():
+        db.session.execute(update(Customer).values(wallet=1e9))
+        price = db.session.get(Item, 1).price
+        db.session.commit()
+    client.post('/items/1/stock', json={'amount': 5}, headers=auth(file_app, 50, admin=True))
+    buyers = [auth(file_app, customer_id) for customer_id in range(1, 13)]
+    barrier = threading.Barrier(len(buyers))
+    statuses = []
+
+    def buy(headers):
+        barrier.wait()
+        statuses.append(file_app.test_client().post('/checkout', json=cart((1, 1)), headers=headers).status_code)
+
+    threads = [threading.Thread(target=buy, args=(headers,)) for headers in buyers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(statuses) == [201] * 5 + [409] * 7
+    assert stock(client) == 0
+    with file_app.app_context():
+        spent = db.session.scalar(select(db.func.sum(1e9 - Customer.wallet)).where(Customer.id <= 12))
+    assert spent == pytest.approx(5 * price)
@@ -0,0 +1,81 @@
+# Standard library imports
+import json
+import math
+import subprocess
+import sys
+from collections import Counter
+from random import Random
+
+# Remote library imports
+import bcrypt
+import pytest
+
+# Local imports
+from conftest import free_port
+from benchmarks import SERVER_DIR, percentile, populate
+from benchmarks.load import PASSWORD, compare, run, scenarios, summarize
+from app import create_app
+
+ROUTES = ('/items', '/items/<category>', '/orders', '/orderitems', '/customers', '/login', '/signup', '/check_session')
+
+
+def results(**routes):
+    """A results file with ``name=(rps, p95_ms)`` per route."""
+    return {'config': {'rows': 10},
+            'routes': {name: {'rps': rps, 'p95_ms': p95} for name, (rps, p95) in routes.items()}}
+
+
+def test_percentile():
+    samples = list(range(100, 0, -1))
+    assert [percentile(samples, pct) for pct in (0, 50, 95, 99, 100)] == [1, 51, 95, 99, 100]
+    assert percentile([7], 99) == 7
+    assert math.isnan(percentile([], 50))
+
+
+def test_summarize():
+    summary = summarize([0.001, 0.002, 0.004, 0.010], Counter({200: 3, 503: 1}), elapsed=2)
+    assert summary == {'requests': 4, 'rps': 2.0, 'p50_ms': 4.0, 'p95_ms': 10.0, 'p99_ms': 10.0,
+                       'statuses': {'200': 3, '503': 1}}
+
+
+def test_compare_flags_regressions_beyond_the_tolerance():
+    baseline = results(a=(100, 10), b=(100, 10), c=(100, 10), gone=(100, 10))
+    current = results(a=(85, 11.5), b=(70, 10), c=(100, 13), new=(1, 1000))
+    assert compare(baseline, current, 0.2) == ['b: 100.0 -> 70.0 req/s', 'c: p95 10.00ms -> 13.00ms']
+    assert compare(baseline, current, 0.5) == []
+
+
+def test_every_scenario_is_answered():
+    # Before the app: scenarios() mints its token with an app of its own, and the last app built wins
+    plan = scenarios(20)
+    app = create_app({'TESTING': True, 'BCRYPT_LOG_ROUNDS': 4})
+    with app.app_context():
+        populate(20, password_hash=bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8'))
+    client = app.test_client()
+
+    covered = {name.split()[1].split('?')[0] for name in plan}
+    assert set(ROUTES) <= covered
+    for n, (name, build) in enumerate(plan.items()):
+        method, path, body, headers = build(Random(n), n)
+        response = client.open(path, method=method, json=body, headers=headers)
+        assert response.status_code in (200, 201), name
+
+
+def test_run_reports_percentiles():
+    report = run(rows=20, clients=2, seconds=0.2, routes=['GET /items/<id>'], rounds=4, seed=0, port=free_port())
+    assert report['config']['rows'] == 20
+    route = report['routes']['GET /items/<id>']
+    assert list(report['routes']) == ['GET /items/<id>']
+    assert route['requests'] > 0 and route['statuses'] == {'200': route['requests']}
+    assert route['p50_ms'] <= route['p95_ms'] <= route['p99_ms']
+
+
+@pytest.mark.parametrize('current, code', [(results(a=(100, 10)), 0), (results(a=(50, 10)), 1)])
+def test_compare_mode_exit_status(tmp_path, current, code):
+    (tmp_path / 'baseline.json').write_text(json.dumps(results(a=(100, 10))))
+    (tmp_path / 'current.json').write_text(json.dumps(current))
+    process = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.load', '--compare', tmp_path / 'baseline.json', tmp_path / 'current.json'],
+        cwd=SERVER_DIR, capture_output=True, text=True)
+    assert process.returncode == code
+    assert ('REGRESSION a: 100.0 -> 50.0 req/s' in process.stdout) == bool(code)
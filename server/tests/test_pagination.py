@@ -0,0 +1,77 @@
+# Standard library imports
+import json
+
+# Remote library imports
+import pytest
+
+# Local imports
+from conftest import ROWS
+import pagination
+
+ENDPOINTS = ('/items', '/orders', '/orderitems', '/customers')
+
+
+def walk(client, path, limit):
+    """Every row of ``path``, one ``limit``-sized page at a time, following X-Next-Cursor."""
+    rows, cursor = [], None
+    while True:
+        response = client.get(path, query_string={'limit': limit, **({'after': cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= limit
+        rows += page
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            return rows
+        assert cursor == str(page[-1]['id'])
+
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+@pytest.mark.parametrize('limit', [1, 7, ROWS, 1000])
+def test_pages_cover_the_collection_once(client, path, limit):
+    everything = client.get(path).get_json()
+    assert len(everything) == ROWS
+    assert walk(client, path, limit) == everything
+
+
+def test_after_seeks_past_the_cursor(client):
+    page = client.get('/orders?after=45').get_json()
+    assert [order['id'] for order in page] == [46, 47, 48, 49, 50]
+    assert client.get('/orders?after=50&limit=10').get_json() == []
+
+
+@pytest.mark.parametrize('query, error', [
+    ('after=x', 'after must be an integer id'),
+    ('limit=0', 'limit must be between 1 and 1000'),
+    ('limit=1001', 'limit must be between 1 and 1000'),
+    ('limit=ten', 'limit must be between 1 and 1000'),
+    ('stream=csv', 'stream must be one of ndjson, json'),
+])
+def test_bad_arguments(client, query, error):
+    response = client.get(f'/orderitems?{query}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_streams_match_the_list(client, monkeypatch, path):
+    # Several chunks per body
+    monkeypatch.setattr(pagination, 'STREAM_CHUNK_SIZE', 8)
+    everything = client.get(path).get_json()
+
+    response = client.get(f'{path}?stream=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == everything
+
+    response = client.get(f'{path}?stream=json')
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data(as_text=True)) == everything
+
+    response = client.get(f'{path}?stream=json&after=10&limit=5')
+    assert json.loads(response.get_data(as_text=True)) == everything[10:15]
+
+
+def test_empty_stream_is_valid_json(client):
+    response = client.get('/items?stream=json&after=1000')
+    assert json.loads(response.get_data(as_text=True)) == []
@@ -0,0 +1,67 @@
+# Standard library imports
+import logging
+
+# Remote library imports
+import bcrypt
+import pytest
+from sqlalchemy import select
+
+# Local imports
+from benchmarks import populate, access_token
+from benchmarks.query_plans import PASSWORD, ROUTES
+from app import create_app
+from config import db
+from models import Item
+from query_budget import QueryBudgetExceeded, query_budget
+
+
+def budgeted_app(config):
+    """A generated database and a route that spends three queries against a budget of two."""
+    app = create_app(config)
+
+    @app.route('/over-budget')
+    @query_budget(2)
+    def over_budget():
+        for item_id in (1, 2, 3):
+            db.session.scalar(select(Item.title).where(Item.id == item_id))
+        return {}
+
+    with app.app_context():
+        populate(10)
+    return app
+
+
+def test_overrun_raises_under_testing():
+    client = budgeted_app({'TESTING': True}).test_client()
+    with pytest.raises(QueryBudgetExceeded, match='GET /over-budget ran 3 queries, budget is 2'):
+        client.get('/over-budget')
+
+
+def test_overrun_is_logged_under_debug(caplog):
+    client = budgeted_app({'DEBUG': True}).test_client()
+    with caplog.at_level(logging.WARNING):
+        assert client.get('/over-budget').status_code == 200
+    assert 'GET /over-budget ran 3 queries, budget is 2' in caplog.text
+
+
+def test_not_enforced_in_production():
+    client = budgeted_app({}).test_client()
+    assert client.get('/over-budget').status_code == 200
+
+
+def test_resources_stay_within_their_budgets():
+    tokens = {
+        True: {'Authorization': f'Bearer {access_token(3)}'},
+        'admin': {'Authorization': f'Bearer {access_token(50, admin=True)}'},
+    }
+    # After the tokens: the extensions are shared, so the last app built configures them
+    app = create_app({'TESTING': True, 'QUERY_BUDGET_STRICT': True})
+    client = app.test_client()
+    with app.app_context():
+        populate(100, password_hash=bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8'))
+
+    for method, path, body, token in ROUTES:
+        headers = {**(tokens.get(token) or {}), **({'If-Match': '*'} if method == 'PATCH' else {})}
+        # An overrun raises out of the test client
+        response = client.open(path, method=method, json=body, headers=headers)
+        assert response.status_code < 500, f'{method} {path}'
@@ -0,0 +1,22 @@
+# Standard library imports
+
+# Remote library imports
+
+# Local imports
+from benchmarks import query_plans
+from app import create_app
+from config import db
+
+
+def test_every_query_uses_an_index(capsys):
+    failures = query_plans.check(200)
+    assert failures == 0, capsys.readouterr().out
+
+
+def test_a_table_scan_is_reported():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        with db.engine.connect() as connection:
+            found = query_plans.problems(connection, 'SELECT * FROM items WHERE description = ?', ('x',))
+    assert found and found[0].startswith('SCAN items')
@@ -0,0 +1,105 @@
+# Standard library imports
+
+# Remote library imports
+import bcrypt
+import pytest
+
+# Local imports
+from conftest import counted_queries
+from benchmarks import populate
+from app import create_app
+import ratelimit
+from ratelimit import Limit, MemoryStorage, limiter
+
+
+def limited_app():
+    app = create_app({'TESTING': True, 'BCRYPT_LOG_ROUNDS': 4, 'RATELIMIT_ENABLED': True})
+    with app.app_context():
+        populate(5, password_hash=bcrypt.hashpw(b'secret', bcrypt.gensalt(4)).decode('utf-8'))
+    return app
+
+
+def login(client, username, **kwargs):
+    return client.post('/login', json={'username': username, 'password': 'wrong'}, **kwargs)
+
+
+def test_login_is_limited_per_username_before_any_work():
+    app = limited_app()
+    client = app.test_client()
+
+    # 10/minute per username; case and padding variants share the bucket
+    statuses = [login(client, name).status_code for name in ['customer1', ' Customer1 '] * 5]
+    assert statuses == [401] * 10
+    with counted_queries(app) as statements:
+        response = login(client, 'CUSTOMER1')
+    assert response.status_code == 429
+    assert response.get_json() == {'error': 'Too many requests, try again later'}
+    assert response.headers['Retry-After'] == '6'
+    assert response.headers['RateLimit-Limit'] == '10'
+    assert response.headers['RateLimit-Remaining'] == '0'
+    # Rejected before the customer lookup and bcrypt
+    assert statements == []
+
+    assert login(client, 'customer2').status_code == 401
+
+
+def test_login_is_limited_per_ip(monkeypatch):
+    monkeypatch.setenv('TRUSTED_PROXIES', '1')
+    app = limited_app()
+    client = app.test_client()
+
+    # 30/minute per IP, whatever the username
+    statuses = [login(client, f'guess{n}', headers={'X-Forwarded-For': '203.0.113.7'}).status_code
+                for n in range(31)]
+    assert statuses == [401] * 30 + [429]
+    # Behind a trusted proxy, another client has a bucket of its own
+    assert login(client, 'guess', headers={'X-Forwarded-For': '203.0.113.8'}).status_code == 401
+
+
+def test_headers_report_the_tightest_bucket():
+    client = limited_app().test_client()
+    response = login(client, 'customer1')
+    # ip 30/minute has 29 left, username 10/minute has 9
+    assert (response.headers['RateLimit-Limit'], response.headers['RateLimit-Remaining']) == ('10', '9')
+    assert response.headers['RateLimit-Reset'] == '6'
+    # Unlimited routes say nothing
+    assert 'RateLimit-Limit' not in client.get('/items').headers
+
+
+def test_disabled_limiter_lets_everything_through(client):
+    statuses = {login(client, 'nobody').status_code for _ in range(12)}
+    assert statuses == {401}
+    assert 'RateLimit-Limit' not in login(client, 'nobody').headers
+
+
+def test_buckets_refill(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    storage, limit = MemoryStorage(), Limit('2/second')
+
+    assert [storage.take('key', limit)[0] for _ in range(3)] == [True, True, False]
+    now[0] += 0.5
+    assert storage.take('key', limit) == (True, 0)
+    now[0] += 10
+    # Never more than the burst
+    assert storage.take('key', limit) == (True, 1)
+
+
+def test_storage_is_bounded():
+    storage, limit = MemoryStorage(max_keys=2), Limit('1/hour')
+    for key in ('a', 'b', 'c'):
+        storage.take(key, limit)
+    # 'a' was forgotten, which forgives it
+    assert storage.take('a', limit)[0] is True
+    assert storage.take('c', limit)[0] is False
+
+
+@pytest.mark.parametrize('text', ['10', '10/fortnight', 'ten/minute', '/minute'])
+def test_bad_limits(text):
+    with pytest.raises(ValueError, match='Bad rate limit'):
+        Limit(text)
+
+
+def test_unknown_keys():
+    with pytest.raises(ValueError, match='Unknown rate limit keys: tenant'):
+        limiter.limit(tenant='1/second')
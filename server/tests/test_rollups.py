@@ -0,0 +1,82 @@
+# Standard library imports
+
+# Remote library imports
+import pytest
+from sqlalchemy import select, text
+
+# Local imports
+from benchmarks import populate
+from app import create_app
+from config import db
+from models import Order, OrderItem
+import reports
+import seed
+
+
+def rollups():
+    """Every rollup row, leaving out the all-zero rows triggers keep and rebuild() does not write."""
+    tables = {}
+    for model in reports.ROLLUPS:
+        rows = db.session.execute(select(model.__table__)).all()
+        tables[model.__tablename__] = sorted(
+            tuple(row) for row in rows if any(value for value in tuple(row)[1:] if isinstance(value, (int, float))))
+    return tables
+
+
+def assert_matches_rebuild():
+    db.session.commit()
+    maintained = rollups()
+    reports.rebuild()
+    assert maintained == rollups()
+
+
+@pytest.fixture
+def app():
+    app = create_app({'TESTING': True, 'BCRYPT_LOG_ROUNDS': 4})
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def test_seed_fixture(app):
+    seed.seed_fixture()
+    assert_matches_rebuild()
+    item_sales = db.session.execute(text('SELECT quantity, order_lines FROM item_sales WHERE item_id = 1')).one()
+    assert tuple(item_sales) == (1, 1)
+
+
+def test_lines_written_before_their_order(app):
+    populate(20)
+    db.session.execute(text(
+        'INSERT INTO orderitems(quantity, item_id, order_id) VALUES (4, 3, 100), (5, 3, 100), (1, 7, 100)'))
+    assert_matches_rebuild()
+    db.session.execute(text('INSERT INTO orders(id, customer_id, total) VALUES (100, 1, 10)'))
+    assert_matches_rebuild()
+
+
+@pytest.mark.parametrize('statement', [
+    'DELETE FROM orders WHERE id = 2',
+    'UPDATE orderitems SET quantity = quantity + 3 WHERE id IN (SELECT id FROM orderitems LIMIT 5)',
+    'UPDATE orderitems SET item_id = 9 WHERE id IN (SELECT id FROM orderitems LIMIT 5)',
+    'UPDATE orderitems SET order_id = 3 WHERE id IN (SELECT id FROM orderitems WHERE order_id <> 3 LIMIT 5)',
+    'DELETE FROM orderitems WHERE id IN (SELECT id FROM orderitems LIMIT 5)',
+    "UPDATE items SET category = 'surplus' WHERE id IN (SELECT item_id FROM orderitems LIMIT 2)",
+    "UPDATE orders SET total = total + 1, created_at = '2024-03-01 00:00:00' WHERE id < 5",
+])
+def test_writes_keep_rollups_current(app, statement):
+    populate(30)
+    # Two lines of one item in order 2, so its delete takes both out
+    db.session.execute(text('INSERT INTO orderitems(quantity, item_id, order_id) VALUES (4, 3, 2), (5, 3, 2)'))
+    assert_matches_rebuild()
+    db.session.execute(text(statement))
+    assert_matches_rebuild()
+
+
+def test_orm_order_delete_detaches_lines(app):
+    populate(30)
+    order_id = db.session.scalar(select(OrderItem.order_id).where(OrderItem.order_id.isnot(None)))
+    db.session.delete(db.session.get(Order, order_id))
+    assert_matches_rebuild()
+    # The detached lines no longer count, and deleting them later takes nothing out twice
+    db.session.execute(text('DELETE FROM orderitems WHERE order_id IS NULL'))
+    assert_matches_rebuild()
@@ -0,0 +1,36 @@
+# Standard library imports
+
+# Remote library imports
+import pytest
+
+# Local imports
+
+
+def search(client, **args):
+    response = client.get('/items/search', query_string=args)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_every_spelling_echoes_the_normalized_query(client):
+    first = search(client, q='Item 1')
+    # Served from the cache entry the first spelling filled
+    second = search(client, q='  item   1!')
+    assert first['query'] == second['query'] == 'item 1'
+    assert first['items'] == second['items']
+
+
+def test_terms_match_as_prefixes_in_title_and_description(client):
+    titles = [item['title'] for item in search(client, q='ite 4', limit=100)['items']]
+    assert titles and all(title.startswith('Item 4') for title in titles)
+
+
+def test_filters_and_facets(client):
+    result = search(client, min_price=10, max_price=500, category='firearm', limit=100)
+    assert all(item['category'] == 'firearm' and 10 <= item['price'] <= 500 for item in result['items'])
+    assert result['total'] == result['facets']['category'].get('firearm', 0) == len(result['items'])
+
+
+@pytest.mark.parametrize('args', [{'limit': 0}, {'limit': 'many'}, {'offset': -1}])
+def test_bad_arguments(client, args):
+    assert client.get('/items/search', query_string=args).status_code == 400
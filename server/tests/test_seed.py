@@ -0,0 +1,37 @@
+# Standard library imports
+from datetime import datetime, timedelta
+
+# Remote library imports
+import pytest
+from sqlalchemy import func, select
+
+# Local imports
+from app import create_app
+from config import db
+from models import Item, ItemStock, Reservation
+import inventory
+import seed
+
+
+@pytest.fixture
+def app():
+    app = create_app({'TESTING': True, 'BCRYPT_LOG_ROUNDS': 4})
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def test_reseeding_empties_stock_and_reservations(app):
+    seed.truncate()
+    seed.seed_fixture()
+    inventory.restock(1, 5)
+    db.session.add(Reservation(customer_id=3, item_id=1, quantity=2, expires_at=datetime.now() + timedelta(hours=1)))
+    db.session.commit()
+
+    seed.truncate()
+    seed.seed_fixture()
+    assert db.session.scalar(select(func.count()).select_from(ItemStock)) == 0
+    assert db.session.scalar(select(func.count()).select_from(Reservation)) == 0
+    # Item 1 came back with a reused id and must not inherit the old stock level
+    assert db.session.get(Item, 1).in_stock
+    assert inventory.stock_level(1) is None
@@ -0,0 +1,60 @@
+# Standard library imports
+
+# Remote library imports
+import pytest
+from sqlalchemy import event, select, update
+
+# Local imports
+from config import db
+from models import Customer, Item, OrderItem
+from serializers import FieldPlan, customer_plan, item_plan, order_plan, order_item_plan
+
+
+def to_dicts(model):
+    return [row.to_dict() for row in db.session.scalars(select(model).order_by(model.id))]
+
+
+@pytest.fixture
+def session(app):
+    with app.app_context():
+        # NULLs in nullable columns and in a many-to-one relationship
+        db.session.execute(update(OrderItem).where(OrderItem.id <= 3).values(order_id=None))
+        db.session.execute(update(Item).where(Item.id <= 3).values(price=None, description=None))
+        db.session.commit()
+        yield db.session
+
+
+@pytest.mark.parametrize('plan', [customer_plan, order_plan, order_item_plan], ids=lambda plan: plan.model.__name__)
+def test_plan_matches_to_dict(session, plan):
+    assert plan.all() == to_dicts(plan.model)
+
+
+def test_item_plan_adds_image_variants(session):
+    assert item_plan.all() == [{**data, 'image_variants': []} for data in to_dicts(Item)]
+
+
+def test_single_rows_and_chunks(session):
+    order_items = to_dicts(OrderItem)
+    assert order_item_plan.one(OrderItem.id == 1) == order_items[0]
+    assert order_item_plan.one(OrderItem.id == 10000) is None
+    assert order_item_plan.all(after=10, limit=5) == order_items[10:15]
+    assert [data for chunk in order_item_plan.chunks(size=7) for data in chunk] == order_items
+
+
+def test_one_query_per_dump(session):
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        order_item_plan.all()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    assert len(statements) == 1
+
+
+def test_collections_cannot_be_flattened():
+    with pytest.raises(ValueError, match='Customer.orders is a collection'):
+        FieldPlan(Customer, rules=('orders',))
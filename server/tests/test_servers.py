@@ -0,0 +1,64 @@
+# Standard library imports
+import multiprocessing
+import os
+import runpy
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Remote library imports
+import pytest
+
+# Local imports
+from conftest import free_port
+from benchmarks import SERVER_DIR, http, make_app, populate, serve
+from benchmarks.load import server_command
+
+
+@pytest.fixture
+def database_uri(tmp_path):
+    uri = f'sqlite:///{tmp_path / "server.db"}'
+    with make_app(uri).app_context():
+        populate(20)
+    return uri
+
+
+@pytest.mark.parametrize('server', ['gunicorn', 'uvicorn'])
+def test_entry_points_serve_concurrently(database_uri, server):
+    port = free_port()
+    with serve(database_uri, port, server_command(server, port, workers=2, threads=2),
+               GUNICORN_ACCESS_LOG='') as base_url:
+        with ThreadPoolExecutor(8) as pool:
+            answers = list(pool.map(lambda n: http(base_url, 'GET', f'/items/{n}'), range(1, 21)))
+        status, _, items = http(base_url, 'GET', '/items')
+    assert [status for status, _, _ in answers] == [200] * 20
+    assert [item['id'] for _, _, item in answers] == list(range(1, 21))
+    assert status == 200 and len(items) == 20
+
+
+def test_warm_up_leaves_no_connections_open(database_uri):
+    # What gunicorn's master does with preload_app before it forks the workers
+    script = ('import wsgi\n'
+              'from config import db\n'
+              'with wsgi.app.app_context():\n'
+              '    print(db.engine.pool.checkedin(), db.engine.pool.checkedout())\n')
+    process = subprocess.run([sys.executable, '-c', script], cwd=SERVER_DIR, capture_output=True, text=True,
+                             env={**os.environ, 'DATABASE_URI': database_uri})
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.split() == ['0', '0']
+
+
+def test_gunicorn_config(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    monkeypatch.setenv('GUNICORN_THREADS', '8')
+    monkeypatch.setenv('PORT', '8000')
+    config = runpy.run_path(os.path.join(SERVER_DIR, 'gunicorn.conf.py'))
+    assert (config['workers'], config['threads'], config['worker_class']) == (3, 8, 'gthread')
+    assert config['bind'] == '0.0.0.0:8000'
+    assert config['preload_app'] is True
+
+    monkeypatch.delenv('WEB_CONCURRENCY')
+    config = runpy.run_path(os.path.join(SERVER_DIR, 'gunicorn.conf.py'))
+    assert config['workers'] == multiprocessing.cpu_count() * 2 + 1
+    # The preloaded app sizes its bcrypt pools from it
+    assert os.environ['WEB_CONCURRENCY'] == str(config['workers'])
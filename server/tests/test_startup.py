@@ -0,0 +1,54 @@
+# Standard library imports
+import json
+import os
+import subprocess
+import sys
+
+# Remote library imports
+import pytest
+
+# Local imports
+from benchmarks import SERVER_DIR, make_app, populate
+from benchmarks.startup import import_times
+
+HTTP_STACK = {'app', 'flask_restful', 'flask_jwt_extended', 'flask_cors', 'jwt', 'serializers', 'pagination'}
+CLI_ONLY = {'flask_migrate', 'alembic', 'faker'}
+
+
+@pytest.fixture(scope='module')
+def database_uri(tmp_path_factory):
+    # wsgi.py warms its queries up on import, so it needs the tables
+    uri = f'sqlite:///{tmp_path_factory.mktemp("startup") / "startup.db"}'
+    with make_app(uri).app_context():
+        populate(1)
+    return uri
+
+
+def imported(module, database_uri='sqlite://'):
+    """Top-level modules a fresh interpreter has loaded after ``import module``."""
+    script = (f'import json, sys\nimport {module}\n'
+              'print(json.dumps(sorted({name.split(".")[0] for name in sys.modules})))')
+    process = subprocess.run([sys.executable, '-c', script], cwd=SERVER_DIR, capture_output=True, text=True,
+                             env={**os.environ, 'DATABASE_URI': database_uri})
+    assert process.returncode == 0, process.stderr
+    return set(json.loads(process.stdout))
+
+
+@pytest.mark.parametrize('module', ['config', 'seed', 'manage'])
+def test_cli_entry_points_skip_the_http_stack(module):
+    loaded = imported(module)
+    assert 'sqlalchemy' in loaded
+    assert not loaded & HTTP_STACK
+
+
+def test_only_the_cli_loads_migrations(database_uri):
+    assert {'flask_migrate', 'alembic'} <= imported('manage')
+    assert not imported('wsgi', database_uri) & CLI_ONLY
+    assert not imported('seed') & CLI_ONLY
+
+
+def test_import_times_are_read_from_importtime():
+    cumulative, packages = import_times('config', {**os.environ, 'DATABASE_URI': 'sqlite://'})
+    assert cumulative > 0
+    assert {'config', 'flask', 'sqlalchemy'} <= packages.keys()
+    assert packages['sqlalchemy'] < cumulative
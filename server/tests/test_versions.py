@@ -0,0 +1,120 @@
+# Standard library imports
+import threading
+
+# Remote library imports
+import pytest
+from sqlalchemy import text
+
+# Local imports
+from config import db
+from conditional import CHANGED, PreconditionError, commit_versioned
+from models import Customer, Item, OrderItem
+
+PATCHES = [
+    ('/items/1', {'price': 5}),
+    ('/orderitems/1', {'quantity': 3}),
+    ('/customers/1', {'wallet': 5}),
+]
+
+
+@pytest.mark.parametrize('path, body', PATCHES)
+def test_patch_requires_if_match(client, path, body):
+    response = client.patch(path, json=body)
+    assert response.status_code == 428
+    assert response.get_json() == {'error': 'If-Match is required: send the ETag from a GET of this resource'}
+
+
+@pytest.mark.parametrize('path, body', PATCHES)
+def test_patch_with_the_current_tag(client, path, body):
+    read = client.get(path)
+    response = client.patch(path, json=body, headers={'If-Match': read.headers['ETag']})
+    assert response.status_code in (200, 202)
+    assert response.get_etag()[0] != read.get_etag()[0]
+    assert response.get_etag() == client.get(path).get_etag()
+    assert all(response.get_json()[key] == value for key, value in body.items())
+
+    # The tag it held is stale now
+    response = client.patch(path, json=body, headers={'If-Match': read.headers['ETag']})
+    assert response.status_code == 412
+    assert response.get_json() == {'error': CHANGED}
+
+    # * overwrites whatever is there
+    assert client.patch(path, json=body, headers={'If-Match': '*'}).status_code in (200, 202)
+
+
+def test_tags_cover_every_row_in_the_body(app, client, auth):
+    read = client.get('/orderitems/1')
+    order_item = read.get_json()
+    # A wallet adjustment of the customer inside the order item's body retires its tag
+    customer_id = order_item['order']['customer']['id']
+    assert client.post(f'/customers/{customer_id}/wallet', json={'amount': 1},
+                       headers=auth(app, 50, admin=True)).status_code == 200
+    response = client.patch('/orderitems/1', json={'quantity': 2}, headers={'If-Match': read.headers['ETag']})
+    assert response.status_code == 412
+    # A write to a row outside it does not
+    other = 2 if order_item['item']['id'] == 1 else 1
+    read = client.get('/orderitems/1')
+    assert client.patch(f'/items/{other}', json={'price': 2}, headers={'If-Match': '*'}).status_code == 202
+    assert client.patch('/orderitems/1', json={'quantity': 2},
+                        headers={'If-Match': read.headers['ETag']}).status_code == 200
+
+
+@pytest.mark.parametrize('model', [Customer, Item, OrderItem])
+def test_a_write_that_loses_the_race_is_412(file_app, model):
+    with file_app.test_request_context():
+        row = db.session.get(model, 1)
+        # Another writer commits between our read and our UPDATE
+        with db.engine.begin() as connection:
+            connection.execute(text(f'UPDATE {model.__tablename__} SET version = version + 1 WHERE id = 1'))
+        if model is OrderItem:
+            row.quantity = 9
+        elif model is Item:
+            row.price = 9
+        else:
+            row.wallet = 9
+        with pytest.raises(PreconditionError) as raised:
+            commit_versioned()
+        assert raised.value.status == 412
+        db.session.rollback()
+        assert db.session.get(model, 1).version == 2
+
+
+def test_wallet_adjustments(app, client, auth):
+    admin = auth(app, 50, admin=True)
+    wallet = client.get('/customers/3').get_json()['wallet']
+
+    response = client.post('/customers/3/wallet', json={'amount': 25.5}, headers=admin)
+    assert response.status_code == 200
+    assert response.get_json() == {'id': 3, 'wallet': wallet + 25.5}
+
+    response = client.post('/customers/3/wallet', json={'amount': -(wallet + 26)}, headers=admin)
+    assert (response.status_code, response.get_json()) == (402, {'error': 'Insufficient funds'})
+    response = client.post('/customers/10000/wallet', json={'amount': 1}, headers=admin)
+    assert (response.status_code, response.get_json()) == (404, {'error': 'Customer not found'})
+    for amount in ('5', True, None):
+        assert client.post('/customers/3/wallet', json={'amount': amount}, headers=admin).status_code == 400
+    assert client.post('/customers/3/wallet', json={'amount': 1}, headers=auth(app, 3)).status_code == 403
+    assert client.get('/customers/3').get_json()['wallet'] == wallet + 25.5
+
+
+def test_concurrent_adjustments_are_never_lost(file_app, auth):
+    admin = auth(file_app, 50, admin=True)
+    client = file_app.test_client()
+    wallet = client.get('/customers/3').get_json()['wallet']
+    threads, per_thread = 8, 10
+    barrier = threading.Barrier(threads)
+    statuses = []
+
+    def adjust():
+        barrier.wait()
+        for _ in range(per_thread):
+            statuses.append(file_app.test_client().post('/customers/3/wallet', json={'amount': 1},
+                                                        headers=admin).status_code)
+
+    workers = [threading.Thread(target=adjust) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert statuses == [200] * threads * per_thread
+    assert client.get('/customers/3').get_json()['wallet'] == wallet + threads * per_thread
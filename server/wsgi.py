@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module builds the app with app.create_app() and warms it up. gunicorn.conf.py
+preloads it in the master, so workers fork with every module imported and
+every query already compiled, but with no open database connections.
+"""
+
+# Standard library imports
+
+# Remote library imports
+
+# Local imports
+from app import create_app
+from config import db
+from serializers import customer_plan, item_plan, order_plan, order_item_plan
+
+
+def warm_up(app):
+    """Connect once, fill the SQL compilation cache, then drop the connections before workers fork."""
+    with app.app_context():
+        for plan in (customer_plan, item_plan, order_plan, order_item_plan):
+            # limit(0) compiles and caches the statement without reading rows
+            db.session.execute(plan.select().limit(0)).all()
+        db.session.remove()
+        # Forked workers must not share the master's SQLite/psycopg2 handles
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+app = create_app()
+warm_up(app)